@@ -6,17 +6,21 @@
 # Entry point of the program
 # Handles the setup of the table sections, user console input and exit sequence
 #
+# Runtimes:
+#   python Application.py            -> MQTT network thread, console thread and a main routine which waits on an EventQueue
+#   python Application.py --asyncio  -> MQTT connections, console reader and main routine as coroutines on one asyncio event loop,
+#                                       calculations run in an executor (worker set executor)
+#
 
-# we take the local ip address and put it as local broker (the broker server need to run on the same computer than the one executing the code)
 import socket
-s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-s.connect(("8.8.8.8", 80))
-local_broker_ip = s.getsockname()[0]# local broker ip is the ip of the computer executing the program
-mqtt_public_broker = "broker.hivemq.com"
-
+import sys
+import asyncio
 from json import loads
-from time import sleep
+from time import perf_counter
 from SmartGridTable import SmartGridTable
+from EventQueue import EventQueue
+from AsyncEventQueue import AsyncEventQueue
+from MQTTTransport import MQTTTransport
 from threading import Thread
 
 from GUI_MQTT import GUI_MQTT
@@ -24,20 +28,27 @@ from GUI_MQTT import GUI_MQTT
 import warnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
+
+mqtt_public_broker = "broker.hivemq.com"
+
 # global stuff
 force_update = False
 mode = "lopf"
 
-global_console_input = ""
-
 running = True
 
-print("----------------------------------------------------------------")
-print("--------------- Loading SmartGridTable scenarios ---------------")
-print("----------------------------------------------------------------")
+worker_type = "thread"
+
+table = None
+mqtt_gui = None
+
+# events of the MQTT clients, console, solver worker and scenario watcher
+events = EventQueue()
+
+# asyncio runtime, None when the threads runtime is used
+event_loop = None
+last_time = 0
 
-table = SmartGridTable()
-mqtt_gui = GUI_MQTT()
 
 def print_help_commands():
     print("----------------------------------------------------------------")
@@ -50,16 +61,49 @@ def print_help_commands():
     print("table reboot [SECTION]   -> Reboot given table section")
     print("table shutdown [SECTION] -> Shutdown the given table section")
     print("table poweron [SECTION]  -> Boot up the given table section")
-    print("scenario reload          -> Find and reload all scenarios in Static/")
+    print("scenario reload          -> Find added, changed and removed scenarios and reload only these")
     print("scenario list            -> Print the names of all available scenarios")
     print("scenario current         -> Print the current active scenario")
+    print("scenario warm            -> Load all scenarios in the background")
+    print("scenario compile         -> Write the precompiled bundles of all scenarios")
+    print("scenario watch on|off    -> Reload changed scenario files automatically")
     print("scenario set -s [NAME]   -> Switch to given static scenario")
     print("scenario set -d [NAME]   -> Switch to given dynamic scenario")
     print("mode set lopf            -> Set calculation type to Linear Optimal Power Flow (LOPF)")
     print("mode set lpf             -> Set calculation type to Linear Power Flow (LPF)")
     print("mode set pf              -> Set calculation type to Power Flow (PF)")
+    print("mode set fastlpf         -> Set calculation type to PTDF based Linear Power Flow")
+    print("mode set plopf           -> Set calculation type to LOPF on a persistent model (requires pyomo and highspy)")
+    print("lopf meritorder on|off   -> Solve LOPF with a merit order dispatch when network constraints cannot bind")
+    print("lopf verify on|off       -> Compare merit order dispatch results with the LP solver")
+    print("lopf aggregate off       -> Solve dynamic LOPF on all snapshots (plopf always does)")
+    print("lopf aggregate scenario  -> Use the snapshot aggregation of the scenario file")
+    print("lopf aggregate resample [FREQ]          -> Solve on the mean of every interval, for example 4h")
+    print("lopf aggregate representative [PERIOD] [N] -> Solve on N typical periods, for example 1D 3")
+    print("lopf aggregate duration [N]             -> Solve on N segments of the net load duration curve")
+    print("lopf aggregate verify on|off            -> Also solve all snapshots and print the aggregation error")
+    print("lopf rolling [WINDOW] [OVERLAP]         -> Solve dynamic LOPF in windows, playback starts after the first window (not plopf)")
+    print("lopf rolling off|scenario               -> Solve all snapshots at once, or use the setting of the scenario file")
+    print("solver set glpk          -> Solve LOPF with GLPK (LP file and solver process)")
+    print("solver set highs         -> Solve LOPF in memory with HiGHS (requires pyomo and highspy)")
+    print("solver current           -> Print the current LOPF solver")
+    print("pf workers [N]           -> Run the PF of dynamic scenarios on N processes (0 is off)")
+    print("lpf vectorised on|off    -> Solve the LPF of all snapshots of dynamic scenarios with one sparse solve")
+    print("lpf verify on|off        -> Compare vectorised LPF results with the LPF of PyPSA")
     print("modules list             -> Print the number of modules placed on each table section")
+    print("modules debounce [MS]    -> Wait until modules are unchanged for [MS] milliseconds before calculating")
     print("calculate                -> PyPSA simulation refresh")
+    print("cache status             -> Print the size and hit/miss counters of the result cache")
+    print("cache clear              -> Remove all results from the result cache")
+    print("cache size [MB]          -> Set the maximum size of the result cache")
+    print("export set [FORMAT]      -> Set result export format: off, csv, npz or log")
+    print("export every [N]         -> Only export every Nth calculation")
+    print("export sample [FRACTION] -> Only export a random fraction of the calculations")
+    print("export status            -> Print the export settings and counters")
+    print("worker set thread        -> Run PyPSA calculations in a background thread")
+    print("worker set process       -> Run PyPSA calculations in a background process")
+    print("worker set executor      -> Run PyPSA calculations in an executor (run_in_executor with --asyncio)")
+    print("worker set off           -> Run PyPSA calculations in the main routine")
     print("----------------------------------------------------------------")
 
 
@@ -68,6 +112,7 @@ def console_handler(input):
     global force_update
     global mode
     global running
+    global worker_type
 
     console_input = input.split()
     known_command = False
@@ -96,6 +141,211 @@ def console_handler(input):
                     known_command = True
                     print("----------------------------------------------------------------")
 
+                if (console_input[1] == "debounce"):
+                    if (len(console_input) >= 3):
+                        try:
+                            table.modules_set_debounce(float(console_input[2]))
+                            print("Module debounce time set to " + console_input[2] + " ms")
+                            known_command = True
+                        except ValueError:
+                            pass
+                        print("----------------------------------------------------------------")
+
+        # result cache commands
+        if (console_input[0] == "cache"):
+            if (len(console_input) >= 2):
+                if (console_input[1] == "status"):
+                    table.cache_print_status()
+                    known_command = True
+                    print("----------------------------------------------------------------")
+
+                if (console_input[1] == "clear"):
+                    print("Clearing result cache...")
+                    table.cache_clear()
+                    known_command = True
+                    print("----------------------------------------------------------------")
+
+                if (console_input[1] == "size"):
+                    if (len(console_input) >= 3):
+                        try:
+                            table.cache_set_size(float(console_input[2]))
+                            print("Result cache size set to " + console_input[2] + " MB")
+                            known_command = True
+                        except ValueError:
+                            pass
+                        print("----------------------------------------------------------------")
+
+        # result export commands
+        if (console_input[0] == "export"):
+            if (len(console_input) >= 2):
+                if (console_input[1] == "status"):
+                    table.export_print_status()
+                    known_command = True
+                    print("----------------------------------------------------------------")
+
+            if (len(console_input) >= 3):
+                if (console_input[1] == "set"):
+                    if (table.export_set_format(console_input[2])):
+                        print("Result export format set to " + console_input[2])
+                        known_command = True
+                        print("----------------------------------------------------------------")
+
+                if (console_input[1] == "every"):
+                    try:
+                        table.export_set_every(int(console_input[2]))
+                        print("Exporting every " + console_input[2] + " calculations")
+                        known_command = True
+                    except ValueError:
+                        pass
+                    print("----------------------------------------------------------------")
+
+                if (console_input[1] == "sample"):
+                    try:
+                        table.export_set_sample(float(console_input[2]))
+                        print("Exporting a fraction of " + console_input[2] + " of the calculations")
+                        known_command = True
+                    except ValueError:
+                        pass
+                    print("----------------------------------------------------------------")
+
+        # LOPF fast path commands
+        if (console_input[0] == "lopf"):
+            if (len(console_input) >= 3):
+                if (console_input[2] == "on" or console_input[2] == "off"):
+                    if (console_input[1] == "meritorder"):
+                        table.network_set_option("merit_order", console_input[2] == "on")
+                        print("Merit order dispatch turned " + console_input[2])
+                        known_command = True
+                        print("----------------------------------------------------------------")
+
+                    if (console_input[1] == "verify"):
+                        table.network_set_option("merit_order_verify", console_input[2] == "on")
+                        print("Merit order verification turned " + console_input[2])
+                        known_command = True
+                        print("----------------------------------------------------------------")
+
+            if (len(console_input) >= 3):
+                if (console_input[1] == "aggregate"):
+                    aggregation = "unknown"
+
+                    if (console_input[2] == "off"):
+                        aggregation = {"method" : "off"}
+
+                    if (console_input[2] == "scenario"):
+                        aggregation = None
+
+                    if (console_input[2] == "resample" and len(console_input) >= 4):
+                        aggregation = {"method" : "resample", "frequency" : console_input[3]}
+
+                    if (console_input[2] == "representative" and len(console_input) >= 5 and console_input[4].isdigit()):
+                        aggregation = {"method" : "representative", "period" : console_input[3], "num_of_periods" : int(console_input[4])}
+
+                    if (console_input[2] == "duration" and len(console_input) >= 4 and console_input[3].isdigit()):
+                        aggregation = {"method" : "duration", "num_of_segments" : int(console_input[3])}
+
+                    if (console_input[2] == "verify" and len(console_input) >= 4):
+                        if (console_input[3] == "on" or console_input[3] == "off"):
+                            table.network_set_option("aggregation_verify", console_input[3] == "on")
+                            print("Aggregation verification turned " + console_input[3])
+                            known_command = True
+                            force_update = True
+                            print("----------------------------------------------------------------")
+
+                    elif (aggregation != "unknown" and table.network_set_aggregation(aggregation)):
+                        print("Snapshot aggregation set to " + ("scenario" if aggregation == None else " ".join(console_input[2:])))
+                        known_command = True
+                        force_update = True
+                        print("----------------------------------------------------------------")
+
+            if (len(console_input) >= 3):
+                if (console_input[1] == "rolling"):
+                    rolling_horizon = "unknown"
+
+                    if (console_input[2] == "off"):
+                        rolling_horizon = {"window" : 0}
+
+                    if (console_input[2] == "scenario"):
+                        rolling_horizon = None
+
+                    if (console_input[2].isdigit()):
+                        overlap = 0
+                        if (len(console_input) >= 4 and console_input[3].isdigit()):
+                            overlap = int(console_input[3])
+                        rolling_horizon = {"window" : int(console_input[2]), "overlap" : overlap}
+
+                    if (rolling_horizon != "unknown"):
+                        table.network_set_option("rolling_horizon", rolling_horizon)
+                        print("Rolling horizon set to " + " ".join(console_input[2:]))
+                        known_command = True
+                        force_update = True
+                        print("----------------------------------------------------------------")
+
+        # parallel power flow commands
+        if (console_input[0] == "pf"):
+            if (len(console_input) >= 3):
+                if (console_input[1] == "workers" and console_input[2].isdigit()):
+                    table.network_set_pf_workers(int(console_input[2]))
+                    print("PF workers set to " + console_input[2])
+                    known_command = True
+                    force_update = True
+                    print("----------------------------------------------------------------")
+
+        # vectorised LPF commands
+        if (console_input[0] == "lpf"):
+            if (len(console_input) >= 3):
+                if (console_input[2] == "on" or console_input[2] == "off"):
+                    if (console_input[1] == "vectorised"):
+                        table.network_set_option("linear_power_flow", console_input[2] == "on")
+                        print("Vectorised LPF turned " + console_input[2])
+                        known_command = True
+                        force_update = True
+                        print("----------------------------------------------------------------")
+
+                    if (console_input[1] == "verify"):
+                        table.network_set_option("linear_power_flow_verify", console_input[2] == "on")
+                        print("Vectorised LPF verification turned " + console_input[2])
+                        known_command = True
+                        force_update = True
+                        print("----------------------------------------------------------------")
+
+        # LOPF solver commands
+        if (console_input[0] == "solver"):
+            if (len(console_input) >= 2):
+                if (console_input[1] == "current"):
+                    print("Current LOPF solver -> " + table.network_get_solver())
+                    known_command = True
+                    print("----------------------------------------------------------------")
+
+            if (len(console_input) >= 3):
+                if (console_input[1] == "set"):
+                    if (table.network_set_solver(console_input[2])):
+                        print("LOPF solver set to " + console_input[2])
+                        known_command = True
+                        force_update = True
+                        print("----------------------------------------------------------------")
+
+        # solver worker commands
+        if (console_input[0] == "worker"):
+            if (len(console_input) >= 3):
+                if (console_input[1] == "set"):
+                    if (console_input[2] == "thread" or console_input[2] == "process"):
+                        worker_type = console_input[2]
+                        table.solver_start(worker_type)
+                        known_command = True
+                        print("----------------------------------------------------------------")
+
+                    if (console_input[2] == "executor"):
+                        worker_type = console_input[2]
+                        table.solver_start(worker_type, event_loop)
+                        known_command = True
+                        print("----------------------------------------------------------------")
+
+                    if (console_input[2] == "off"):
+                        worker_type = "off"
+                        table.solver_stop()
+                        known_command = True
+                        print("----------------------------------------------------------------")
+
         # table commands
         if (console_input[0] == "table"):
             if (len(console_input) >= 2):
@@ -162,6 +412,32 @@ def console_handler(input):
                     known_command = True
                     print("----------------------------------------------------------------")
 
+                if (console_input[1] == "watch"):
+                    if (len(console_input) >= 3):
+                        if (console_input[2] == "on"):
+                            print("Watching scenario files for changes")
+                            table.scenario_watch(True)
+                            known_command = True
+                            print("----------------------------------------------------------------")
+
+                        if (console_input[2] == "off"):
+                            print("Stopped watching scenario files")
+                            table.scenario_watch(False)
+                            known_command = True
+                            print("----------------------------------------------------------------")
+
+                if (console_input[1] == "compile"):
+                    print("Compiling scenarios...")
+                    table.scenario_compile()
+                    known_command = True
+                    print("----------------------------------------------------------------")
+
+                if (console_input[1] == "warm"):
+                    print("Loading scenarios in the background...")
+                    table.scenario_warm()
+                    known_command = True
+                    print("----------------------------------------------------------------")
+
                 if (console_input[1] == "set"):
                     if (len(console_input) >= 3):
                         if (console_input[2] == "-s"):
@@ -199,175 +475,319 @@ def console_handler(input):
                             known_command = True
                             force_update = True
 
+                        if (console_input[2] == "fastlpf"):
+                            print("Setting mode to PTDF based Linear Power Flow")
+                            mode = "fastlpf"
+                            known_command = True
+                            force_update = True
+
+                        if (console_input[2] == "plopf"):
+                            print("Setting mode to Linear Optimal Power Flow on a persistent model")
+                            mode = "plopf"
+                            known_command = True
+                            force_update = True
+
         if (known_command == False):
             print("Unknown command -> " + input)
             print("Type help for all available commands")
 
+# one pass of the main routine: handle the event, calculate when needed and set the timers of the next pass
+def handle_event(event_type, data):
+
+    global force_update
+    global last_time
+
+    current_time = perf_counter()
+    table.append_delta_time(current_time - last_time)
+    last_time = current_time
+
+    # GUI and console commands
+    if (event_type == EventQueue.CONSOLE or event_type == EventQueue.GUI):
+        console_handler(data)
+
+    # changed scenario files found by the scenario watcher
+    if (event_type == EventQueue.SCENARIO):
+        table.scenario_poll()
+
+    if (event_type == EventQueue.PUBLISH):
+        table.mqtt_publish()
+        events.set_timer(EventQueue.PUBLISH, publish_update_rate)
+
+    table.update()
+
+    if(table.modules_if_changed() or force_update == True):
+        force_update = False
+        events.set_timer(EventQueue.PUBLISH, publish_update_rate)
+
+        if (mode == "lopf"):
+            table.network_lopf()
+            print("----------------------------------------------------------------")
+
+        if (mode == "lpf"):
+            table.network_lpf()
+            print("----------------------------------------------------------------")
+
+        if (mode == "pf"):
+            table.network_pf()
+            print("----------------------------------------------------------------")
+
+        if (mode == "fastlpf"):
+            table.network_fastlpf()
+            print("----------------------------------------------------------------")
+
+        if (mode == "plopf"):
+            table.network_plopf()
+            print("----------------------------------------------------------------")
+
+    # results of the solver worker
+    table.solver_poll()
+
+    if (table.simulation_changed == True):
+        table.simulation_changed = False
+
+        if (table.get_simulation_succes() == True):
+
+            generators  = table.get_generators_generation()
+            loads       = table.get_load_consumption()
+
+            if (len(generators) > 0):
+                mqtt_gui.publish_dataframe(generators)
+
+            if (len(loads) > 0):
+                mqtt_gui.publish_dataframe(loads)
+
+
+    if (table.snapshot_changed == True):
+        table.snapshot_changed = False
+        mqtt_gui.publish_snapshot(table.get_current_snapshot())
+
+    # wake up for the next snapshot and when module changes have been quiet for the debounce time
+    events.set_timer(EventQueue.PLAYBACK, table.get_update_delay())
+    events.set_timer(EventQueue.DEBOUNCE, table.modules_get_debounce_delay())
+
+
 # keyboard input
 def console_thread():
 
-    global global_console_input
     global running
 
     while(running):    
-        global_console_input = input()
+        console_input = input()
+        events.post(EventQueue.CONSOLE, console_input)
 
-        if (global_console_input == "shutdown"):
+        if (console_input == "shutdown"):
             break
 
 
-# main table routine
+# connect the MQTT clients and table sections and retrieve the modules
+# a coroutine, so the MQTT connections of the asyncio runtime keep running during the waits
+async def connect_table():
 
-refresh_rate = 0.02
-publish_update_rate = 20
+    print("----------------------------------------------------------------")
+    print("-------------------- Starting MQTT clients ---------------------")
+    print("----------------------------------------------------------------")
 
+    mqtt_gui.mqtt_connect()
+    table.mqtt_connect()
 
-# ask to chose local or public broker
-print("\nDo you want a local broker or public broker ? \n '1' local broker \n '2' public broker")
-choice_broker = input()
-selection_valid = 0
-while(selection_valid == 0):
-    if (choice_broker == "1") :
-        actual_broker = local_broker_ip
-        selection_valid = 1
-    elif (choice_broker == "2") :
-        actual_broker = mqtt_public_broker
-        selection_valid = 1
-    else:
-        print("invalid choice! \n select '1' for local or '2' for public broker \n")
-        choice_broker = input()
-    
-mqtt_gui.mqtt_set_broker(actual_broker)
+    while(table.mqtt_is_connected() == False):
+        await asyncio.sleep(refresh_rate)
 
+    print("----------------------------------------------------------------")
+    print("------------ Connecting to SmartGridTable sections -------------")
+    print("----------------------------------------------------------------")
 
-print("----------------------------------------------------------------")
-print("-------------------- Starting MQTT clients ---------------------")
-print("----------------------------------------------------------------")
+    # every section is rebooted, connected and asked for its modules on its own, so the slowest section sets the time
+    table.modules_enable_messages(False)
+    table.table_connect_reset()
 
-mqtt_gui.mqtt_connect()
-table.mqtt_connect()
+    start_time = perf_counter()
+    timer = 0
+    timer_limit = 10.0
+    timeout_limit = 15.0
+    timeout = False
 
-while(table.mqtt_is_connected() == False):
-    sleep(refresh_rate)
+    while(table.table_connect_step() == False and timeout == False):
 
-print("----------------------------------------------------------------")
-print("------------ Connecting to SmartGridTable sections -------------")
-print("----------------------------------------------------------------")
+        await asyncio.sleep(refresh_rate)
+        timer = perf_counter() - start_time
 
-table.table_reboot_all()
-table.modules_enable_messages(False)
+        if (timer >= timer_limit):
+            time_left = timeout_limit - timer_limit
+            print("Timeout in [" + str(time_left) + "] seconds...")
+            timer_limit = timer_limit + 1.0
 
-timer = 0
-timer_limit = 10.0
-timeout_limit = 15.0
-timeout = False
+        if (timer >= timeout_limit):
+            print("Timeout when trying to connect...")
+            print("    Waiting for -> " + ", ".join(table.table_get_pending()))
+            timeout = True
 
-while(table.table_is_connected() == False and timeout == False):
+    print("----------------------------------------------------------------")
+    print("-------------- Retrieving SmartGridTable Modules ---------------")
+    print("----------------------------------------------------------------")
 
-    sleep(refresh_rate)
-    timer = timer + refresh_rate
+    table.modules_apply_changes()
+    table.modules_print_status()
+    table.modules_enable_messages(True)
 
-    if (timer >= timer_limit):
-        time_left = timeout_limit - timer_limit
-        print("Timeout in [" + str(time_left) + "] seconds...")
-        timer_limit = timer_limit + 1.0
+    print(f"    Connect took -> {perf_counter() - start_time:.3f} seconds")
 
-    if (timer >= timeout_limit):
-        print("Timeout when trying to connect...")
-        timeout = True
 
-print("----------------------------------------------------------------")
-print("-------------- Retrieving SmartGridTable Modules ---------------")
-print("----------------------------------------------------------------")
+# keyboard input on the event loop (asyncio runtime)
+async def console_reader():
 
-table.table_retrieve_modules()
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
 
-# sleep so network modules are loaded without triggering a PyPSA update
-sleep(4.0)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except (NotImplementedError, ValueError, OSError):
+        # the event loop of Windows cannot read the console, read it in the executor instead
+        reader = None
 
-table.modules_print_status()
-table.modules_enable_messages(True)
+    while(running):
+        if (reader != None):
+            line = (await reader.readline()).decode("utf-8")
+        else:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
 
-print("----------------------------------------------------------------")
-print("------------- SmartGridTable 2022 up and running! --------------")
-print("----------------------------------------------------------------")
+        # end of input
+        if (line == ""):
+            break
 
-# seperate thread so table routine keeps running during keyboard input
-# (keyboard input stalls main thread)
-console_thread = Thread(target=console_thread)
-console_thread.start()
+        console_input = line.rstrip("\r\n")
+        events.post(EventQueue.CONSOLE, console_input)
 
-timer = 0
+        if (console_input == "shutdown"):
+            break
 
-# main routine
-while(running):
 
-    sleep(refresh_rate)
+# asyncio runtime: MQTT connections, console reader, timers and main routine on one event loop
+async def run_async():
 
-    # GUI mqtt message handler
-    if (len(mqtt_gui.message_buffer) > 0):
-        for message in mqtt_gui.message_buffer:
-            console_handler(message)
-        mqtt_gui.message_buffer.clear()
+    global events
+    global event_loop
+    global last_time
+    global worker_type
 
-    # Console input message handler
-    if (global_console_input != ""):
-        console_handler(global_console_input)
-        global_console_input  = ""
+    event_loop = asyncio.get_running_loop()
+    events = AsyncEventQueue(event_loop)
 
-    table.append_delta_time(refresh_rate)
-    table.update()
+    table.set_notify(events.post)
+    mqtt_gui.notify = events.post
 
-    timer = timer + refresh_rate
+    MQTTTransport.set_event_loop(event_loop)
 
-    if(table.modules_if_changed() or force_update == True):
-        force_update = False
-        timer = 0
+    # calculations must not block the event loop
+    if (worker_type != "off"):
+        worker_type = "executor"
+        table.solver_start(worker_type, event_loop)
 
-        if (mode == "lopf"):
-            table.network_lopf()
-            print("----------------------------------------------------------------")
+    await connect_table()
 
-        if (mode == "lpf"):
-            table.network_lpf()
-            print("----------------------------------------------------------------")
+    print("----------------------------------------------------------------")
+    print("------------- SmartGridTable 2022 up and running! --------------")
+    print("----------------------------------------------------------------")
 
-        if (mode == "pf"):
-            table.network_pf()
-            print("----------------------------------------------------------------")
+    console = event_loop.create_task(console_reader())
 
+    events.set_timer(EventQueue.PUBLISH, publish_update_rate)
+    last_time = perf_counter()
 
-    if (table.simulation_changed == True):
-        table.simulation_changed = False
+    # main routine, waits for the next event or timer
+    while(running):
+        event_type, data = await events.get()
+        handle_event(event_type, data)
 
-        if (table.get_simulation_succes() == True):
+    console.cancel()
 
-            generators  = table.get_generators_generation()
-            loads       = table.get_load_consumption()
+    # the MQTT connections are closed while the event loop still runs
+    shutdown_table()
 
-            if (len(generators) > 0):
-                mqtt_gui.publish_dataframe(generators)
 
-            if (len(loads) > 0):
-                mqtt_gui.publish_dataframe(loads)
-        
+def shutdown_table():
+    table.solver_stop()
+    table.network_close()
+    table.mqtt_disconnect()
 
-    if (table.snapshot_changed == True):
-        table.snapshot_changed = False
-        mqtt_gui.publish_snapshot(table.get_current_snapshot())
+    print("----------------------------------------------------------------")
+    print("----------------- Goodbye, until next time! --------------------")
+    print("----------------------------------------------------------------")
 
 
-    if(timer >= publish_update_rate):
-        table.mqtt_publish()
-        timer = 0
+# main table routine
+
+refresh_rate = 0.02
+publish_update_rate = 20
+
+
+# everything below only runs when started as program, not when the solver worker process imports this file
+if __name__ == "__main__":
+
+    # we take the local ip address and put it as local broker (the broker server need to run on the same computer than the one executing the code)
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.connect(("8.8.8.8", 80))
+    local_broker_ip = s.getsockname()[0]# local broker ip is the ip of the computer executing the program
+
+    print("----------------------------------------------------------------")
+    print("--------------- Loading SmartGridTable scenarios ---------------")
+    print("----------------------------------------------------------------")
+
+    use_asyncio = "--asyncio" in sys.argv
+
+    table = SmartGridTable()
+    mqtt_gui = GUI_MQTT()
+
+    table.set_notify(events.post)
+    mqtt_gui.notify = events.post
+
+    # the asyncio runtime starts its own solver worker on the event loop
+    if (worker_type != "off" and use_asyncio == False):
+        table.solver_start(worker_type)
+
+
+    # ask to chose local or public broker
+    print("\nDo you want a local broker or public broker ? \n '1' local broker \n '2' public broker")
+    choice_broker = input()
+    selection_valid = 0
+    while(selection_valid == 0):
+        if (choice_broker == "1") :
+            actual_broker = local_broker_ip
+            selection_valid = 1
+        elif (choice_broker == "2") :
+            actual_broker = mqtt_public_broker
+            selection_valid = 1
+        else:
+            print("invalid choice! \n select '1' for local or '2' for public broker \n")
+            choice_broker = input()
+
+    mqtt_gui.mqtt_set_broker(actual_broker)
+
+    if (use_asyncio):
+        asyncio.run(run_async())
+        exit()
+
+    asyncio.run(connect_table())
+
+    print("----------------------------------------------------------------")
+    print("------------- SmartGridTable 2022 up and running! --------------")
+    print("----------------------------------------------------------------")
+
+    # seperate thread so table routine keeps running during keyboard input
+    # (keyboard input stalls main thread)
+    console_thread = Thread(target=console_thread)
+    console_thread.start()
 
+    events.set_timer(EventQueue.PUBLISH, publish_update_rate)
+    last_time = perf_counter()
 
-# on program shutdown
-console_thread.join()
-table.mqtt_disconnect()
+    # main routine, waits for the next event or timer
+    while(running):
+        event_type, data = events.get()
+        handle_event(event_type, data)
 
-print("----------------------------------------------------------------")
-print("----------------- Goodbye, until next time! --------------------")
-print("----------------------------------------------------------------")
+    # on program shutdown
+    console_thread.join()
+    shutdown_table()
 
-exit()
+    exit()
@@ -0,0 +1,51 @@
+# File: AsyncEventQueue.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# EventQueue for the asyncio runtime of the application, same event types (see EventQueue.py), post() and set_timer()
+# The main routine is a coroutine which awaits get(), so the MQTT connections, console reader and timers
+# share one event loop. post() may be called from any thread (solver worker, scenario watcher)
+#
+
+import asyncio
+import time
+
+class AsyncEventQueue:
+
+    def __init__(self, event_loop):
+        self.__event_loop = event_loop
+        self.__queue  = asyncio.Queue()
+        self.__timers = {}   # event type -> deadline (time.perf_counter)
+
+
+    # may be called from any thread
+    def post(self, event_type, data=None):
+        self.__event_loop.call_soon_threadsafe(self.__queue.put_nowait, (event_type, data))
+
+
+    # (re)start the timer of an event type, None stops it
+    def set_timer(self, event_type, delay):
+        if (delay == None):
+            self.__timers.pop(event_type, None)
+        else:
+            self.__timers[event_type] = time.perf_counter() + max(delay, 0.0)
+
+
+    # next event, or (timer event type, None) when a timer expires first
+    async def get(self):
+        while (True):
+            timeout = None
+
+            if (len(self.__timers) > 0):
+                event_type = min(self.__timers, key=self.__timers.get)
+                timeout = self.__timers[event_type] - time.perf_counter()
+
+                if (timeout <= 0):
+                    del self.__timers[event_type]
+                    return (event_type, None)
+
+            try:
+                return await asyncio.wait_for(self.__queue.get(), timeout)
+            except asyncio.TimeoutError:
+                pass
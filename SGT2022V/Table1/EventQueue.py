@@ -0,0 +1,75 @@
+# File: EventQueue.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Thread-safe queue of events for the main table routine
+# MQTT callbacks, the console thread, the solver worker and the scenario watcher post (event_type, data) tuples,
+# the main routine blocks in get() and handles every event as soon as it arrives
+#
+# Timers are deadlines for events which are not caused by another thread (snapshot playback, module debounce, publishing),
+# get() waits until the earliest deadline and then returns the timer as event
+# Timers are only set from the main routine, post() may be called from any thread
+#
+
+import queue
+import time
+
+class EventQueue:
+
+    # event types
+    CONSOLE  = "console"     # data: console command
+    GUI      = "gui"         # data: command of the GUI
+    MODULES  = "modules"     # data: name of the section which queued a SectionChange
+    SOLVER   = "solver"      # results of the solver worker are available
+    SCENARIO = "scenario"    # the scenario watcher found changed files
+    PLAYBACK = "playback"    # timer: next snapshot of a dynamic scenario
+    DEBOUNCE = "debounce"    # timer: module changes are quiet for the debounce time
+    PUBLISH  = "publish"     # timer: periodic publish of all ledstrips
+
+    def __init__(self):
+        self.__queue  = queue.Queue()
+        self.__timers = {}   # event type -> deadline (time.perf_counter)
+
+
+    # may be called from any thread
+    def post(self, event_type, data=None):
+        self.__queue.put((event_type, data))
+
+
+    # (re)start the timer of an event type, None stops it
+    def set_timer(self, event_type, delay):
+        if (delay == None):
+            self.__timers.pop(event_type, None)
+        else:
+            self.__timers[event_type] = time.perf_counter() + max(delay, 0.0)
+
+
+    # next event, or (timer event type, None) when a timer expires first
+    def get(self):
+        while (True):
+            timeout = None
+
+            if (len(self.__timers) > 0):
+                event_type = min(self.__timers, key=self.__timers.get)
+                timeout = self.__timers[event_type] - time.perf_counter()
+
+                if (timeout <= 0):
+                    del self.__timers[event_type]
+                    return (event_type, None)
+
+            try:
+                return self.__queue.get(timeout=timeout)
+            except queue.Empty:
+                pass
+
+
+    # events which are already waiting, without blocking
+    def get_pending(self):
+        events = []
+
+        while (True):
+            try:
+                events.append(self.__queue.get_nowait())
+            except queue.Empty:
+                return events
@@ -0,0 +1,100 @@
+# File: FrameCompiler.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Precomputed ledstrip frames for the playback of dynamic scenarios
+# After a calculation the whole horizon is known, so the ledstrip values and the MQTT message of every section
+# and every snapshot are computed at once. Playback of a snapshot then only publishes the precomputed bytes
+#
+# The messages of one section are stored in one buffer, with the start of every snapshot in an offsets array
+# A timeline is only valid as long as the error flags of the ledstrips and the active state of the sections
+# are the same as when it was compiled, otherwise the ledstrips are refreshed the normal way
+#
+
+from Timer import Timer
+
+import numpy as np
+
+class FrameCompiler:
+
+    def __init__(self):
+        self.__frames = {}
+        self.num_of_snapshots = 0
+
+
+    def clear(self):
+        self.__frames.clear()
+        self.num_of_snapshots = 0
+
+
+    def compile(self, lines_p0, sections):
+        timer = Timer()
+        timer.start()
+
+        self.clear()
+
+        for section in sections:
+            bank = section.ledstrip_bank
+
+            active_power = bank.get_flows(lines_p0)
+            direction, state, speed, load = bank.compute(active_power, bank.error_flags, section.active)
+
+            messages = section.get_message_strings_all(state, load, direction, speed)
+            payloads = [message.encode("utf-8") for message in messages]
+
+            offsets = np.zeros(len(payloads) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(payload) for payload in payloads])
+
+            self.__frames[section.name] = {
+                "buffer"        : b"".join(payloads),
+                "offsets"       : offsets,
+                "active_power"  : active_power,
+                "direction"     : direction,
+                "state"         : state,
+                "speed"         : speed,
+                "load"          : load,
+                "error_flags"   : bank.error_flags.copy(),
+                "active"        : section.active }
+
+        self.num_of_snapshots = len(lines_p0)
+
+        timer.stop()
+        print(f"    Frames took -> {timer.elapsed_time:0.6f} seconds ({self.num_of_snapshots} snapshots)")
+
+
+    # frames exist for the snapshot and nothing changed which is not part of the frames
+    def is_valid(self, sections, snapshot):
+        if (snapshot >= self.num_of_snapshots):
+            return False
+
+        for section in sections:
+            frames = self.__frames.get(section.name)
+
+            if (frames == None):
+                return False
+
+            if (frames["active"] != section.active):
+                return False
+
+            if (not np.array_equal(frames["error_flags"], section.ledstrip_bank.error_flags)):
+                return False
+
+        return True
+
+
+    def get_payload(self, section, snapshot):
+        frames = self.__frames[section.name]
+        offsets = frames["offsets"]
+        return frames["buffer"][offsets[snapshot]:offsets[snapshot + 1]]
+
+
+    # ledstrip values of the snapshot, so ledstrips and messages stay in sync
+    def apply(self, section, snapshot):
+        frames = self.__frames[section.name]
+        section.ledstrip_bank.set_values(
+            frames["active_power"][snapshot],
+            frames["direction"][snapshot],
+            frames["state"][snapshot],
+            frames["speed"][snapshot],
+            frames["load"][snapshot])
@@ -4,25 +4,29 @@
 # Authors: Jop Merz
 #
 # Description:
-# 
+# MQTT client of the GUI, uses the shared connection (MQTTTransport) of its broker
 #
 
 from pickle import NONE
-import paho.mqtt.client as mqtt
+from MQTTTransport import MQTTTransport
 import json
 
+from EventQueue import EventQueue
+
 class GUI_MQTT:
 
     def __init__(self):
-        self.__mqtt_client    = mqtt.Client()
+        self.__mqtt_transport = None
         self.__mqtt_broker    = NONE #"broker.hivemq.com"
         self.__mqtt_topic     = "SmartDemoTable/GUI"
         self.__mqtt_port      = 1883
         self.__mqtt_subscribe = self.__mqtt_topic + "/Outgoing"
         self.__mqtt_publish   = self.__mqtt_topic + "/Ingoing"
-        self.__mqtt_connected = False
         self.message_buffer = []
 
+        # called with (event_type, data) from the MQTT thread for every command, otherwise commands are buffered
+        self.notify = None
+
     
     def mqtt_set_broker(self, broker):
         self.__mqtt_broker = broker
@@ -37,22 +41,23 @@ class GUI_MQTT:
 
 
     def mqtt_connect(self):
-        self.__mqtt_client.on_connect = self.on_connect
-        self.__mqtt_client.on_message = self.on_message
-
-        if (self.__mqtt_connected == False):
-            self.__mqtt_client.connect(self.__mqtt_broker, self.__mqtt_port)
-            self.__mqtt_client.loop_start()
+        self.__mqtt_transport = MQTTTransport.get_transport(self.__mqtt_broker, self.__mqtt_port)
+        self.__mqtt_transport.subscribe(self.__mqtt_subscribe, self.on_message)
+        self.__mqtt_transport.connect()
     
 
     def mqtt_disconnect(self):
-        if (self.__mqtt_connected == True):
-            self.__mqtt_client.loop_stop()
-            self.__mqtt_connected = False
+        if (self.__mqtt_transport != None):
+            self.__mqtt_transport.unsubscribe(self.__mqtt_subscribe)
+
+
+    def mqtt_is_connected(self):
+        return self.__mqtt_transport != None and self.__mqtt_transport.is_connected()
 
 
     def mqtt_publish(self, message):
-        self.__mqtt_client.publish(self.__mqtt_publish, message)
+        if (self.__mqtt_transport != None):
+            self.__mqtt_transport.publish(self.__mqtt_publish, message)
 
 
     def publish_snapshot(self, snapshot):
@@ -68,16 +73,6 @@ class GUI_MQTT:
         self.mqtt_publish(json_string)
 
 
-    def on_connect(self, client, userdata, flags, rc):
-        self.__mqtt_client.subscribe(self.__mqtt_subscribe)
-
-        if(rc != 0):
-            print("GUI: Error: " + str(rc))
-        else:
-            self.__mqtt_connected = True
-            print("GUI: Succesfully started GUI MQTT client")
-
-
     def on_message(self, client, userdata, msg):
         message = str(msg.payload.decode("utf-8"))  #removes b'' in string
 
@@ -88,5 +83,8 @@ class GUI_MQTT:
             return
 
         if (command):
-            self.message_buffer.append(command)
+            if (self.notify != None):
+                self.notify(EventQueue.GUI, command)
+            else:
+                self.message_buffer.append(command)
 
@@ -0,0 +1,88 @@
+# File: InMemorySolver.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# LOPF solver backend which keeps the solver inside this process (solver backend highs)
+# network.lopf() with GLPK writes an LP file, starts a glpsol process and reads its output files back,
+# for the table network this takes longer than the solve itself
+# This backend builds the PyPSA pyomo model and passes it to HiGHS through memory, the solver object is kept between calculations
+#
+# lopf() returns the same (status, condition) tuple as network.lopf() and stores the time of every stage:
+#   build  -> building the PyPSA pyomo model
+#   solve  -> passing the model to HiGHS and solving it
+#   output -> writing the results back into the PyPSA network
+#
+# Requires pyomo with the HiGHS interface (pip install pyomo highspy), otherwise is_available() returns False
+#
+
+from Timer import Timer
+
+try:
+    import pyomo.environ
+    from pyomo.contrib.appsi.solvers import Highs
+    from pyomo.contrib.appsi.base import TerminationCondition
+    from pypsa.opf import network_lopf_build_model, extract_optimisation_results
+except ImportError:
+    Highs = None
+
+class InMemorySolver:
+
+    formulation = "angles"
+
+    def __init__(self):
+        self.__solver    = None
+        self.__available = None
+
+        self.stage_times = {}
+
+
+    def is_available(self):
+        if (self.__available == None):
+            self.__available = Highs != None and bool(Highs().available())
+        return self.__available
+
+
+    def lopf(self, network):
+
+        if (self.__solver == None):
+            self.__solver = Highs()
+            self.__solver.config.load_solution = False
+            self.__solver.config.stream_solver = False
+
+        self.stage_times.clear()
+        snapshots = network.snapshots
+
+        timer = Timer()
+        timer.start()
+
+        network_lopf_build_model(network, snapshots, formulation=self.formulation)
+
+        timer.stop()
+        self.stage_times["build"] = timer.elapsed_time
+        timer.start()
+
+        results = self.__solver.solve(network.model)
+
+        timer.stop()
+        self.stage_times["solve"] = timer.elapsed_time
+
+        if (results.termination_condition != TerminationCondition.optimal):
+            return ("warning", results.termination_condition.name)
+
+        timer.start()
+
+        # PyPSA reads the objective and duals the same way as from a solver results file
+        results.solution_loader.load_vars()
+
+        for constraint, value in results.solution_loader.get_duals().items():
+            network.model.dual[constraint] = value
+
+        network.results = {"Problem" : [{"Upper bound" : results.best_feasible_objective}]}
+
+        extract_optimisation_results(network, snapshots, self.formulation, free_pyomo=True)
+
+        timer.stop()
+        self.stage_times["output"] = timer.elapsed_time
+
+        return ("ok", "optimal")
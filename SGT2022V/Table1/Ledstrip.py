@@ -6,50 +6,131 @@
 # Class which represents a ledstrip on a table section
 # This class contains the led flow speed, color, direction and state
 #
+# The values are stored in a LedstripBank (arrays of all ledstrips of a section), this object is a view on one element
+# A ledstrip which is created without bank gets its own bank of one ledstrip
+#
 
 class Ledstrip:
 
-    def __init__(self, voltage):
-        self.state = "Passive"
+    def __init__(self, voltage, bank=None, index=0):
         self.voltage = voltage
-        self.load = "Normal"
-        self.direction = 0
-        self.speed  = 0
-        self.error  = False
-        self.active = True
 
-        self.stress_high        = 0
-        self.stress_critical    = 0
+        if (bank == None):
+            from LedstripBank import LedstripBank
 
-        self.speed_med          = 0
-        self.speed_high         = 0
+            bank = LedstripBank(voltage)
+            bank.add_ledstrip()
+            bank.ledstrips[index] = self
 
-        self.previous_state     = ""
-        self.previous_load      = ""
-        self.previous_speed     = 0
-        self.previous_direction = 0
+        self.bank  = bank
+        self.index = index
 
-        self.line = ""
-        self.active_power = 0
 
+    @property
+    def state(self):
+        return self.bank.states[self.bank.state[self.index]]
 
-    def is_changed(self):
-        changed = False
+    @state.setter
+    def state(self, state):
+        self.bank.state[self.index] = self.bank.states.index(state)
+
+    @property
+    def load(self):
+        return self.bank.loads[self.bank.load[self.index]]
+
+    @load.setter
+    def load(self, load):
+        self.bank.load[self.index] = self.bank.loads.index(load)
+
+    @property
+    def direction(self):
+        return int(self.bank.direction[self.index])
+
+    @direction.setter
+    def direction(self, direction):
+        self.bank.direction[self.index] = direction
+
+    @property
+    def speed(self):
+        return int(self.bank.speed[self.index])
+
+    @speed.setter
+    def speed(self, speed):
+        self.bank.speed[self.index] = speed
+
+    @property
+    def error(self):
+        return bool(self.bank.error_flags[self.index])
+
+    @error.setter
+    def error(self, error):
+        self.bank.error_flags[self.index] = error
+
+    @property
+    def active(self):
+        return bool(self.bank.active_flags[self.index])
+
+    @active.setter
+    def active(self, active):
+        self.bank.active_flags[self.index] = active
+
+    @property
+    def active_power(self):
+        return float(self.bank.active_power[self.index])
 
-        if (self.previous_state != self.state or
-            self.previous_load != self.load or
-            self.previous_speed != self.speed or
-            self.previous_direction != self.direction):
-            changed = True
+    @active_power.setter
+    def active_power(self, active_power):
+        self.bank.active_power[self.index] = active_power
 
-        return changed
+    @property
+    def line(self):
+        return self.bank.lines[self.index]
+
+    @line.setter
+    def line(self, line):
+        self.bank.set_line(self.index, line)
+
+    @property
+    def stress_high(self):
+        return float(self.bank.stress_high[self.index])
+
+    @property
+    def stress_critical(self):
+        return float(self.bank.stress_critical[self.index])
+
+    @property
+    def speed_med(self):
+        return float(self.bank.speed_med[self.index])
+
+    @property
+    def speed_high(self):
+        return float(self.bank.speed_high[self.index])
+
+    @property
+    def previous_state(self):
+        code = self.bank.previous_state[self.index]
+        return self.bank.states[code] if (code >= 0) else ""
+
+    @property
+    def previous_load(self):
+        code = self.bank.previous_load[self.index]
+        return self.bank.loads[code] if (code >= 0) else ""
+
+    @property
+    def previous_speed(self):
+        return int(self.bank.previous_speed[self.index])
+
+    @property
+    def previous_direction(self):
+        return int(self.bank.previous_direction[self.index])
+
+
+    def is_changed(self):
+        return bool(self.bank.is_changed(self.index))
 
 
     def reset_changed_flags(self):
-        self.previous_state = self.state
-        self.previous_load = self.load
-        self.previous_speed = self.speed
-        self.previous_direction = self.direction
+        self.bank.reset_changed_flags(self.index)
 
 
     def get_message_string(self):
@@ -66,40 +147,11 @@ class Ledstrip:
 
 
     def set_stress_levels(self, speed_med, speed_high, stress_high, stress_critical):
-        self.speed_med = speed_med
-        self.speed_high = speed_high
-        self.stress_high = stress_high
-        self.stress_critical = stress_critical
+        self.bank.speed_med[self.index] = speed_med
+        self.bank.speed_high[self.index] = speed_high
+        self.bank.stress_high[self.index] = stress_high
+        self.bank.stress_critical[self.index] = stress_critical
 
 
     def refresh(self):
-        if (self.active_power >= 0.0):
-            self.direction = 0
-        else:
-            self.direction = 1
-
-        active_power_abs = abs(self.active_power)
-
-        if(self.error):
-            self.state = "Error"
-        elif (self.active_power <= 0.001 and self.active_power >= -0.001):
-            self.state = "Passive"
-        else:
-            self.state = "Active"
-
-        if(self.active == False):
-            self.state = "Off"
-
-        if (active_power_abs <= self.speed_med):
-            self.speed = 1
-        elif (active_power_abs <= self.speed_high):
-            self.speed = 2
-        else:
-            self.speed = 3
-
-        if (active_power_abs <= self.stress_high):
-            self.load = "Normal"
-        elif (active_power_abs <= self.stress_critical):
-            self.load = "High"
-        else:
-            self.load = "Critical"
+        self.bank.refresh(slice(self.index, self.index + 1))
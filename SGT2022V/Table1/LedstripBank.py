@@ -0,0 +1,171 @@
+# File: LedstripBank.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# All ledstrips of one table section stored as arrays (one element per ledstrip)
+# The Ledstrip objects of a section are views on one element of the bank, so the section refreshes all
+# of its ledstrips at once instead of one ledstrip at a time
+#
+# States and loads are stored as codes, index in the states and loads lists below
+# The column map links every ledstrip to its column in the line flow matrix (lines_p0) of a SimulationResult,
+# it is only rebuilt when the columns of the results change
+#
+
+from Ledstrip import Ledstrip
+
+import numpy as np
+
+class LedstripBank:
+
+    states = ["Passive", "Active", "Error", "Off"]
+    loads  = ["Normal", "High", "Critical"]
+
+    passive = 0
+    active  = 1
+    error   = 2
+    off     = 3
+
+    def __init__(self, voltage):
+        self.voltage = voltage
+        self.ledstrips = []
+        self.lines = []
+
+        self.active_power   = np.zeros(0)
+        self.direction      = np.zeros(0, dtype=np.int8)
+        self.speed          = np.zeros(0, dtype=np.int8)
+        self.load           = np.zeros(0, dtype=np.int8)
+        self.state          = np.zeros(0, dtype=np.int8)
+        self.error_flags    = np.zeros(0, dtype=bool)
+        self.active_flags   = np.zeros(0, dtype=bool)
+
+        # thresholds
+        self.speed_med          = np.zeros(0)
+        self.speed_high         = np.zeros(0)
+        self.stress_high        = np.zeros(0)
+        self.stress_critical    = np.zeros(0)
+
+        # values of the last publish, -1 means never published
+        self.previous_state     = np.zeros(0, dtype=np.int8)
+        self.previous_load      = np.zeros(0, dtype=np.int8)
+        self.previous_speed     = np.zeros(0, dtype=np.int8)
+        self.previous_direction = np.zeros(0, dtype=np.int8)
+
+        # ledstrip -> column in the line flow matrix
+        self.__columns      = np.zeros(0, dtype=int)
+        self.__columns_key  = None
+
+
+    def add_ledstrip(self):
+        index = len(self.ledstrips)
+
+        self.active_power   = np.append(self.active_power, 0.0)
+        self.direction      = np.append(self.direction, np.int8(0))
+        self.speed          = np.append(self.speed, np.int8(0))
+        self.load           = np.append(self.load, np.int8(0))
+        self.state          = np.append(self.state, np.int8(self.passive))
+        self.error_flags    = np.append(self.error_flags, False)
+        self.active_flags   = np.append(self.active_flags, True)
+
+        self.speed_med          = np.append(self.speed_med, 0.0)
+        self.speed_high         = np.append(self.speed_high, 0.0)
+        self.stress_high        = np.append(self.stress_high, 0.0)
+        self.stress_critical    = np.append(self.stress_critical, 0.0)
+
+        self.previous_state     = np.append(self.previous_state, np.int8(-1))
+        self.previous_load      = np.append(self.previous_load, np.int8(-1))
+        self.previous_speed     = np.append(self.previous_speed, np.int8(0))
+        self.previous_direction = np.append(self.previous_direction, np.int8(0))
+
+        self.lines.append("")
+        self.__columns_key = None
+
+        ledstrip = Ledstrip(self.voltage, self, index)
+        self.ledstrips.append(ledstrip)
+
+        return ledstrip
+
+
+    def set_line(self, index, line):
+        self.lines[index] = line
+        self.__columns_key = None
+
+
+    # recalculate direction, state, speed and load of the given ledstrips (default all)
+    def refresh(self, index=slice(None)):
+        direction, state, speed, load = self.compute(self.active_power[index], self.error_flags[index], self.active_flags[index], index)
+
+        self.direction[index] = direction
+        self.state[index]     = state
+        self.speed[index]     = speed
+        self.load[index]      = load
+
+
+    # direction, state, speed and load codes of the given active power, arrays of (... x ledstrips)
+    def compute(self, active_power, error_flags, active_flags, index=slice(None)):
+        active_power_abs = np.abs(active_power)
+
+        direction = np.where(active_power >= 0.0, 0, 1).astype(np.int8)
+
+        state = np.where(active_power_abs <= 0.001, self.passive, self.active)
+        state = np.where(error_flags, self.error, state)
+        state = np.where(active_flags, state, self.off).astype(np.int8)
+
+        speed = np.where(active_power_abs <= self.speed_med[index], 1,
+                np.where(active_power_abs <= self.speed_high[index], 2, 3)).astype(np.int8)
+
+        load = np.where(active_power_abs <= self.stress_high[index], 0,
+               np.where(active_power_abs <= self.stress_critical[index], 1, 2)).astype(np.int8)
+
+        return direction, state, speed, load
+
+
+    # line flows of all snapshots (snapshots x ledstrips) from a lines_p0 dataframe
+    def get_flows(self, lines_p0):
+        columns = self.__get_columns(lines_p0)
+        return np.where(columns >= 0, lines_p0.to_numpy()[:, columns], 0.0)
+
+
+    # take the line flows of one snapshot from a lines_p0 dataframe and refresh all ledstrips
+    def update_from_flows(self, lines_p0, snapshot, active):
+        columns = self.__get_columns(lines_p0)
+        flows = lines_p0.to_numpy()[snapshot]
+
+        self.active_power[:] = np.where(columns >= 0, flows[columns], 0.0)
+        self.active_flags[:] = active
+        self.refresh()
+
+
+    # set all values at once, used for precomputed frames
+    def set_values(self, active_power, direction, state, speed, load):
+        self.active_power[:] = active_power
+        self.direction[:]    = direction
+        self.state[:]        = state
+        self.speed[:]        = speed
+        self.load[:]         = load
+
+
+    def update_active(self, active):
+        self.active_flags[:] = active
+        self.refresh()
+
+
+    def __get_columns(self, lines_p0):
+        if (self.__columns_key is not lines_p0.columns):
+            self.__columns = lines_p0.columns.get_indexer(self.lines)
+            self.__columns_key = lines_p0.columns
+        return self.__columns
+
+
+    def is_changed(self, index=slice(None)):
+        return ((self.previous_state[index] != self.state[index]) |
+                (self.previous_load[index] != self.load[index]) |
+                (self.previous_speed[index] != self.speed[index]) |
+                (self.previous_direction[index] != self.direction[index]))
+
+
+    def reset_changed_flags(self, index=slice(None)):
+        self.previous_state[index]     = self.state[index]
+        self.previous_load[index]      = self.load[index]
+        self.previous_speed[index]     = self.speed[index]
+        self.previous_direction[index] = self.direction[index]
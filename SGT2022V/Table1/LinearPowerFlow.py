@@ -0,0 +1,188 @@
+# File: LinearPowerFlow.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Linear power flow (LPF) of every snapshot at once, for dynamic scenarios
+# network.lpf() of PyPSA builds the topology, the matrices and the bus injections again for every sub-network and every call,
+# which takes most of the time when the table has several islands and many snapshots
+#
+# Here the bus susceptance matrix of the static lines is built once, without the slack bus of every island, and factorised
+# once for each combination of slack buses. A calculation is then:
+#   - the bus injection matrix (snapshots x buses) from the p_set of all generators, loads, storage units and links
+#   - one multi right-hand side solve for the voltage angles of all snapshots
+#   - the line flows from the angle differences, the slack generator of every island takes up the imbalance
+# The results are written into the PyPSA network, as if network.lpf() was called
+#
+# Slack buses and generators are chosen like PyPSA does: the first generator with control "Slack" in an island,
+# otherwise the first generator of the island (which then gets control "Slack"), otherwise the first bus
+#
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from scipy.sparse.csgraph import connected_components
+
+class LinearPowerFlow:
+
+    def __init__(self):
+        self.bus_names  = []
+        self.line_names = []
+
+        self.__bus_index    = {}
+        self.__islands      = None
+        self.__incidence    = None     # lines x buses
+        self.__susceptance  = None     # per unit susceptance of every line
+
+        # factorised susceptance matrix per combination of slack buses
+        self.__factorisations = {}
+
+
+    # admittance of the static lines, links are not part of the LPF but set as injections
+    def set_topology(self, buses, lines):
+        self.bus_names  = [bus.name for bus in buses]
+        self.line_names = [line.name for line in lines]
+
+        self.__bus_index = {}
+        for i in range(0, len(self.bus_names)):
+            self.__bus_index[self.bus_names[i]] = i
+
+        v_nom = np.array([float(bus.v_nom) for bus in buses])
+        bus0  = np.array([self.__bus_index[line.bus0] for line in lines], dtype=int)
+        bus1  = np.array([self.__bus_index[line.bus1] for line in lines], dtype=int)
+
+        num_buses = len(self.bus_names)
+        num_lines = len(self.line_names)
+        rows = np.arange(num_lines)
+
+        self.__incidence = sp.csr_matrix(
+            (np.concatenate([np.ones(num_lines), -np.ones(num_lines)]),
+            (np.concatenate([rows, rows]), np.concatenate([bus0, bus1]))),
+            shape=(num_lines, num_buses))
+
+        # per unit reactance like PyPSA, on the nominal voltage of bus0
+        self.__susceptance = np.array([1.0 / (float(line.x) / v_nom[self.__bus_index[line.bus0]] ** 2) for line in lines])
+
+        adjacency = sp.csr_matrix((np.ones(num_lines), (bus0, bus1)), shape=(num_buses, num_buses))
+        num_islands, self.__islands = connected_components(adjacency, directed=False)
+
+        self.__factorisations.clear()
+
+
+    def is_available(self, network):
+        return len(self.bus_names) > 0 and network.buses.index.isin(self.bus_names).all() and network.lines.index.isin(self.line_names).all()
+
+
+    # LPF of all snapshots of the network, the results are written into the network
+    def solve(self, network):
+        snapshots = network.snapshots
+        num_buses = len(self.bus_names)
+
+        slack_buses, slack_generators = self.__find_slacks(network)
+
+        # injections of the one port components (snapshots x buses)
+        injections = np.zeros((len(snapshots), num_buses))
+        one_ports  = {}
+
+        for class_name, sign in [("Generator", 1.0), ("Load", -1.0), ("StorageUnit", 1.0)]:
+            components = network.df(class_name)
+            p_set = network.get_switchable_as_dense(class_name, "p_set")
+            one_ports[class_name] = p_set
+
+            if (len(components) > 0):
+                injections = injections + sign * (p_set.to_numpy(dtype=float) @ self.__get_bus_matrix(components.bus))
+
+        # links dispatch as set, from bus0 to bus1
+        links = network.links
+        link_p0 = network.get_switchable_as_dense("Link", "p_set")
+        link_p1 = -link_p0 * links.efficiency
+
+        if (len(links) > 0):
+            injections = injections - link_p0.to_numpy(dtype=float) @ self.__get_bus_matrix(links.bus0)
+            injections = injections - link_p1.to_numpy(dtype=float) @ self.__get_bus_matrix(links.bus1)
+
+        # voltage angles of all snapshots with one solve, the slack buses stay at zero
+        other_buses = np.setdiff1d(np.arange(num_buses), slack_buses)
+        angles = np.zeros((len(snapshots), num_buses))
+
+        if (len(other_buses) > 0 and len(self.line_names) > 0):
+            factorisation = self.__get_factorisation(tuple(slack_buses), other_buses)
+            angles[:, other_buses] = factorisation.solve(np.ascontiguousarray(injections[:, other_buses].T)).T
+
+        line_flows = (self.__incidence @ angles.T).T * self.__susceptance
+
+        # the slack of every island takes up the imbalance
+        imbalance = np.zeros((len(slack_buses), len(snapshots)))
+        np.add.at(imbalance, self.__islands, injections.T)
+        slack_adjustment = -imbalance.T
+
+        bus_p = injections.copy()
+        bus_p[:, slack_buses] = bus_p[:, slack_buses] + slack_adjustment
+
+        generators_p = one_ports["Generator"].copy()
+        for i in range(0, len(slack_buses)):
+            if (slack_generators[i] != None):
+                generators_p[slack_generators[i]] = generators_p[slack_generators[i]] + slack_adjustment[:, i]
+
+        line_flows = pd.DataFrame(line_flows, index=snapshots, columns=self.line_names)[network.lines.index]
+        bus_p = pd.DataFrame(bus_p, index=snapshots, columns=self.bus_names)[network.buses.index]
+        angles = pd.DataFrame(angles, index=snapshots, columns=self.bus_names)[network.buses.index]
+
+        network.buses_t.p          = bus_p
+        network.buses_t.v_ang      = angles
+        network.buses_t.v_mag_pu   = pd.DataFrame(1.0, index=snapshots, columns=network.buses.index)
+        network.lines_t.p0         = line_flows
+        network.lines_t.p1         = -line_flows
+        network.generators_t.p     = generators_p
+        network.loads_t.p          = one_ports["Load"]
+        network.storage_units_t.p  = one_ports["StorageUnit"]
+        network.links_t.p0         = link_p0
+        network.links_t.p1         = link_p1
+
+
+    # (components x buses) matrix which sums the components on every bus
+    def __get_bus_matrix(self, buses):
+        rows = np.array([self.__bus_index[bus] for bus in buses], dtype=int)
+        return sp.csr_matrix((np.ones(len(rows)), (np.arange(len(rows)), rows)), shape=(len(rows), len(self.bus_names)))
+
+
+    # slack bus and slack generator (None without generators) of every island
+    def __find_slacks(self, network):
+        generators = network.generators
+        generator_islands = self.__islands[[self.__bus_index[bus] for bus in generators.bus]]
+
+        slack_buses      = []
+        slack_generators = []
+
+        for island in range(0, self.__islands.max() + 1):
+            island_generators = generators[generator_islands == island]
+
+            if (len(island_generators) == 0):
+                slack_buses.append(int(np.flatnonzero(self.__islands == island)[0]))
+                slack_generators.append(None)
+                continue
+
+            slacks = island_generators.index[island_generators.control == "Slack"]
+
+            if (len(slacks) == 0):
+                slack_generator = island_generators.index[0]
+                generators.loc[slack_generator, "control"] = "Slack"
+            else:
+                slack_generator = slacks[0]
+
+            slack_buses.append(self.__bus_index[generators.at[slack_generator, "bus"]])
+            slack_generators.append(slack_generator)
+
+        return np.array(slack_buses, dtype=int), slack_generators
+
+
+    def __get_factorisation(self, slack_buses, other_buses):
+        factorisation = self.__factorisations.get(slack_buses)
+
+        if (factorisation == None):
+            bus_susceptance = (self.__incidence.T @ sp.diags(self.__susceptance) @ self.__incidence).tocsc()
+            factorisation = splu(bus_susceptance[other_buses, :][:, other_buses].tocsc())
+            self.__factorisations[slack_buses] = factorisation
+
+        return factorisation
@@ -0,0 +1,248 @@
+# File: MQTTTransport.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# One MQTT connection (and one network thread) per broker, shared by all table sections and the GUI
+# Users subscribe a topic with a handler, incoming messages are routed to the handler of their topic
+# Publishing goes through the same client, the number of connections does not grow with the number of sections
+#
+# Use get_transport() instead of creating a transport, so every user of a broker gets the same connection
+# Subscriptions are repeated after every (re)connect, handlers run on the network thread of the transport
+# connect() does not block: the connection is made by the network thread (or coroutine), a failed or lost connection
+# is retried with an exponential backoff between reconnect_delay_min and reconnect_delay_max seconds
+#
+# With set_event_loop() the transports run on an asyncio event loop instead of a network thread (asyncio runtime):
+# the socket is watched with add_reader() / add_writer(), a coroutine keeps the connection alive and reconnects,
+# the TCP connect itself runs in the default executor so it does not block the loop. Handlers then run on the loop
+#
+
+import paho.mqtt.client as mqtt
+import asyncio
+import threading
+
+class MQTTTransport:
+
+    default_broker = "broker.hivemq.com"
+    default_port   = 1883
+
+    # (broker, port) -> transport
+    __transports = {}
+    __transports_lock = threading.Lock()
+
+    # seconds between connection attempts, doubled after every failed attempt
+    reconnect_delay_min = 1.0
+    reconnect_delay_max = 32.0
+
+    # asyncio event loop of all transports, None uses a network thread per transport
+    __event_loop = None
+
+    @classmethod
+    def set_event_loop(cls, event_loop):
+        with cls.__transports_lock:
+            cls.__event_loop = event_loop
+
+            for transport in cls.__transports.values():
+                transport.attach(event_loop)
+
+    @classmethod
+    def get_transport(cls, broker=None, port=None):
+        if (broker == None):
+            broker = cls.default_broker
+        if (port == None):
+            port = cls.default_port
+
+        with cls.__transports_lock:
+            transport = cls.__transports.get((broker, port))
+
+            if (transport == None):
+                transport = MQTTTransport(broker, port)
+                transport.attach(cls.__event_loop)
+                cls.__transports[(broker, port)] = transport
+
+            return transport
+
+
+    def __init__(self, broker, port):
+        self.broker = broker
+        self.port   = port
+
+        self.__mqtt_client = mqtt.Client()
+        self.__mqtt_client.on_connect    = self.on_connect
+        self.__mqtt_client.on_connect_fail = self.on_connect_fail
+        self.__mqtt_client.on_disconnect = self.on_disconnect
+        self.__mqtt_client.on_message    = self.on_message
+
+        # topic -> handler(client, userdata, msg)
+        self.__handlers = {}
+        self.__lock = threading.Lock()
+
+        self.__mqtt_client.reconnect_delay_set(self.reconnect_delay_min, self.reconnect_delay_max)
+
+        self.__started   = False
+        self.__connected = False
+        self.__reconnect_delay = self.reconnect_delay_min
+
+        self.__event_loop = None
+
+
+    # run the network I/O on an asyncio event loop, only before the connection is started
+    def attach(self, event_loop):
+        if (self.__started == True):
+            return
+
+        self.__event_loop = event_loop
+
+        if (event_loop != None):
+            self.__mqtt_client.on_socket_open             = self.on_socket_open
+            self.__mqtt_client.on_socket_close            = self.on_socket_close
+            self.__mqtt_client.on_socket_register_write   = self.on_socket_register_write
+            self.__mqtt_client.on_socket_unregister_write = self.on_socket_unregister_write
+
+
+    # start the connection and its network thread (or coroutine), does nothing when already started
+    def connect(self):
+        if (self.__started == True):
+            return
+
+        self.__started = True
+
+        self.__mqtt_client.connect_async(self.broker, self.port)
+
+        if (self.__event_loop == None):
+            self.__mqtt_client.loop_start()
+        else:
+            asyncio.run_coroutine_threadsafe(self.__run_async(), self.__event_loop)
+
+
+    def disconnect(self):
+        if (self.__started == True):
+            self.__started = False
+            self.__mqtt_client.disconnect()
+
+            if (self.__event_loop == None):
+                self.__mqtt_client.loop_stop()
+
+            self.__connected = False
+            print("MQTT: Closed connection to " + str(self.broker))
+
+
+    def is_connected(self):
+        return self.__connected
+
+
+    def subscribe(self, topic, handler):
+        with self.__lock:
+            self.__handlers[topic] = handler
+
+        if (self.__connected):
+            self.__mqtt_client.subscribe(topic)
+
+
+    def unsubscribe(self, topic):
+        with self.__lock:
+            handler = self.__handlers.pop(topic, None)
+
+        if (handler != None and self.__connected):
+            self.__mqtt_client.unsubscribe(topic)
+
+
+    def get_num_of_subscriptions(self):
+        with self.__lock:
+            return len(self.__handlers)
+
+
+    def is_subscribed(self, topic):
+        with self.__lock:
+            return topic in self.__handlers
+
+
+    def publish(self, topic, payload):
+        self.__mqtt_client.publish(topic, payload)
+
+
+    def on_connect(self, client, userdata, flags, rc):
+        # rc is the error code returned when connecting to the broker
+        if (rc != 0):
+            print("MQTT: Error: " + str(rc))
+            return
+
+        with self.__lock:
+            topics = list(self.__handlers.keys())
+
+        if (len(topics) > 0):
+            self.__mqtt_client.subscribe([(topic, 0) for topic in topics])
+
+        self.__connected = True
+        self.__reconnect_delay = self.reconnect_delay_min
+        print("MQTT: Succesfully connected to " + str(self.broker) + " -> " + str(len(topics)) + " topics")
+
+
+    def on_connect_fail(self, client, userdata):
+        print("MQTT: Connection to " + str(self.broker) + " failed, retrying...")
+
+
+    def on_disconnect(self, client, userdata, rc):
+        self.__connected = False
+
+
+    # connect, then keep the connection alive until it is lost or closed, runs on the event loop
+    async def __run_async(self):
+        while (self.__started):
+            try:
+                await self.__event_loop.run_in_executor(None, self.__mqtt_client.reconnect)
+            except (OSError, ValueError) as error:
+                print("MQTT: Connection to " + str(self.broker) + " failed -> " + str(error))
+                await self.__reconnect_wait()
+                continue
+
+            while (self.__started and self.__mqtt_client.loop_misc() == mqtt.MQTT_ERR_SUCCESS):
+                await asyncio.sleep(1.0)
+
+            self.__connected = False
+
+            if (self.__started):
+                await self.__reconnect_wait()
+
+
+    async def __reconnect_wait(self):
+        await asyncio.sleep(self.__reconnect_delay)
+        self.__reconnect_delay = min(self.__reconnect_delay * 2, self.reconnect_delay_max)
+
+
+    # socket callbacks of paho, these can be called from the executor during the connect
+    # file descriptors are used, because paho closes the socket right after on_socket_close
+    def on_socket_open(self, client, userdata, sock):
+        self.__call_on_loop(self.__event_loop.add_reader, sock.fileno(), client.loop_read)
+
+
+    def on_socket_close(self, client, userdata, sock):
+        self.__call_on_loop(self.__event_loop.remove_reader, sock.fileno())
+
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.__call_on_loop(self.__event_loop.add_writer, sock.fileno(), client.loop_write)
+
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.__call_on_loop(self.__event_loop.remove_writer, sock.fileno())
+
+
+    def __call_on_loop(self, callback, *args):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if (running_loop is self.__event_loop):
+            callback(*args)
+        else:
+            self.__event_loop.call_soon_threadsafe(callback, *args)
+
+
+    def on_message(self, client, userdata, msg):
+        with self.__lock:
+            handler = self.__handlers.get(msg.topic)
+
+        if (handler != None):
+            handler(client, userdata, msg)
@@ -0,0 +1,333 @@
+# File: MeritOrder.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Fast path for LOPF calculations in which no network constraint can bind
+# Lines and dynamic links of the table are extendable without costs, so in many scenarios the LOPF
+# is an economic dispatch over a copper plate followed by a power flow
+#
+# analyse() checks if this is the case for the current PyPSA network:
+#   - no storage units when there is more than one snapshot (these couple the snapshots)
+#   - all lines and links are extendable without cost and without maximum capacity
+#   - links only connect islands (buses connected by lines) and these islands form a tree
+# solve() sorts the generators (and storage units) on marginal cost, fills the demand of every snapshot at once (vectorized),
+# derives the link flows from the tree and calculates the line flows with a linear power flow (PTDF of the static lines)
+# The results are written into the PyPSA network, as if network.lopf() was called
+#
+# If the required flow over a link goes against its direction, the link constraint binds and solve()
+# returns None, the LP solver must be used instead
+# Units with equal marginal cost share the dispatch in proportion to their capacity, in that case the
+# LP solution is not unique and the LP solver could return a different (equally cheap) split
+#
+
+from PTDFEngine import PTDFEngine
+
+import numpy as np
+import pandas as pd
+
+class MeritOrder:
+
+    tolerance = 1e-6
+
+    def __init__(self):
+        self.reason = ""
+
+        self.__ptdf_engine = None
+        self.__islands     = None
+
+
+    # linear power flow of the static lines, links are not part of the PTDF but set as injections
+    def set_topology(self, buses, lines):
+        self.__ptdf_engine = PTDFEngine(buses, lines, [])
+        self.__islands = pd.Series(self.__ptdf_engine.get_islands(0), index=self.__ptdf_engine.bus_names)
+
+
+    # returns True when the LOPF of this network can be solved with a merit order dispatch
+    def analyse(self, network):
+
+        if (self.__ptdf_engine == None):
+            return self.__reject("no static topology")
+
+        if (len(network.generators) == 0):
+            return self.__reject("no generators")
+
+        if (not network.buses.index.isin(self.__islands.index).all()):
+            return self.__reject("unknown buses")
+
+        # storage units are dispatched from their initial state of charge, this only works for one snapshot
+        storage_units = network.storage_units
+        if (len(storage_units) > 0):
+            if (len(network.snapshots) > 1):
+                return self.__reject("storage units couple the snapshots")
+
+            if (storage_units.cyclic_state_of_charge.any() or (storage_units.standing_loss != 0).any()):
+                return self.__reject("storage units with cyclic state of charge or losses")
+
+            if ((storage_units.capital_cost[storage_units.p_nom_extendable] != 0).any()):
+                return self.__reject("storage expansion costs")
+
+            if ((network.generators.marginal_cost < 0).any() or (storage_units.marginal_cost < 0).any()):
+                return self.__reject("negative marginal costs make storing profitable")
+
+        lines = network.lines
+        if (not (lines.s_nom_extendable.all() and (lines.capital_cost == 0).all() and np.isinf(lines.s_nom_max).all())):
+            return self.__reject("line capacity can bind")
+
+        links = network.links
+        if (not (links.p_nom_extendable.all() and (links.capital_cost == 0).all() and np.isinf(links.p_nom_max).all())):
+            return self.__reject("link capacity can bind")
+
+        if (not ((links.efficiency == 1).all() and (links.marginal_cost == 0).all())):
+            return self.__reject("links with losses or costs")
+
+        if (len(links) > 0 and (network.get_switchable_as_dense("Link", "p_min_pu") < 0).any().any()):
+            return self.__reject("bidirectional links")
+
+        generators = network.generators
+        extendable = generators.p_nom_extendable
+
+        if ((generators.capital_cost[extendable] != 0).any()):
+            return self.__reject("generator expansion costs")
+
+        if ((generators.committable).any()):
+            return self.__reject("committable generators")
+
+        if ((network.get_switchable_as_dense("Generator", "p_min_pu").loc[:, extendable] > 0).any().any()):
+            return self.__reject("must run extendable generators")
+
+        for link in links.itertuples():
+            if (self.__islands[link.bus0] == self.__islands[link.bus1]):
+                return self.__reject("link inside an island")
+
+        if (not self.__is_forest(links)):
+            return self.__reject("islands are meshed by links")
+
+        return True
+
+
+    # merit order dispatch and linear power flow, returns the objective or None if a constraint binds
+    def solve(self, network):
+
+        snapshots = network.snapshots
+        zones     = self.__islands
+
+        # dispatch bounds of every generator and storage unit and snapshot (snapshots x units)
+        p_min, p_max, marginal_cost, unit_buses = self.__get_units(network)
+        num_generators = len(network.generators)
+
+        loads = network.get_switchable_as_dense("Load", "p_set").multiply(network.loads.sign * -1, axis=1)
+
+        unit_zones = unit_buses.map(zones).to_numpy()
+        load_zones = network.loads.bus.map(zones).to_numpy()
+
+        dispatch = np.zeros((len(snapshots), len(unit_zones)))
+
+        for region in self.__get_regions(network.links):
+            region_units = np.flatnonzero(np.isin(unit_zones, region))
+            region_loads = np.flatnonzero(np.isin(load_zones, region))
+
+            demand = loads.iloc[:, region_loads].sum(axis=1).to_numpy()
+            region_dispatch = self.__dispatch(demand, p_min[:, region_units], p_max[:, region_units], marginal_cost[region_units])
+
+            if (region_dispatch is None):
+                return None
+
+            dispatch[:, region_units] = region_dispatch
+
+        link_flows = self.__link_flows(network, dispatch, loads, unit_zones, load_zones)
+
+        if (link_flows is None):
+            return None
+
+        # bus injections (buses x snapshots), every island is balanced by the link flows
+        bus_index = pd.Series(np.arange(len(zones)), index=zones.index)
+        injections = np.zeros((len(zones), len(snapshots)))
+
+        np.add.at(injections, unit_buses.map(bus_index).to_numpy(), dispatch.T)
+        np.add.at(injections, network.loads.bus.map(bus_index).to_numpy(), -loads.to_numpy().T)
+        np.add.at(injections, network.links.bus0.map(bus_index).to_numpy(), -link_flows.T)
+        np.add.at(injections, network.links.bus1.map(bus_index).to_numpy(), link_flows.T)
+
+        line_flows = self.__ptdf_engine.get_ptdf(0).dot(injections).T
+        line_flows = pd.DataFrame(line_flows, index=snapshots, columns=self.__ptdf_engine.line_names)[network.lines.index]
+
+        # results in the same place as network.lopf()
+        network.generators_t.p    = pd.DataFrame(dispatch[:, :num_generators], index=snapshots, columns=network.generators.index)
+        network.storage_units_t.p = pd.DataFrame(dispatch[:, num_generators:], index=snapshots, columns=network.storage_units.index)
+        network.loads_t.p         = loads
+        network.links_t.p0        = pd.DataFrame(link_flows, index=snapshots, columns=network.links.index)
+        network.links_t.p1        = -network.links_t.p0
+        network.lines_t.p0        = line_flows
+        network.lines_t.p1        = -line_flows
+
+        weightings = network.snapshot_weightings
+        if (isinstance(weightings, pd.DataFrame)):
+            weightings = weightings["objective"]
+
+        objective = float(((dispatch @ marginal_cost) * weightings.to_numpy()).sum())
+        network.objective = objective
+
+        return objective
+
+
+    def __reject(self, reason):
+        self.reason = reason
+        return False
+
+
+    # dispatch bounds and marginal costs, generators followed by storage units
+    def __get_units(self, network):
+
+        generators = network.generators
+        p_nom = generators.p_nom.where(~generators.p_nom_extendable, generators.p_nom_max)
+
+        p_max = network.get_switchable_as_dense("Generator", "p_max_pu").multiply(p_nom, axis=1).to_numpy()
+        p_min = network.get_switchable_as_dense("Generator", "p_min_pu").multiply(p_nom, axis=1).clip(lower=0)
+        p_min.loc[:, generators.p_nom_extendable] = 0.0
+        p_min = p_min.to_numpy()
+
+        marginal_cost = generators.marginal_cost.to_numpy()
+        buses = generators.bus
+
+        storage_units = network.storage_units
+
+        if (len(storage_units) > 0):
+            storage_p_nom = storage_units.p_nom.where(~storage_units.p_nom_extendable, storage_units.p_nom_max)
+            storage_p_max = network.get_switchable_as_dense("StorageUnit", "p_max_pu").multiply(storage_p_nom, axis=1)
+
+            # the state of charge after one snapshot can not become negative
+            weighting = network.snapshot_weightings
+            if (isinstance(weighting, pd.DataFrame)):
+                weighting = weighting["stores"]
+
+            inflow = network.get_switchable_as_dense("StorageUnit", "inflow")
+            energy = (inflow.multiply(weighting, axis=0) + storage_units.state_of_charge_initial) * storage_units.efficiency_dispatch
+            storage_p_max = np.minimum(storage_p_max, energy.divide(weighting, axis=0)).clip(lower=0)
+
+            p_max = np.hstack([p_max, storage_p_max.to_numpy()])
+            p_min = np.hstack([p_min, np.zeros(storage_p_max.shape)])
+            marginal_cost = np.concatenate([marginal_cost, storage_units.marginal_cost.to_numpy()])
+            buses = pd.concat([buses, storage_units.bus], ignore_index=True)
+
+        return p_min, p_max, marginal_cost, buses.reset_index(drop=True)
+
+
+    # fill the demand with the cheapest units first, vectorized over all snapshots
+    def __dispatch(self, demand, p_min, p_max, costs):
+
+        p_max = np.maximum(p_max, p_min)
+
+        # must run output first
+        remaining = demand - p_min.sum(axis=1)
+
+        if ((remaining < -self.tolerance).any()):
+            return None
+
+        if ((remaining > (p_max - p_min).sum(axis=1) + self.tolerance).any()):
+            return None
+
+        dispatch = p_min.copy()
+
+        # units with equal cost are filled together, in proportion to their capacity
+        for cost in np.unique(costs):
+            group = np.flatnonzero(costs == cost)
+            capacity = p_max[:, group] - p_min[:, group]
+            group_capacity = capacity.sum(axis=1)
+
+            group_dispatch = np.clip(remaining, 0.0, group_capacity)
+            share = np.divide(capacity, group_capacity[:, None], out=np.zeros_like(capacity), where=group_capacity[:, None] > 0)
+
+            dispatch[:, group] = dispatch[:, group] + share * group_dispatch[:, None]
+            remaining = remaining - group_dispatch
+
+        return dispatch
+
+
+    # flows (snapshots x links) which balance every island, None if a flow goes against a link direction
+    def __link_flows(self, network, dispatch, loads, unit_zones, load_zones):
+
+        links = network.links
+        flows = np.zeros((len(network.snapshots), len(links)))
+
+        # net demand of every island (load minus generation)
+        net_demand = {}
+        for zone in self.__islands.unique():
+            net_demand[zone] = loads.to_numpy()[:, load_zones == zone].sum(axis=1) - dispatch[:, unit_zones == zone].sum(axis=1)
+
+        # links between each pair of neighbouring islands
+        neighbours = {}
+        for i in range(0, len(links)):
+            zone0 = self.__islands[links.bus0.iat[i]]
+            zone1 = self.__islands[links.bus1.iat[i]]
+            neighbours.setdefault(zone0, {}).setdefault(zone1, []).append((i, 1.0))
+            neighbours.setdefault(zone1, {}).setdefault(zone0, []).append((i, -1.0))
+
+        for region in self.__get_regions(links):
+            root = region[0]
+            order = [root]
+            parent = {root: None}
+
+            for zone in order:
+                for neighbour in neighbours.get(zone, {}):
+                    if (neighbour not in parent):
+                        parent[neighbour] = zone
+                        order.append(neighbour)
+
+            # leaves first: the demand of a subtree flows in from its parent
+            subtree = {}
+            for zone in reversed(order):
+                subtree[zone] = subtree.get(zone, 0) + net_demand[zone]
+
+                if (parent[zone] != None):
+                    subtree[parent[zone]] = subtree.get(parent[zone], 0) + subtree[zone]
+                    required = subtree[zone]
+
+                    forward  = [i for i, direction in neighbours[parent[zone]][zone] if direction > 0]
+                    backward = [i for i, direction in neighbours[parent[zone]][zone] if direction < 0]
+
+                    if ((required > self.tolerance).any() and len(forward) == 0):
+                        return None
+
+                    if ((required < -self.tolerance).any() and len(backward) == 0):
+                        return None
+
+                    for i in forward:
+                        flows[:, i] = np.clip(required, 0, None) / len(forward)
+
+                    for i in backward:
+                        flows[:, i] = np.clip(-required, 0, None) / len(backward)
+
+        return flows
+
+
+    # groups of islands which are connected by links
+    def __get_regions(self, links):
+        group = {}
+        for zone in self.__islands.unique():
+            group[zone] = zone
+
+        def find(zone):
+            while (group[zone] != zone):
+                zone = group[zone]
+            return zone
+
+        for link in links.itertuples():
+            group[find(self.__islands[link.bus0])] = find(self.__islands[link.bus1])
+
+        regions = {}
+        for zone in self.__islands.unique():
+            regions.setdefault(find(zone), []).append(zone)
+
+        return list(regions.values())
+
+
+    def __is_forest(self, links):
+        pairs = set()
+        for link in links.itertuples():
+            pairs.add(frozenset([self.__islands[link.bus0], self.__islands[link.bus1]]))
+
+        num_zones = len(self.__islands.unique())
+        num_regions = len(self.__get_regions(links))
+
+        return len(pairs) == num_zones - num_regions
@@ -0,0 +1,220 @@
+# File: PTDFEngine.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Linear (DC) power flow based on Power Transfer Distribution Factors (PTDF)
+# The table topology is static, only the transformer links are switched on and off by placing transformer modules
+# At startup a sparse PTDF matrix is computed for every on/off combination of the transformer links
+# A power flow is then a single matrix-vector product of the bus injections
+#
+# Transformer links are modelled as lines with reactance transformer_x, so power can flow between the sections
+# The matrices use the first bus of every island (for example a low voltage section without transformer) as reference,
+# calculate() moves the reference to the slack bus PyPSA would choose: the bus of the generator with control "Slack",
+# otherwise of the first generator of the island, otherwise the first bus. The PTDF of slack bus s is the PTDF of
+# the reference minus column s, so the flows are corrected with column s times the imbalance of the island
+#
+
+from Timer import Timer
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+class PTDFEngine:
+
+    transformer_x = 0.1
+
+    def __init__(self, buses, lines, transformer_links):
+
+        self.bus_names  = [bus.name for bus in buses]
+        self.line_names = [line.name for line in lines]
+        self.link_names = [link.name for link in transformer_links]
+
+        self.__bus_index = {}
+        for i in range(0, len(self.bus_names)):
+            self.__bus_index[self.bus_names[i]] = i
+
+        # branches: all lines followed by all transformer links
+        self.__branch_bus0 = []
+        self.__branch_bus1 = []
+        self.__branch_x    = []
+
+        for line in lines:
+            self.__branch_bus0.append(self.__bus_index[line.bus0])
+            self.__branch_bus1.append(self.__bus_index[line.bus1])
+            self.__branch_x.append(line.x)
+
+        for link in transformer_links:
+            self.__branch_bus0.append(self.__bus_index[link.bus0])
+            self.__branch_bus1.append(self.__bus_index[link.bus1])
+            self.__branch_x.append(self.transformer_x)
+
+        # PTDF matrix (lines x buses) and island of every bus for every transformer link combination
+        self.__matrices = []
+        self.__islands  = []
+
+        timer = Timer()
+        timer.start()
+
+        for mask in range(0, 2 ** len(self.link_names)):
+            self.__matrices.append(self.__compute_ptdf(mask))
+            self.__islands.append(self.get_islands(mask))
+
+        timer.stop()
+        print(f"PTDF matrices for {len(self.__matrices)} transformer combinations took -> {timer.elapsed_time:0.6f} seconds")
+
+
+    # bitmask of the active transformer links
+    def get_mask(self, active_links):
+        mask = 0
+        for i in range(0, len(self.link_names)):
+            if (self.link_names[i] in active_links):
+                mask = mask | (1 << i)
+        return mask
+
+
+    def get_ptdf(self, mask):
+        return self.__matrices[mask]
+
+
+    def get_bus_index(self, bus_name):
+        return self.__bus_index.get(bus_name)
+
+
+    # net active power injection of every bus, following the PyPSA linear power flow (p_set of generators and loads)
+    def get_injections(self, components):
+        injections = np.zeros(len(self.bus_names))
+
+        for component in components:
+            bus = self.__bus_index.get(component.bus0)
+
+            if (bus == None):
+                continue
+
+            if (component.type == "Generator"):
+                injections[bus] = injections[bus] + self.get_value(component.p_set)
+
+            if (component.type == "Load"):
+                injections[bus] = injections[bus] - self.get_value(component.p_set)
+
+        return injections
+
+
+    # island number of every bus, buses connected by lines (and active transformer links) share an island
+    def get_islands(self, mask):
+        num_buses = len(self.bus_names)
+
+        branches = list(range(0, len(self.line_names)))
+        for i in range(0, len(self.link_names)):
+            if (mask & (1 << i)):
+                branches.append(len(self.line_names) + i)
+
+        bus0 = np.array([self.__branch_bus0[branch] for branch in branches], dtype=int)
+        bus1 = np.array([self.__branch_bus1[branch] for branch in branches], dtype=int)
+
+        adjacency = sp.csr_matrix((np.ones(len(branches)), (bus0, bus1)), shape=(num_buses, num_buses))
+        num_islands, islands = connected_components(adjacency, directed=False)
+
+        return islands
+
+
+    # active power flow (p0) of every line, the slack buses are chosen from the generators in components
+    # without components the first bus of every island is the slack bus
+    def calculate(self, injections, active_links, components=None):
+        mask = self.get_mask(active_links)
+        ptdf = self.__matrices[mask]
+        flows = ptdf.dot(injections)
+
+        if (components != None):
+            islands = self.__islands[mask]
+            slack_buses = self.get_slack_buses(mask, components)
+            imbalance = np.bincount(islands, weights=injections, minlength=len(slack_buses))
+            flows = flows - ptdf[:, slack_buses].dot(imbalance)
+
+        return flows
+
+
+    # slack bus of every island like PyPSA: the generator with control "Slack", otherwise the first generator,
+    # otherwise the first bus of the island
+    def get_slack_buses(self, mask, components):
+        islands = self.__islands[mask]
+        num_islands = islands.max() + 1
+
+        slack_buses = [int(np.flatnonzero(islands == island)[0]) for island in range(0, num_islands)]
+        has_generator = [False] * num_islands
+        has_slack     = [False] * num_islands
+
+        for component in components:
+            if (component.type != "Generator"):
+                continue
+
+            bus = self.__bus_index.get(component.bus0)
+
+            if (bus == None):
+                continue
+
+            island = islands[bus]
+            slack = getattr(component, "control", "PQ") == "Slack"
+
+            if ((has_generator[island] == False or slack) and has_slack[island] == False):
+                slack_buses[island] = bus
+                has_generator[island] = True
+                has_slack[island] = slack
+
+        return np.array(slack_buses, dtype=int)
+
+
+    # first value of a time series, or the value itself
+    def get_value(self, value):
+        if (np.ndim(value) > 0):
+            return float(np.asarray(value)[0])
+        return float(value)
+
+
+    def __compute_ptdf(self, mask):
+        num_buses = len(self.bus_names)
+        num_lines = len(self.line_names)
+
+        # active branches: all lines and the transformer links which are switched on
+        branches = list(range(0, num_lines))
+        for i in range(0, len(self.link_names)):
+            if (mask & (1 << i)):
+                branches.append(num_lines + i)
+
+        num_branches = len(branches)
+        rows = np.arange(num_branches)
+        bus0 = np.array([self.__branch_bus0[branch] for branch in branches])
+        bus1 = np.array([self.__branch_bus1[branch] for branch in branches])
+        susceptance = np.array([1.0 / self.__branch_x[branch] for branch in branches])
+
+        # incidence matrix (branches x buses) and bus susceptance matrix
+        incidence = sp.csr_matrix(
+            (np.concatenate([np.ones(num_branches), -np.ones(num_branches)]),
+            (np.concatenate([rows, rows]), np.concatenate([bus0, bus1]))),
+            shape=(num_branches, num_buses))
+
+        branch_susceptance = sp.diags(susceptance)
+        bus_susceptance = (incidence.T @ branch_susceptance @ incidence).tocsc()
+
+        # one slack bus per island
+        num_islands, islands = connected_components(bus_susceptance, directed=False)
+
+        slack_buses = []
+        for island in range(0, num_islands):
+            slack_buses.append(np.flatnonzero(islands == island)[0])
+
+        other_buses = np.setdiff1d(np.arange(num_buses), slack_buses)
+
+        ptdf = np.zeros((num_lines, num_buses))
+
+        if (len(other_buses) > 0):
+            reduced = bus_susceptance[other_buses, :][:, other_buses]
+            sensitivity = np.linalg.inv(reduced.toarray())
+
+            line_flows = (branch_susceptance @ incidence)[:num_lines, :][:, other_buses]
+            ptdf[:, other_buses] = line_flows @ sensitivity
+
+        ptdf[np.abs(ptdf) < 1e-10] = 0.0
+
+        return sp.csr_matrix(ptdf)
@@ -0,0 +1,139 @@
+# File: ParallelPowerFlow.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Non-linear power flow (PF) of a dynamic scenario on a pool of processes
+# The snapshots are split into one block per process, every process keeps its own Simulation (a copy of the network)
+# and runs the Newton-Raphson power flow on its block. The results of all blocks are joined again
+#
+# Processes are started with spawn, so they do not inherit the MQTT threads of the table
+# The pool is started once and reused, the network in a process is only updated with the changed components
+# A daemon process (the solver worker of "worker set process") cannot start a pool, is_possible() is False there
+#
+
+from concurrent.futures import ProcessPoolExecutor
+
+import multiprocessing
+import pandas as pd
+import numpy as np
+import copy
+
+
+# Simulation of the pool process
+worker_simulation = None
+
+
+def power_flow_worker_init(buses, lines):
+    global worker_simulation
+
+    # imported here, Simulation imports this file
+    from Simulation import Simulation
+
+    worker_simulation = Simulation()
+    worker_simulation.set_buses(buses)
+    worker_simulation.set_lines(lines)
+
+
+# power flow on a block of snapshots, returns the result dataframes and the number of snapshots which did not converge
+def power_flow_worker_run(index, static, components):
+    worker_simulation.load_components(index, static, components)
+
+    network = worker_simulation.network
+    status = network.pf()
+
+    frames = {}
+    for class_name, attribute in ParallelPowerFlow.outputs:
+        frames[(class_name, attribute)] = network.pnl(class_name)[attribute]
+
+    not_converged = int((~status["converged"].all(axis=1)).sum())
+
+    return frames, not_converged
+
+
+class ParallelPowerFlow:
+
+    # results which are collected from the processes
+    outputs = [
+        ("Bus", "v_mag_pu"), ("Bus", "v_ang"), ("Bus", "p"), ("Bus", "q"),
+        ("Line", "p0"), ("Line", "q0"), ("Line", "p1"), ("Line", "q1"),
+        ("Generator", "p"), ("Generator", "q"),
+        ("Load", "p"), ("Load", "q"),
+        ("StorageUnit", "p"), ("StorageUnit", "q"),
+        ("Link", "p0"), ("Link", "p1") ]
+
+    # smaller blocks cost more in overhead than they save
+    min_snapshots_per_worker = 4
+
+    def __init__(self, buses, lines, num_of_workers):
+        self.num_of_workers = num_of_workers
+
+        self.__buses = buses
+        self.__lines = lines
+        self.__executor = None
+
+
+    # daemon processes are not allowed to have child processes
+    @classmethod
+    def is_possible(cls):
+        return not multiprocessing.current_process().daemon
+
+
+    def is_enabled(self, num_of_snapshots):
+        return self.num_of_workers > 1 and num_of_snapshots >= 2 * self.min_snapshots_per_worker
+
+
+    def start(self):
+        if (self.__executor == None):
+            context = multiprocessing.get_context("spawn")
+            self.__executor = ProcessPoolExecutor(
+                max_workers=self.num_of_workers,
+                mp_context=context,
+                initializer=power_flow_worker_init,
+                initargs=(self.__buses, self.__lines))
+
+
+    def stop(self):
+        if (self.__executor != None):
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+
+
+    # power flow of every snapshot, returns (class name, attribute) -> dataframe and the number of snapshots which did not converge
+    def pf(self, index, static, components):
+        self.start()
+
+        num_of_blocks = min(self.num_of_workers, len(index) // self.min_snapshots_per_worker)
+        blocks = np.array_split(np.arange(len(index)), num_of_blocks)
+
+        futures = []
+        for block in blocks:
+            start = block[0]
+            end = block[-1] + 1
+            futures.append(self.__executor.submit(power_flow_worker_run, index[start:end], static, self.__get_components(components, len(index), start, end)))
+
+        results = [future.result() for future in futures]
+
+        frames = {}
+        for output in self.outputs:
+            frames[output] = pd.concat([block_frames[output] for block_frames, not_converged in results])
+
+        not_converged = sum([not_converged for block_frames, not_converged in results])
+
+        return frames, not_converged
+
+
+    # copies of the components with their time series cut to the block
+    def __get_components(self, components, num_of_snapshots, start, end):
+        block_components = []
+
+        for component in components:
+            block_component = copy.copy(component)
+
+            for attribute, value in vars(component).items():
+                if (isinstance(value, pd.Series) and len(value) == num_of_snapshots):
+                    setattr(block_component, attribute, value.iloc[start:end])
+
+            block_components.append(block_component)
+
+        return block_components
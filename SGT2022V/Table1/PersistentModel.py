@@ -0,0 +1,379 @@
+# File: PersistentModel.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# LOPF model which is kept in memory between calculations (optimisation mode plopf)
+# The model contains every candidate component of the active scenario: every catalog module on every platform
+# which accepts it, and every transformer link. It is only rebuilt when the scenario or candidates change
+#
+# Placing or removing a module only changes variable bounds, absent generators, loads and storages are fixed to zero
+# The HiGHS solver keeps the model and its basis in memory, so a calculation is a re-optimisation (warm start)
+# instead of writing and solving a new LP
+#
+# The formulation follows the PyPSA LOPF (angles formulation):
+#   - generator and storage dispatch within p_min_pu/p_max_pu of the (extendable) nominal power
+#   - storage state of charge over the snapshots, starting at state_of_charge_initial
+#   - line flows from the voltage angle difference, lines and links are extendable without costs
+#   - power balance at every bus, minimizing the marginal costs (snapshot weightings of 1, the PyPSA default)
+#
+# Requires pyomo with the HiGHS interface (pip install pyomo highspy), otherwise is_available() returns False
+#
+
+from Timer import Timer
+from PTDFEngine import PTDFEngine
+from SimulationResult import SimulationResult
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyomo.environ as pyo
+    from pyomo.contrib.appsi.solvers import Highs
+    from pyomo.contrib.appsi.base import TerminationCondition
+except ImportError:
+    pyo = None
+
+class PersistentModel:
+
+    # PyPSA defaults of attributes which are not set by the table
+    __storage_defaults = {
+        "p_nom"                     : 0.0,
+        "p_max_pu"                  : 1.0,
+        "p_min_pu"                  : -1.0,
+        "max_hours"                 : 1.0,
+        "efficiency_store"          : 1.0,
+        "efficiency_dispatch"       : 1.0,
+        "standing_loss"             : 0.0,
+        "state_of_charge_initial"   : 0.0 }
+
+    def __init__(self):
+        self.__model     = None
+        self.__solver    = None
+        self.__signature = None
+        self.__snapshots = range(0, 0)
+
+        self.__buses   = []
+        self.__lines   = []
+        self.__islands = []
+
+        # candidate components in model order, indexed by (name, bus)
+        self.__generators = []
+        self.__loads      = []
+        self.__storages   = []
+        self.__links      = []
+
+        self.__present = None
+
+        self.__available = None
+
+
+    def is_available(self):
+        if (self.__available == None):
+            self.__available = pyo != None and bool(Highs().available())
+        return self.__available
+
+
+    def set_topology(self, buses, lines):
+        self.__buses = buses
+        self.__lines = lines
+        self.__islands = PTDFEngine(buses, lines, []).get_islands(0)
+        self.__signature = None
+
+
+    # solve the job, component_attributes gives the PyPSA attributes of a component
+    def solve(self, job, component_attributes):
+
+        timer = Timer()
+        timer.start()
+
+        generators = {}
+        loads      = {}
+        storages   = {}
+        links      = {}
+
+        for component in tuple(job.candidates) + tuple(job.components):
+            key = (component.name, component.bus0)
+
+            if (component.type == "Generator"):
+                generators[key] = component_attributes(component)
+            if (component.type == "Load"):
+                loads[key] = component_attributes(component)
+            if (component.type == "Storage"):
+                storages[key] = component_attributes(component)
+            if (component.type == "Link"):
+                links[component.name] = component
+
+        signature = (job.scenario, job.revision, len(job.index), tuple(generators), tuple(loads), tuple(storages), tuple(links))
+
+        if (signature != self.__signature):
+            self.__build(job, generators, loads, storages, links)
+            self.__signature = signature
+
+            timer.stop()
+            print(f"    Build took  -> {timer.elapsed_time:0.6f} seconds")
+            timer.start()
+
+        present = set()
+        for component in job.components:
+            if (component.type == "Link"):
+                present.add(component.name)
+            else:
+                present.add((component.name, component.bus0))
+
+        self.__set_bounds(present)
+
+        timer.stop()
+        print(f"    Update took -> {timer.elapsed_time:0.6f} seconds")
+        timer.start()
+
+        results = self.__solver.solve(self.__model)
+        succes = results.termination_condition == TerminationCondition.optimal
+
+        if (succes):
+            results.solution_loader.load_vars()
+            print("LOPF network update SUCCES! -> solution possible")
+        else:
+            print("LOPF network update FAILED with -> no solution possible")
+
+        print("    Condition   -> " + str(results.termination_condition.name))
+
+        timer.stop()
+        print(f"    HiGHS took  -> {timer.elapsed_time:0.6f} seconds")
+
+        return self.__get_result(succes, job.index, present)
+
+
+    def __build(self, job, generators, loads, storages, links):
+        model = pyo.ConcreteModel()
+
+        snapshots = range(0, len(job.index))
+
+        self.__generators = list(generators.items())
+        self.__loads      = list(loads.items())
+        self.__storages   = list(storages.items())
+        self.__links      = list(links.values())
+        self.__present    = None
+
+        bus_index = {}
+        for i in range(0, len(self.__buses)):
+            bus_index[self.__buses[i].name] = i
+
+        num_generators = len(self.__generators)
+        num_storages   = len(self.__storages)
+
+        model.generator_p     = pyo.Var(range(0, num_generators), snapshots)
+        model.generator_p_nom = pyo.Var(range(0, num_generators))
+        model.load_p          = pyo.Var(range(0, len(self.__loads)), snapshots)
+        model.storage_p_nom   = pyo.Var(range(0, num_storages))
+        model.storage_soc_0   = pyo.Var(range(0, num_storages))
+        model.storage_dispatch = pyo.Var(range(0, num_storages), snapshots, bounds=(0, None))
+        model.storage_store   = pyo.Var(range(0, num_storages), snapshots, bounds=(0, None))
+        model.storage_soc     = pyo.Var(range(0, num_storages), snapshots, bounds=(0, None))
+        model.link_p          = pyo.Var(range(0, len(self.__links)), snapshots, bounds=(0, None))
+        model.line_p          = pyo.Var(range(0, len(self.__lines)), snapshots)
+        model.angle           = pyo.Var(range(0, len(self.__buses)), snapshots)
+
+        model.constraints = pyo.ConstraintList()
+
+        # one reference angle per island
+        references = set()
+        for i in range(0, len(self.__buses)):
+            if (self.__islands[i] not in references):
+                references.add(self.__islands[i])
+                for t in snapshots:
+                    model.angle[i, t].fix(0)
+
+        # extendable generators: dispatch within p_min_pu/p_max_pu times the optimised nominal power
+        for i in range(0, num_generators):
+            attributes = self.__generators[i][1]
+            if (bool(attributes["p_nom_extendable"])):
+                for t in snapshots:
+                    model.constraints.add(model.generator_p[i, t] <= self.__get_value(attributes["p_max_pu"], t) * model.generator_p_nom[i])
+                    model.constraints.add(model.generator_p[i, t] >= self.__get_value(attributes["p_min_pu"], t) * model.generator_p_nom[i])
+
+        # storage units
+        for i in range(0, num_storages):
+            attributes = self.__get_storage_attributes(self.__storages[i][1])
+
+            for t in snapshots:
+                model.constraints.add(model.storage_dispatch[i, t] <= attributes["p_max_pu"] * model.storage_p_nom[i])
+                model.constraints.add(model.storage_store[i, t] <= -attributes["p_min_pu"] * model.storage_p_nom[i])
+                model.constraints.add(model.storage_soc[i, t] <= attributes["max_hours"] * model.storage_p_nom[i])
+
+                previous = model.storage_soc_0[i] if (t == 0) else model.storage_soc[i, t-1]
+                model.constraints.add(model.storage_soc[i, t] ==
+                    (1 - attributes["standing_loss"]) * previous
+                    + attributes["efficiency_store"] * model.storage_store[i, t]
+                    - model.storage_dispatch[i, t] / attributes["efficiency_dispatch"])
+
+        # line flows from the voltage angles
+        for i in range(0, len(self.__lines)):
+            line = self.__lines[i]
+            bus0 = bus_index[line.bus0]
+            bus1 = bus_index[line.bus1]
+            x_pu = line.x / (self.__buses[bus0].v_nom ** 2)
+
+            for t in snapshots:
+                model.constraints.add(model.line_p[i, t] == (model.angle[bus0, t] - model.angle[bus1, t]) / x_pu)
+
+        # power balance of every bus
+        balance = []
+        for i in range(0, len(self.__buses)):
+            balance.append([])
+
+        for i in range(0, num_generators):
+            balance[bus_index[self.__generators[i][0][1]]].append((model.generator_p, i, 1))
+        for i in range(0, len(self.__loads)):
+            balance[bus_index[self.__loads[i][0][1]]].append((model.load_p, i, -1))
+        for i in range(0, num_storages):
+            balance[bus_index[self.__storages[i][0][1]]].append((model.storage_dispatch, i, 1))
+            balance[bus_index[self.__storages[i][0][1]]].append((model.storage_store, i, -1))
+        for i in range(0, len(self.__links)):
+            balance[bus_index[self.__links[i].bus0]].append((model.link_p, i, -1))
+            balance[bus_index[self.__links[i].bus1]].append((model.link_p, i, 1))
+        for i in range(0, len(self.__lines)):
+            balance[bus_index[self.__lines[i].bus0]].append((model.line_p, i, -1))
+            balance[bus_index[self.__lines[i].bus1]].append((model.line_p, i, 1))
+
+        for i in range(0, len(self.__buses)):
+            if (len(balance[i]) > 0):
+                for t in snapshots:
+                    model.constraints.add(sum(sign * variable[index, t] for variable, index, sign in balance[i]) == 0)
+
+        model.objective = pyo.Objective(expr=
+            sum(self.__get_value(attributes["marginal_cost"], t) * model.generator_p[i, t]
+                for i, (key, attributes) in enumerate(self.__generators) for t in snapshots)
+            + sum(self.__get_value(attributes["marginal_cost"], t) * model.storage_dispatch[i, t]
+                for i, (key, attributes) in enumerate(self.__storages) for t in snapshots))
+
+        self.__model = model
+        self.__snapshots = snapshots
+
+        # new solver, the previous one still holds the old model
+        self.__solver = Highs()
+        self.__solver.config.load_solution = False
+        self.__solver.config.stream_solver = False
+
+
+    # absent components are fixed to zero, only bounds which change are touched
+    def __set_bounds(self, present):
+        model = self.__model
+        snapshots = self.__snapshots
+
+        for i in range(0, len(self.__generators)):
+            key, attributes = self.__generators[i]
+            active = key in present
+
+            if (self.__present != None and (key in self.__present) == active):
+                continue
+
+            if (bool(attributes["p_nom_extendable"])):
+                if (active):
+                    model.generator_p_nom[i].setlb(attributes["p_nom_min"])
+                    model.generator_p_nom[i].setub(attributes["p_nom_max"])
+                else:
+                    model.generator_p_nom[i].setlb(0)
+                    model.generator_p_nom[i].setub(0)
+
+                for t in snapshots:
+                    model.generator_p[i, t].setlb(None if active else 0)
+                    model.generator_p[i, t].setub(None if active else 0)
+            else:
+                model.generator_p_nom[i].setlb(0)
+                model.generator_p_nom[i].setub(0)
+
+                for t in snapshots:
+                    if (active):
+                        model.generator_p[i, t].setlb(self.__get_value(attributes["p_min_pu"], t) * attributes["p_nom"])
+                        model.generator_p[i, t].setub(self.__get_value(attributes["p_max_pu"], t) * attributes["p_nom"])
+                    else:
+                        model.generator_p[i, t].setlb(0)
+                        model.generator_p[i, t].setub(0)
+
+        for i in range(0, len(self.__loads)):
+            key, attributes = self.__loads[i]
+            active = key in present
+
+            if (self.__present != None and (key in self.__present) == active):
+                continue
+
+            for t in snapshots:
+                value = self.__get_value(attributes["p_set"], t) if active else 0
+                model.load_p[i, t].setlb(value)
+                model.load_p[i, t].setub(value)
+
+        for i in range(0, len(self.__storages)):
+            key, attributes = self.__storages[i]
+            active = key in present
+
+            if (self.__present != None and (key in self.__present) == active):
+                continue
+
+            attributes = self.__get_storage_attributes(attributes)
+
+            if (not active):
+                model.storage_p_nom[i].setlb(0)
+                model.storage_p_nom[i].setub(0)
+            elif (attributes["p_nom_extendable"]):
+                model.storage_p_nom[i].setlb(attributes["p_nom_min"])
+                model.storage_p_nom[i].setub(attributes["p_nom_max"])
+            else:
+                model.storage_p_nom[i].setlb(attributes["p_nom"])
+                model.storage_p_nom[i].setub(attributes["p_nom"])
+
+            soc_initial = attributes["state_of_charge_initial"] if active else 0
+            model.storage_soc_0[i].setlb(soc_initial)
+            model.storage_soc_0[i].setub(soc_initial)
+
+        for i in range(0, len(self.__links)):
+            name = self.__links[i].name
+            active = name in present
+
+            if (self.__present != None and (name in self.__present) == active):
+                continue
+
+            for t in snapshots:
+                model.link_p[i, t].setub(None if active else 0)
+
+        self.__present = present
+
+
+    def __get_result(self, succes, index, present):
+        model = self.__model
+        snapshots = self.__snapshots
+
+        result = SimulationResult()
+        result.succes = succes
+
+        generators = [i for i in range(0, len(self.__generators)) if self.__generators[i][0] in present]
+        loads      = [i for i in range(0, len(self.__loads)) if self.__loads[i][0] in present]
+
+        if (succes):
+            lines_p0     = [[model.line_p[i, t].value for i in range(0, len(self.__lines))] for t in snapshots]
+            generators_p = [[model.generator_p[i, t].value for i in generators] for t in snapshots]
+            loads_p      = [[model.load_p[i, t].value for i in loads] for t in snapshots]
+        else:
+            lines_p0     = np.zeros((len(snapshots), len(self.__lines)))
+            generators_p = np.zeros((len(snapshots), len(generators)))
+            loads_p      = np.zeros((len(snapshots), len(loads)))
+
+        result.lines_p0     = pd.DataFrame(lines_p0, index=index, columns=[line.name for line in self.__lines], dtype=float)
+        result.generators_p = pd.DataFrame(generators_p, index=index, columns=[self.__generators[i][0][0] for i in generators], dtype=float)
+        result.loads_p      = pd.DataFrame(loads_p, index=index, columns=[self.__loads[i][0][0] for i in loads], dtype=float)
+
+        return result
+
+
+    def __get_storage_attributes(self, attributes):
+        storage_attributes = dict(self.__storage_defaults)
+        storage_attributes.update(attributes)
+        storage_attributes["p_nom_extendable"] = bool(storage_attributes["p_nom_extendable"])
+        return storage_attributes
+
+
+    # value of an attribute at snapshot t, attributes are constant or a time series
+    def __get_value(self, value, t):
+        if (np.ndim(value) > 0):
+            return float(np.asarray(value)[t])
+        return float(value)
@@ -52,6 +52,23 @@ class Platform:
             self.__has_changed = True
 
 
+    # modules must have the voltage of the platform and a RFID tag or component type the platform accepts
+    def accepts_module(self, module):
+        if (module.voltage != self.voltage):
+            return False
+
+        for accepted_module in self.accepted_modules:
+            for component in module.components:
+
+                if (accepted_module == module.RFID_tag):
+                    return True
+
+                if (accepted_module == component.type):
+                    return True
+
+        return False
+
+
     def reset_changed(self):
         self.__has_changed = False
 
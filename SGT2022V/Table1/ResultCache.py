@@ -0,0 +1,112 @@
+# File: ResultCache.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Least recently used cache of SimulationResult objects
+# Results are stored under a hash of the table configuration: scenario, calculation mode,
+# occupied platforms with their RFID tags and the active transformer links
+# The total size of the stored results is limited, the least recently used results are dropped first
+#
+
+from collections import OrderedDict
+
+import hashlib
+import json
+
+class ResultCache:
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+
+        self.hits   = 0
+        self.misses = 0
+
+        self.__results   = OrderedDict()
+        self.__scenarios = {}
+        self.__sizes     = {}
+        self.__bytes     = 0
+
+
+    def make_key(self, scenario, mode, platforms, transformer_links):
+        configuration = {
+            "scenario"  : scenario,
+            "mode"      : mode,
+            "platforms" : sorted(platforms),
+            "links"     : sorted(transformer_links) }
+
+        canonical = json.dumps(configuration, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+    def get(self, key):
+        result = self.__results.get(key)
+
+        if (result == None):
+            self.misses = self.misses + 1
+            return None
+
+        self.hits = self.hits + 1
+        self.__results.move_to_end(key)
+        return result
+
+
+    def put(self, key, result, scenario):
+        self.remove(key)
+
+        size = result.get_size()
+
+        # results larger than the whole cache are never stored
+        if (size > self.max_bytes):
+            return
+
+        self.__results[key]   = result
+        self.__scenarios[key] = scenario
+        self.__sizes[key]     = size
+        self.__bytes          = self.__bytes + size
+
+        while (self.__bytes > self.max_bytes):
+            oldest_key = next(iter(self.__results))
+            self.remove(oldest_key)
+
+
+    def remove(self, key):
+        if (key in self.__results):
+            del self.__results[key]
+            del self.__scenarios[key]
+            self.__bytes = self.__bytes - self.__sizes.pop(key)
+
+
+    def invalidate_scenario(self, scenario):
+        keys = [key for key, key_scenario in self.__scenarios.items() if key_scenario == scenario]
+
+        for key in keys:
+            self.remove(key)
+
+
+    def clear(self):
+        self.__results.clear()
+        self.__scenarios.clear()
+        self.__sizes.clear()
+        self.__bytes  = 0
+        self.hits     = 0
+        self.misses   = 0
+
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+
+        while (self.__bytes > self.max_bytes and len(self.__results) > 0):
+            self.remove(next(iter(self.__results)))
+
+
+    def print_status(self):
+        print("Result cache...")
+        print("    Results -> " + str(len(self.__results)))
+        print(f"    Size    -> {self.__bytes / 1e6:0.3f} / {self.max_bytes / 1e6:0.3f} MB")
+        print("    Hits    -> " + str(self.hits))
+        print("    Misses  -> " + str(self.misses))
+
+
+    def get_counters_string(self):
+        return "hits " + str(self.hits) + ", misses " + str(self.misses)
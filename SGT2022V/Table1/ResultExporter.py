@@ -0,0 +1,153 @@
+# File: ResultExporter.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Exports SimulationResult objects to disk in a background thread, so exporting never delays the ledstrips
+# Results are placed in a bounded queue, when the queue is full the result is dropped instead of waiting
+#
+# Export formats:
+#   csv -> line flows, generator output and load consumption as CSV files, overwritten every solve (Export/PyPSA_[mode]/)
+#   npz -> one compressed file per solve containing every column as array (Export/PyPSA_[mode]/solve_[n].npz)
+#   log -> one JSON line per solve appended to a results log (Export/PyPSA_[mode]/results.log)
+#
+# Export policy:
+#   every  -> only export every Nth solve
+#   sample -> fraction of the remaining solves which is exported, chosen at random
+#
+
+from threading import Thread
+from datetime import datetime
+
+import numpy as np
+import queue
+import random
+import json
+import os
+
+class ResultExporter:
+
+    formats = ["off", "csv", "npz", "log"]
+
+    def __init__(self, root="Export/", queue_size=8):
+        self.root   = root
+        self.format = "csv"
+        self.every  = 1
+        self.sample = 1.0
+
+        self.__queue  = queue.Queue(maxsize=queue_size)
+        self.__thread = None
+
+        self.__num_of_solves   = 0
+        self.__num_of_exported = 0
+        self.__num_of_dropped  = 0
+
+
+    def set_format(self, export_format):
+        if (export_format in self.formats):
+            self.format = export_format
+            return True
+        return False
+
+
+    def set_every(self, every):
+        self.every = max(1, int(every))
+
+
+    def set_sample(self, sample):
+        self.sample = min(1.0, max(0.0, float(sample)))
+
+
+    # called for every new solve, only places the result in the queue
+    def export(self, result, mode):
+        self.__num_of_solves = self.__num_of_solves + 1
+
+        if (self.format == "off"):
+            return
+
+        if (self.__num_of_solves % self.every != 0):
+            return
+
+        if (self.sample < 1.0 and random.random() >= self.sample):
+            return
+
+        if (self.__thread == None):
+            self.__thread = Thread(target=self.__writer_loop, daemon=True)
+            self.__thread.start()
+
+        try:
+            self.__queue.put_nowait((self.format, mode, self.__num_of_solves, datetime.now(), result))
+        except queue.Full:
+            self.__num_of_dropped = self.__num_of_dropped + 1
+
+
+    def print_status(self):
+        print("Result export...")
+        print("    Format   -> " + self.format)
+        print("    Every    -> " + str(self.every))
+        print("    Sample   -> " + str(self.sample))
+        print("    Exported -> " + str(self.__num_of_exported))
+        print("    Dropped  -> " + str(self.__num_of_dropped))
+
+
+    def __writer_loop(self):
+        while (True):
+            export_format, mode, solve, timestamp, result = self.__queue.get()
+
+            folder = os.path.join(self.root, "PyPSA_" + mode)
+
+            try:
+                os.makedirs(folder, exist_ok=True)
+
+                if (export_format == "csv"):
+                    self.__write_csv(folder, result)
+
+                if (export_format == "npz"):
+                    self.__write_npz(folder, solve, result)
+
+                if (export_format == "log"):
+                    self.__write_log(folder, solve, timestamp, result)
+
+                self.__num_of_exported = self.__num_of_exported + 1
+
+            except Exception as error:
+                print("Result export FAILED -> " + str(error))
+
+
+    def __get_dataframes(self, result):
+        return {
+            "lines-p0"      : result.lines_p0,
+            "generators-p"  : result.generators_p,
+            "loads-p"       : result.loads_p }
+
+
+    def __write_csv(self, folder, result):
+        for name, dataframe in self.__get_dataframes(result).items():
+            dataframe.to_csv(os.path.join(folder, name + ".csv"))
+
+
+    def __write_npz(self, folder, solve, result):
+        arrays = {"succes": np.array(result.succes)}
+
+        for name, dataframe in self.__get_dataframes(result).items():
+            arrays[name + "/snapshot"] = dataframe.index.astype(str).to_numpy()
+
+            for column in dataframe.columns:
+                arrays[name + "/" + str(column)] = dataframe[column].to_numpy()
+
+        np.savez_compressed(os.path.join(folder, "solve_" + str(solve) + ".npz"), **arrays)
+
+
+    def __write_log(self, folder, solve, timestamp, result):
+        record = {
+            "solve"     : solve,
+            "time"      : timestamp.isoformat(),
+            "succes"    : bool(result.succes) }
+
+        for name, dataframe in self.__get_dataframes(result).items():
+            record[name] = {
+                "snapshot"  : dataframe.index.astype(str).tolist(),
+                "values"    : dataframe.to_dict(orient="list") }
+
+        with open(os.path.join(folder, "results.log"), "a") as log_file:
+            log_file.write(json.dumps(record) + "\n")
@@ -0,0 +1,66 @@
+# File: RollingHorizon.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Splits the snapshots of a dynamic LOPF into overlapping windows which are solved one after the other
+# Options are a dictionary, from "rolling_horizon" in the scenario JSON file or from the console:
+#   {"window" : 24, "overlap" : 6}  -> solve 24 + 6 snapshots, keep the results of the first 24
+#   {"window" : 0}                  -> off
+#
+# The overlap lets the optimisation see beyond the end of a window, so storage units are not emptied at every boundary
+# The state of charge at the last kept snapshot is the initial state of charge of the next window
+# Results are collected window by window, the table can start playback after the first window
+# Only used by LOPF, the persistent model of plopf always solves all snapshots at once
+#
+
+import pandas as pd
+import copy
+
+class RollingHorizon:
+
+    def __init__(self, options=None):
+        if (options == None):
+            options = {}
+
+        self.window  = int(options.get("window", 0))
+        self.overlap = int(options.get("overlap", 0))
+
+
+    def is_enabled(self, num_of_snapshots):
+        return self.window > 0 and num_of_snapshots > self.window
+
+
+    def get_description(self):
+        return "window " + str(self.window) + ", overlap " + str(self.overlap)
+
+
+    # (start, end of the kept snapshots, end of the solved snapshots) of every window
+    def get_windows(self, num_of_snapshots):
+        windows = []
+
+        for start in range(0, num_of_snapshots, self.window):
+            keep  = min(start + self.window, num_of_snapshots)
+            end   = min(keep + self.overlap, num_of_snapshots)
+            windows.append((start, keep, end))
+
+        return windows
+
+
+    # copies of the components with their time series cut to the window, storage units start at the given state of charge
+    def get_components(self, components, num_of_snapshots, start, end, state_of_charge):
+        window_components = []
+
+        for component in components:
+            window_component = copy.copy(component)
+
+            for attribute, value in vars(component).items():
+                if (isinstance(value, pd.Series) and len(value) == num_of_snapshots):
+                    setattr(window_component, attribute, value.iloc[start:end])
+
+            if (component.type == "Storage" and component.name in state_of_charge):
+                window_component.state_of_charge_initial = state_of_charge[component.name]
+
+            window_components.append(window_component)
+
+        return window_components
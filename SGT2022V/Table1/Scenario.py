@@ -7,6 +7,17 @@
 # Class which represents a scenario, scenarios are loaded from JSON files (for static) and saved here
 # Specific Components can be retrieved using the get_modules(RFID) method where you need to provide a RFID id
 #
+# When a scenario is loaded every module in the catalog is compiled once into a prototype (CSV files are read once)
+# get_module() hands out a new instance of the prototype, with its own components which share the time series
+# of the prototype, these time series must not be changed
+# CSV profiles come from the TimeSeriesStore, memory mapped arrays shared by all components which use the same profile
+#
+# The loaded scenario (catalog, date index, prototypes and time series) is saved in a ScenarioBundle,
+# the next load_scenario() reads the bundle instead of the JSON and CSV files as long as these are unchanged
+# The bundle only holds references (TimeSeriesReference) to the time series, these are mapped from the TimeSeriesStore
+# again when the bundle is loaded, so scenarios loaded from a bundle share the arrays of the store as well
+# revision is a hash of the contents of all source files, it changes when the scenario is edited
+#
 
 from Generator import Generator
 from Load import Load
@@ -14,11 +25,16 @@ from StorageUnit import StorageUnit
 from Transformer import Transformer
 
 from Module import Module
+from TimeSeriesStore import TimeSeriesStore
+from TimeSeriesReference import TimeSeriesReference
+from ScenarioBundle import ScenarioBundle
 from os.path import exists
 
 import pandas as pd
-import numpy as np
+import hashlib
+import copy
 import json
+import os
 
 class Scenario:
 
@@ -31,48 +47,90 @@ class Scenario:
         self.time_per_snapshot = 1
         self.filepath = ""
 
+        # source file (JSON and CSV) -> [size, modification time, SHA1] when the scenario was loaded
+        self.sources = {}
+        self.revision = ""
+
+        # compiled modules and time series, indexed by RFID tag and CSV file
+        self.__prototypes = {}
+        self.__time_series = {}
 
-    def __process_component_value(self, value):
+
+    # CSV files become a (shared, read only) time series, optionally divided by divisor
+    def __process_component_value(self, value, divisor=None):
 
         if (type(value) == str):
             if (value[-4:] == ".csv"):
 
-                pd_csv = pd.read_csv(value)
-
-                np_array = np.array(pd_csv)
-                np_array = np_array.flatten()
+                key = (value, divisor)
 
-                pd_series = pd.Series(np_array, index=self.index)
+                if (key not in self.__time_series):
+                    store = TimeSeriesStore.get_store(os.path.dirname(self.filepath))
+                    self.__time_series[key] = store.get_series(value, self.index, divisor)
 
-                return pd_series
+                return self.__time_series[key]
 
         # no csv file
+        if (divisor != None):
+            return value / divisor
+
         return value
 
 
-    def load_scenario(self, filepath):
+    # load the scenario from its bundle, or from the JSON file (and write a new bundle) when the bundle is stale
+    def load_scenario(self, filepath, use_bundle=True):
         file_exists = exists(filepath)
 
         if (file_exists):
 
-            with open(filepath) as json_file:
-                self.catalog = json.load(json_file)
-                self.succes = True
-                self.filepath = filepath
-                self.static = self.is_static()
-                print("Loaded scenario -> " + filepath)
-                print("    Scenario name     -> " + str(self.get_name()))
-
-                if (self.is_static()):
-                    print("    Scenario type     -> Static")
-                    self.index = [0]
-                else:
+            bundle = None
+            if (use_bundle):
+                bundle = ScenarioBundle.load(filepath)
+
+            if (bundle != None):
+                time_series = self.__resolve_time_series(filepath, bundle["index"], bundle["time_series"])
+
+                # a time series is missing from the store, compile the scenario again
+                if (time_series == None):
+                    bundle = None
+
+            if (bundle != None):
+                self.catalog            = bundle["catalog"]
+                self.index              = bundle["index"]
+                self.time_per_snapshot  = bundle["time_per_snapshot"]
+                self.__prototypes       = self.__map_prototypes(bundle["prototypes"], TimeSeriesReference, lambda reference: time_series[reference])
+                self.__time_series      = {key : time_series[reference] for key, reference in bundle["time_series"].items()}
+                self.sources            = bundle["sources"]
+            else:
+                with open(filepath) as json_file:
+                    self.catalog = json.load(json_file)
+
+            self.succes = True
+            self.filepath = filepath
+            self.static = self.is_static()
+            print("Loaded scenario -> " + filepath)
+            print("    Scenario name     -> " + str(self.get_name()))
+
+            if (self.is_static()):
+                print("    Scenario type     -> Static")
+                self.index = [0]
+            else:
+                if (bundle == None):
                     self.index = pd.date_range(self.get_begin_date(), self.get_end_date(), freq=self.get_frequency())
                     self.time_per_snapshot = self.catalog.get("time_per_snapshot")
 
-                    print("    Scenario type     -> Dynamic")
-                    print("    Total snapshots   -> " + str(len(self.index)))
-                    print("    Time per snapshot -> " + str(self.time_per_snapshot))
+                print("    Scenario type     -> Dynamic")
+                print("    Total snapshots   -> " + str(len(self.index)))
+                print("    Time per snapshot -> " + str(self.time_per_snapshot))
+
+            if (bundle != None):
+                print("    Modules           -> " + str(len(self.__prototypes)) + " (bundle)")
+            else:
+                self.compile_modules()
+                self.sources = ScenarioBundle.get_sources(self.get_source_files())
+                self.save_bundle()
+
+            self.__set_revision()
 
         else:
             self.succes = False
@@ -81,6 +139,109 @@ class Scenario:
         return self.succes
 
 
+    # write the loaded scenario into a bundle, together with the JSON file and all CSV files it depends on
+    def save_bundle(self):
+        if (self.succes == False):
+            return False
+
+        store = TimeSeriesStore.get_store(os.path.dirname(self.filepath))
+
+        # (CSV file, divisor) -> reference, and the time series itself (by id) -> reference
+        references = {}
+        series_references = {}
+
+        for (value, divisor), series in self.__time_series.items():
+            digest = store.get_digest(value)
+
+            # kept in memory only, the reference could not be mapped again
+            if (not store.is_stored(digest)):
+                print("    Bundle            -> not written (time series not stored: " + value + ")")
+                return False
+
+            references[(value, divisor)] = TimeSeriesReference(digest, divisor)
+            series_references[id(series)] = references[(value, divisor)]
+
+        data = {
+            "catalog"           : self.catalog,
+            "index"             : self.index,
+            "time_per_snapshot" : self.time_per_snapshot,
+            "prototypes"        : self.__map_prototypes(self.__prototypes, pd.Series, lambda series: series_references.get(id(series), series)),
+            "time_series"       : references,
+            "sources"           : self.sources }
+
+        return ScenarioBundle.save(self.filepath, self.sources, data)
+
+
+    # reference -> time series of the store, None when one of them is not in the store
+    def __resolve_time_series(self, filepath, index, references):
+        store = TimeSeriesStore.get_store(os.path.dirname(filepath))
+        time_series = {}
+
+        for reference in references.values():
+            if (reference not in time_series):
+                series = store.get_series_by_digest(reference.digest, index, reference.divisor)
+
+                if (series is None):
+                    return None
+
+                time_series[reference] = series
+
+        return time_series
+
+
+    # copies of the prototypes where every component attribute of value_type is replaced by replace(value)
+    def __map_prototypes(self, prototypes, value_type, replace):
+        mapped = {}
+
+        for RFID_tag, prototype in prototypes.items():
+            if (prototype == None):
+                mapped[RFID_tag] = None
+                continue
+
+            module = copy.copy(prototype)
+            module.components = []
+
+            for component in prototype.components:
+                mapped_component = copy.copy(component)
+
+                for attribute, value in vars(component).items():
+                    if (isinstance(value, value_type)):
+                        setattr(mapped_component, attribute, replace(value))
+
+                module.add_component(mapped_component)
+
+            mapped[RFID_tag] = module
+
+        return mapped
+
+
+    # the JSON file and CSV files this scenario is loaded from
+    def get_source_files(self):
+        source_files = [self.filepath]
+        for (value, divisor) in self.__time_series.keys():
+            if (value not in source_files):
+                source_files.append(value)
+        return source_files
+
+
+    # one of the source files changed since the scenario was loaded (files which are only touched do not count)
+    def is_changed(self):
+        if (not ScenarioBundle.is_touched(self.sources)):
+            return False
+
+        if (ScenarioBundle.is_valid(self.sources)):
+            # same contents, remember the new modification times
+            self.sources = ScenarioBundle.get_sources(self.sources.keys())
+            return False
+
+        return True
+
+
+    def __set_revision(self):
+        digests = [self.sources[source][2] for source in sorted(self.sources.keys())]
+        self.revision = hashlib.sha1(" ".join(digests).encode("utf-8")).hexdigest()
+
+
     def print_scenario(self):
         print("Current scenario...")
         print("    Name    -> " + str(self.get_name()))
@@ -115,11 +276,67 @@ class Scenario:
         return self.catalog.get("name")
 
 
+    # snapshot aggregation options of a dynamic scenario (see SnapshotAggregation.py), None when not set
+    def get_aggregation(self):
+        return self.catalog.get("aggregation")
+
+
+    # rolling horizon options of a dynamic scenario (see RollingHorizon.py), None when not set
+    def get_rolling_horizon(self):
+        return self.catalog.get("rolling_horizon")
+
+
+    # RFID tags of all modules in the catalog
+    def get_module_tags(self):
+        tags = []
+        for RFID_tag, module_dict in self.catalog.items():
+            if (type(module_dict) == dict):
+                tags.append(RFID_tag)
+        return tags
+
+
+    # build the prototype of every module in the catalog
+    def compile_modules(self):
+        self.__prototypes.clear()
+        self.__time_series.clear()
+
+        for RFID_tag in self.get_module_tags():
+            self.__prototypes[RFID_tag] = self.__build_module(RFID_tag)
+
+        print("    Modules           -> " + str(len(self.__prototypes)))
+
+
+    # new instance of a compiled module, None if the RFID tag is not a (valid) module
     def get_module(self, RFID_tag):
 
         if (self.succes == False):
             return None
 
+        if (RFID_tag in self.__prototypes):
+            prototype = self.__prototypes[RFID_tag]
+        else:
+            prototype = self.__build_module(RFID_tag)
+
+            # tags which are not in the catalog are not remembered, the table can read any number of them
+            if (prototype != None):
+                self.__prototypes[RFID_tag] = prototype
+
+        if (prototype == None):
+            return None
+
+        module = Module()
+        module.name         = prototype.name
+        module.voltage      = prototype.voltage
+        module.RFID_tag     = prototype.RFID_tag
+
+        for component in prototype.components:
+            module.add_component(copy.copy(component))
+
+        return module
+
+
+    def __build_module(self, RFID_tag):
+
         module = Module()
         module_dict = self.catalog.get(RFID_tag)
         if (module_dict == None):
@@ -166,12 +383,10 @@ class Scenario:
                 generator.marginal_cost = generator_dict.get("marginal_cost") or generator.marginal_cost
                 generator.p_nom_extendable = generator_dict.get("p_nom_extendable") or generator.p_nom_extendable
 
-                pd_p_max_pu = self.__process_component_value(generator.p_max_pu)
-
                 if (generator.p_nom > 0):
-                    pd_p_max_pu = pd_p_max_pu / generator.p_nom
-
-                generator.p_max_pu = pd_p_max_pu
+                    generator.p_max_pu = self.__process_component_value(generator.p_max_pu, generator.p_nom)
+                else:
+                    generator.p_max_pu = self.__process_component_value(generator.p_max_pu)
 
                 module.add_component(generator)
                 generator_index = generator_index + 1
@@ -0,0 +1,138 @@
+# File: ScenarioBundle.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Precompiled scenarios, a bundle is one binary file with everything Scenario.load_scenario() builds from the
+# JSON file and CSV files: the catalog, the date index, the compiled modules (prototypes) and references to their
+# time series (the series themselves stay in the TimeSeriesStore)
+# Bundles are stored in the .bundles folder next to the scenarios, named after the JSON file
+#
+# The file starts with a header (bundle version, pandas version and the source files), followed by the scenario data
+# A bundle is valid as long as all source files (the JSON file and every CSV file it uses) are unchanged
+# A source file is unchanged when its size and modification time are equal, or otherwise when its SHA1 is equal
+# load() returns None when the bundle is missing, stale or unreadable, the scenario is then loaded from JSON
+# is_valid() and is_touched() are also used to find scenarios which changed since they were loaded
+#
+
+import pandas as pd
+import hashlib
+import pickle
+import os
+
+class ScenarioBundle:
+
+    version = 3
+    folder_name = ".bundles"
+    extension = ".bundle"
+
+    @classmethod
+    def get_path(cls, filepath):
+        folder = os.path.join(os.path.dirname(filepath), cls.folder_name)
+        name = os.path.splitext(os.path.basename(filepath))[0]
+        return os.path.join(folder, name + cls.extension)
+
+
+    # sources as returned by get_sources()
+    @classmethod
+    def save(cls, filepath, sources, data):
+        bundle_path = cls.get_path(filepath)
+
+        header = {
+            "version"   : cls.version,
+            "pandas"    : pd.__version__,
+            "sources"   : sources }
+
+        try:
+            os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+
+            # write to a temporary file first, so an interrupted compile never leaves a broken bundle
+            temporary_path = bundle_path + ".tmp"
+            with open(temporary_path, "wb") as bundle_file:
+                pickle.dump(header, bundle_file, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(data, bundle_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, bundle_path)
+
+        except (OSError, pickle.PicklingError) as error:
+            print("    Bundle            -> not written (" + str(error) + ")")
+            return False
+
+        return True
+
+
+    @classmethod
+    def load(cls, filepath):
+        bundle_path = cls.get_path(filepath)
+
+        if (not os.path.exists(bundle_path)):
+            return None
+
+        try:
+            with open(bundle_path, "rb") as bundle_file:
+                header = pickle.load(bundle_file)
+
+                if (header.get("version") != cls.version or header.get("pandas") != pd.__version__):
+                    return None
+
+                if (not cls.is_valid(header.get("sources"))):
+                    return None
+
+                return pickle.load(bundle_file)
+
+        except Exception:
+            # unreadable bundle, the scenario is compiled again
+            return None
+
+
+    # all source files unchanged
+    @classmethod
+    def is_valid(cls, sources):
+        if (sources == None):
+            return False
+
+        for source, status in sources.items():
+            try:
+                stat = os.stat(source)
+            except OSError:
+                return False
+
+            if (stat.st_size == status[0] and stat.st_mtime_ns == status[1]):
+                continue
+
+            if (stat.st_size != status[0] or cls.__get_digest(source) != status[2]):
+                return False
+
+        return True
+
+
+    # source file -> [size, modification time, SHA1]
+    @classmethod
+    def get_sources(cls, source_files):
+        return {source : cls.__get_status(source) for source in source_files}
+
+
+    # size or modification time of a source file changed (or it is deleted), without reading the files
+    @classmethod
+    def is_touched(cls, sources):
+        for source, status in sources.items():
+            try:
+                stat = os.stat(source)
+            except OSError:
+                return True
+
+            if (stat.st_size != status[0] or stat.st_mtime_ns != status[1]):
+                return True
+
+        return False
+
+
+    @classmethod
+    def __get_status(cls, source):
+        stat = os.stat(source)
+        return [stat.st_size, stat.st_mtime_ns, cls.__get_digest(source)]
+
+
+    @classmethod
+    def __get_digest(cls, source):
+        with open(source, "rb") as source_file:
+            return hashlib.sha1(source_file.read()).hexdigest()
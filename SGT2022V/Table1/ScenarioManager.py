@@ -5,59 +5,305 @@
 # Description:
 # Class which search a directory for JSON files and creates Scenario objects respectively
 # Only one scenario can be active and is returned with the get_current_scenario() method
-# Scenarios can be selected with the set_scenario(name) method 
+# Scenarios can be selected with the set_scenario(name) method
 # A name must be provided with this method, these are stored in the JSON files under "name"
 #
+# The manager is a lazy index, reload_scenarios() only reads the name and type of every JSON file
+# A Scenario object is created (JSON parsed, date range built, modules compiled) when the scenario is first selected,
+# the first scenario is the default but is only loaded when get_current_scenario() is called
+# The names and types are remembered in .scenario_index.json in the root folder together with the size and
+# modification time of the file, so unchanged JSON files are not even opened during a reload
+# warm_scenarios() loads the remaining scenarios in a background thread
+# compile_scenarios() writes the bundle (see ScenarioBundle.py) of every scenario again
+#
+# refresh_scenarios() is an incremental reload, a scenario is only dropped when the SHA1 of its JSON file changed
+# or (for loaded scenarios) one of its CSV files changed, has_changes() is a cheap check for a file watcher
+#
 
 from Timer import Timer
 from Scenario import Scenario
+from ScenarioBundle import ScenarioBundle
+
+import threading
+import hashlib
 import glob
+import json
+import os
 
 class ScenarioManager:
 
+    index_name = ".scenario_index.json"
+
     def __init__(self, rootpath):
-        self.scenarios = []
+        self.scenarios = {}         # name -> entry {"name", "type", "filepath", "digest", "scenario"}
         self.scenario_files = []
         self.scenario_root = rootpath
         self.current_scenario = None
         self.succes = False
 
+        self.__current_name = None
+        self.__headers = {}         # file -> [size, modification time, name, type, SHA1]
+        self.__lock = threading.Lock()
+        self.__warm_thread = None
+
         self.reload_scenarios()
 
 
+    # full reload, all scenarios are loaded again and the first scenario becomes the current scenario
     def reload_scenarios(self):
-        path = self.scenario_root + r"*.json"
-        scenario_paths = glob.glob(path)
+        with self.__lock:
+            self.scenarios = {}
+
+        self.current_scenario = None
+        self.__current_name = None
+
+        self.refresh_scenarios()
+
+
+    # incremental reload, only added, changed and removed scenario files are read
+    # scenarios which are not changed keep their Scenario object, the current scenario stays selected when it still exists
+    # returns the file paths of the scenarios which are changed or removed
+    def refresh_scenarios(self):
+        timer = Timer()
+        timer.start()
+
+        previous_entries = {entry["filepath"] : entry for entry in self.scenarios.values()}
+        scenario_files = self.__scan()
+
+        scenarios = {}
+        changed_files = []
+        num_added = 0
+
+        for scenario_file in scenario_files:
+            header = self.__headers[scenario_file]
+            name = header[2]
+            entry = previous_entries.get(scenario_file)
+
+            if (name == None):
+                continue
+
+            if (name in scenarios):
+                print("Duplicate scenario name -> " + str(name) + " (" + scenario_file + " ignored)")
+                continue
+
+            if (entry != None and entry["name"] == name and entry["digest"] == header[4]):
+                # JSON file unchanged, a loaded scenario can still have changed CSV files
+                if (entry["scenario"] != None and entry["scenario"].is_changed()):
+                    entry["scenario"] = None
+                    changed_files.append(scenario_file)
+
+                scenarios[name] = entry
+                continue
+
+            if (entry != None):
+                changed_files.append(scenario_file)
+            else:
+                num_added = num_added + 1
+
+            scenarios[name] = {
+                "name"      : name,
+                "type"      : header[3],
+                "filepath"  : scenario_file,
+                "digest"    : header[4],
+                "scenario"  : None }
+
+        num_removed = 0
+        for scenario_file in previous_entries.keys():
+            if (scenario_file not in scenario_files):
+                changed_files.append(scenario_file)
+                num_removed = num_removed + 1
+
+        with self.__lock:
+            self.scenarios = scenarios
+            self.scenario_files = scenario_files
+
+        # the current scenario stays, it is loaded again (when requested) if it changed
+        if (self.__current_name not in self.scenarios):
+            self.__current_name = next(iter(self.scenarios), None)
+            self.current_scenario = None
+
+        elif (self.current_scenario != None and self.current_scenario.filepath in changed_files):
+            self.current_scenario = None
+
+        self.succes = self.__current_name != None
+
+        timer.stop()
+
         print("Scenario search succesfull")
         print("    Root  -> " + self.scenario_root)
-        print("    Found -> " + str(len(scenario_paths)))
+        print("    Found -> " + str(len(self.scenarios)))
+        print("    Added -> " + str(num_added) + ", changed " + str(len(changed_files) - num_removed) + ", removed " + str(num_removed))
+        print(f"    Index took -> {timer.elapsed_time:0.6f} seconds")
 
-        self.scenarios.clear()
+        return changed_files
 
-        for scenario_file in scenario_paths:
-            scenario = Scenario()
-            scenario.load_scenario(scenario_file)
-            self.scenarios.append(scenario)
 
-        self.current_scenario = None
+    # quick check (only file sizes and modification times) if refresh_scenarios() would find anything
+    def has_changes(self):
+        scenario_files = glob.glob(self.scenario_root + r"*.json")
 
-        if (self.scenarios[0]):
-            self.set_scenario(self.scenarios[0].get_name())
+        # the order of glob() is not guaranteed, only the set of files counts
+        if (sorted(scenario_files) != sorted(self.scenario_files)):
+            return True
 
+        for scenario_file in scenario_files:
+            header = self.__headers.get(scenario_file)
 
-    def set_scenario(self, scenario_name):
-        for scenario in self.scenarios:
-            if scenario.get_name() == scenario_name:
-                self.current_scenario = scenario
+            try:
+                status = os.stat(scenario_file)
+            except OSError:
                 return True
-        # no scenario found
+
+            if (header == None or header[0] != status.st_size or header[1] != status.st_mtime_ns):
+                return True
+
+        for entry in list(self.scenarios.values()):
+            scenario = entry["scenario"]
+            if (scenario != None and ScenarioBundle.is_touched(scenario.sources)):
+                return True
+
         return False
 
 
+    def set_scenario(self, scenario_name):
+        scenario = self.get_scenario(scenario_name)
+
+        if (scenario == None):
+            # no scenario found
+            return False
+
+        self.current_scenario = scenario
+        self.__current_name = scenario_name
+        self.succes = True
+        return True
+
+
+    # Scenario object of the given name, loaded when it is used for the first time
+    def get_scenario(self, scenario_name):
+        entry = self.scenarios.get(scenario_name)
+
+        if (entry == None):
+            return None
+
+        with self.__lock:
+            if (entry["scenario"] == None):
+                scenario = Scenario()
+
+                if (scenario.load_scenario(entry["filepath"]) == False):
+                    return None
+
+                entry["scenario"] = scenario
+
+            return entry["scenario"]
+
+
+    def is_loaded(self, scenario_name):
+        entry = self.scenarios.get(scenario_name)
+        return entry != None and entry["scenario"] != None
+
+
+    # load all scenarios which are not loaded yet in a background thread
+    def warm_scenarios(self):
+        if (self.__warm_thread != None and self.__warm_thread.is_alive()):
+            return False
+
+        self.__warm_thread = threading.Thread(target=self.__warm, daemon=True)
+        self.__warm_thread.start()
+        return True
+
+
+    def __warm(self):
+        for scenario_name in list(self.scenarios.keys()):
+            if (not self.is_loaded(scenario_name)):
+                self.get_scenario(scenario_name)
+
+
+    # load every scenario from its JSON file and write its bundle again
+    def compile_scenarios(self):
+        compiled = 0
+
+        for scenario_name in list(self.scenarios.keys()):
+            entry = self.scenarios[scenario_name]
+            scenario = Scenario()
+
+            if (scenario.load_scenario(entry["filepath"], use_bundle=False)):
+                compiled = compiled + 1
+
+                with self.__lock:
+                    if (entry["scenario"] == None):
+                        entry["scenario"] = scenario
+
+        return compiled
+
+
     def print_scenario_list(self):
-        for scenario in self.scenarios:
-            print(scenario.get_name())
+        for scenario_name in self.scenarios:
+            print(scenario_name)
+
 
-    
     def get_current_scenario(self):
+        if (self.current_scenario == None and self.__current_name != None):
+            self.current_scenario = self.get_scenario(self.__current_name)
         return self.current_scenario
+
+
+    # find all scenario files and update their headers, only files which changed since the last scan are read
+    # files are kept in the order of glob(), like before the index, so the same scenario is the first (default) one
+    def __scan(self):
+        scenario_files = glob.glob(self.scenario_root + r"*.json")
+        index_path = os.path.join(self.scenario_root, self.index_name)
+
+        if (len(self.__headers) == 0):
+            try:
+                with open(index_path) as index_file:
+                    self.__headers = json.load(index_file)
+            except (OSError, ValueError):
+                self.__headers = {}
+
+        index_changed = False
+
+        for scenario_file in scenario_files:
+            status = os.stat(scenario_file)
+            header = self.__headers.get(scenario_file)
+
+            if (header == None or len(header) != 5 or header[0] != status.st_size or header[1] != status.st_mtime_ns):
+                self.__headers[scenario_file] = self.__read_header(scenario_file, status)
+                index_changed = True
+
+        # forget deleted files
+        for scenario_file in list(self.__headers.keys()):
+            if (scenario_file not in scenario_files):
+                del self.__headers[scenario_file]
+                index_changed = True
+
+        if (index_changed):
+            self.__save_index(index_path)
+
+        return scenario_files
+
+
+    # [size, modification time, name, type, SHA1] of a scenario file
+    def __read_header(self, scenario_file, status):
+        try:
+            with open(scenario_file, "rb") as json_file:
+                contents = json_file.read()
+            catalog = json.loads(contents)
+        except (OSError, ValueError):
+            print("Could not read scenario -> " + scenario_file)
+            return [status.st_size, status.st_mtime_ns, None, None, None]
+
+        digest = hashlib.sha1(contents).hexdigest()
+        return [status.st_size, status.st_mtime_ns, catalog.get("name"), catalog.get("simulation_type"), digest]
+
+
+    def __save_index(self, index_path):
+        try:
+            temporary_path = index_path + ".tmp"
+
+            with open(temporary_path, "w") as index_file:
+                json.dump(self.__headers, index_file)
+
+            os.replace(temporary_path, index_path)
+
+        except OSError:
+            pass
@@ -0,0 +1,62 @@
+# File: ScenarioWatcher.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Background thread which checks the scenario folders for added, changed and removed files
+# The thread only looks at file sizes and modification times (ScenarioManager.has_changes()) and raises the changed flag,
+# the table reloads the scenarios itself on the main thread, so scenarios never change during a calculation
+# notify is called with (event_type, data) when the flag is raised, so the main routine wakes up
+#
+
+from threading import Thread, Event
+from EventQueue import EventQueue
+
+class ScenarioWatcher:
+
+    def __init__(self, scenario_managers, interval=1.0):
+        self.scenario_managers = scenario_managers
+        self.interval = interval
+        self.changed = False
+        self.notify = None
+
+        self.__stop_event = Event()
+        self.__thread = None
+
+
+    def start(self):
+        if (self.is_running()):
+            return
+
+        self.__stop_event.clear()
+        self.__thread = Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+
+    def stop(self):
+        if (self.__thread != None):
+            self.__stop_event.set()
+            self.__thread.join()
+            self.__thread = None
+
+
+    def is_running(self):
+        return self.__thread != None and self.__thread.is_alive()
+
+
+    def __run(self):
+        while (not self.__stop_event.wait(self.interval)):
+            if (self.changed):
+                continue
+
+            for scenario_manager in self.scenario_managers:
+                try:
+                    if (scenario_manager.has_changes()):
+                        self.changed = True
+
+                        if (self.notify != None):
+                            self.notify(EventQueue.SCENARIO)
+                        break
+                except OSError:
+                    # file removed during the check, try again next time
+                    pass
@@ -4,28 +4,47 @@
 #
 # Description:
 # The base of all table sections
-# This class controls the MQTT connections and message handlers
+# This class controls the MQTT subscriptions and message handlers
+# All sections share one MQTT connection per broker (MQTTTransport), a section only subscribes its own topic
+#
+# MQTT messages arrive on the network thread of the section, they are turned into SectionChange records and queued
+# Platforms, modules and ledstrips are only changed by apply_change() on the main routine, so a calculation never
+# sees a half placed module. Without a queue (changes is None) the changes are applied directly
+#
+# Connecting is a handshake per section (connect_step): the section is rebooted until it answers "Table Connected",
+# with a growing delay between the reboots, then its modules are requested. The section is done when every platform
+# has reported its module, or when no report arrived for modules_quiet_time seconds
 #
 
 from Bus import Bus
 from Line import Line
 from Platform import Platform
+from LedstripBank import LedstripBank
+from EventQueue import EventQueue
+from SectionChange import SectionChange
+
+from MQTTTransport import MQTTTransport
 
-import paho.mqtt.client as mqtt
 import json
+import time
 
 class Section:
 
     voltage = ""
 
+    # seconds between reboots while connecting, doubled after every reboot
+    reboot_delay_min = 4.0
+    reboot_delay_max = 16.0
+
+    # seconds without module reports after which a section is done reporting
+    modules_quiet_time = 1.0
+
     def __init__(self, section_name):
         self.name   = section_name
         self.__prefix = section_name + "_"
 
-        self.__mqtt_client    = mqtt.Client()
-        self.__mqtt_broker    = "broker.hivemq.com"
+        self.__mqtt_transport = MQTTTransport.get_transport()
         self.__mqtt_topic     = "SmartDemoTable"
-        self.__mqtt_port      = 1883
         self.__mqtt_subscribe = self.__mqtt_topic + "/" + section_name + "/Outgoing"
         self.__mqtt_publish   = self.__mqtt_topic + "/" + section_name + "/Ingoing"
 
@@ -34,15 +53,28 @@ class Section:
         self.components = []
         self.ledstrips  = []
 
+        # values of all ledstrips, the Ledstrip objects are views on this bank
+        self.ledstrip_bank = LedstripBank(self.voltage)
+
         self.platforms  = []
 
         self.print_module_messages = False
 
+        # queue of SectionChange records for the main routine, and called with (event_type, data) when a record is queued
+        self.changes = None
+        self.notify  = None
+
         self.__scenario    = None
 
-        self.__mqtt_connected    = False
         self.__section_connected = False
 
+        # handshake state, see connect_step()
+        self.__reboot_time        = 0.0
+        self.__reboot_delay       = self.reboot_delay_min
+        self.__modules_requested  = False
+        self.__modules_time       = 0.0
+        self.__reported_locations = set()
+
 
     def set_scenario(self, scenario):
         self.__scenario = scenario
@@ -79,6 +111,33 @@ class Section:
         return command
 
 
+    # get_message_string_all() for every row of the given ledstrip code arrays (rows x ledstrips)
+    def get_message_strings_all(self, states, loads, directions, speeds):
+        bank = self.ledstrip_bank
+        values = {}
+
+        messages = []
+        for row in range(0, len(states)):
+            lines = []
+
+            for i in range(0, self.num_ledstrips):
+                key = (states[row][i], loads[row][i], directions[row][i], speeds[row][i])
+
+                if (key not in values):
+                    values[key] = str({
+                        "state": bank.states[key[0]],
+                        "voltage": self.voltage,
+                        "load": bank.loads[key[1]],
+                        "direction": int(key[2]),
+                        "speed": int(key[3]) })
+
+                lines.append('"line {}": '.format(i) + values[key])
+
+            messages.append("{'command': 'Flow Config', 'lines': {" + ", ".join(lines) + "}}")
+
+        return messages
+
+
     def get_message_string(self):
 
         last_ledstrip = 0
@@ -121,6 +180,10 @@ class Section:
         self.buses.append( Bus(self.__prefix + name, v_nom=v_nom) )
 
 
+    def add_ledstrip(self):
+        self.ledstrips.append( self.ledstrip_bank.add_ledstrip() )
+
+
     def add_platform(self, bus, voltage, RFID_location, error_lines, RFID_tags):
         self.platforms.append( Platform(self.__prefix+bus, voltage, RFID_location, error_lines, RFID_tags) )
 
@@ -136,6 +199,49 @@ class Section:
         return self.__section_connected
 
 
+    # start the handshake of connect_step() again
+    def connect_reset(self):
+        self.__section_connected = False
+        self.__reboot_time       = 0.0
+        self.__reboot_delay      = self.reboot_delay_min
+        self.__modules_requested = False
+        self.__reported_locations.clear()
+
+
+    # one step of the handshake, only called from the main routine. Returns True when the section is done
+    def connect_step(self):
+        if (self.mqtt_is_connected() == False):
+            return False
+
+        now = time.perf_counter()
+
+        if (self.__section_connected == False):
+            if (now >= self.__reboot_time):
+                self.reboot_section()
+                self.__reboot_time  = now + self.__reboot_delay
+                self.__reboot_delay = min(self.__reboot_delay * 2, self.reboot_delay_max)
+            return False
+
+        if (self.__modules_requested == False):
+            self.retrieve_modules()
+
+        return self.connect_is_done()
+
+
+    def connect_is_done(self):
+        if (self.__section_connected == False or self.__modules_requested == False):
+            return False
+
+        return self.modules_are_reported() or time.perf_counter() - self.__modules_time >= self.modules_quiet_time
+
+
+    def modules_are_reported(self):
+        for platform in self.platforms:
+            if (platform.RFID_location not in self.__reported_locations):
+                return False
+        return True
+
+
     def print_module_status(self):
         num_of_platforms = len(self.platforms)
         num_of_modules = 0
@@ -146,7 +252,24 @@ class Section:
 
 
     def mqtt_set_broker(self, broker):
-        self.__mqtt_broker = broker
+        self.mqtt_set_transport(MQTTTransport.get_transport(broker))
+
+
+    # move the subscription of this section to another (shared) connection
+    def mqtt_set_transport(self, transport):
+        subscribed = self.__mqtt_transport.is_subscribed(self.__mqtt_subscribe)
+
+        if (subscribed):
+            self.__mqtt_transport.unsubscribe(self.__mqtt_subscribe)
+
+        self.__mqtt_transport = transport
+
+        if (subscribed):
+            self.__mqtt_transport.subscribe(self.__mqtt_subscribe, self.on_message)
+
+
+    def mqtt_get_transport(self):
+        return self.__mqtt_transport
 
 
     def mqtt_set_topic(self, topic):
@@ -154,68 +277,59 @@ class Section:
 
 
     def mqtt_is_connected(self):
-        return self.__mqtt_connected
+        return self.__mqtt_transport.is_connected() and self.__mqtt_transport.is_subscribed(self.__mqtt_subscribe)
 
 
     def reboot_section(self):
-        self.__mqtt_client.publish(self.__mqtt_publish, "{'command': 'Reboot'}")
+        self.__mqtt_transport.publish(self.__mqtt_publish, "{'command': 'Reboot'}")
 
 
-    def mqtt_connect(self):
-        self.__mqtt_client.on_connect = self.on_connect
-        self.__mqtt_client.on_message = self.on_message
+    # subscribe the topic of this section, without starting the connection
+    def mqtt_subscribe(self):
+        self.__mqtt_transport.subscribe(self.__mqtt_subscribe, self.on_message)
 
-        if (self.__mqtt_connected == False):
-            self.__mqtt_client.connect(self.__mqtt_broker, self.__mqtt_port)
-            self.__mqtt_client.loop_start()
+
+    def mqtt_connect(self):
+        self.mqtt_subscribe()
+        self.__mqtt_transport.connect()
 
 
+    # the shared connection stays open for the other sections
     def mqtt_disconnect(self):
-        print(self.name + ": Closing MQTT Client")
-        if (self.__mqtt_connected == True):
-            self.__mqtt_client.loop_stop()
-            self.__mqtt_connected = False
+        print(self.name + ": Closing MQTT subscription")
+        self.__mqtt_transport.unsubscribe(self.__mqtt_subscribe)
 
 
     def mqtt_publish(self):
-        self.__mqtt_client.publish(self.__mqtt_publish, self.get_message_string_all())
+        self.__mqtt_transport.publish(self.__mqtt_publish, self.get_message_string_all())
 
 
-    def mqtt_publish_if_changed(self):
-        changed = False
+    # publish a message which is already encoded, for example a precomputed frame
+    def mqtt_publish_payload(self, payload):
+        self.__mqtt_transport.publish(self.__mqtt_publish, payload)
 
-        for ledstrip in self.ledstrips:
-            if (ledstrip.is_changed()):
-                changed = True
 
+    def mqtt_publish_if_changed(self):
         # only publish when ledstrips have changed
-        if (changed):
-            self.__mqtt_client.publish(self.__mqtt_publish, self.get_message_string())
+        if (self.ledstrip_bank.is_changed().any()):
+            self.__mqtt_transport.publish(self.__mqtt_publish, self.get_message_string())
 
-        for ledstrip in self.ledstrips:
-            ledstrip.reset_changed_flags()
+        self.ledstrip_bank.reset_changed_flags()
 
 
     def retrieve_modules(self):
+        self.__modules_requested = True
+        self.__modules_time      = time.perf_counter()
+        self.__reported_locations.clear()
+
         message = "{'command': 'Get Data'}"
-        self.__mqtt_client.publish(self.__mqtt_publish, message)
+        self.__mqtt_transport.publish(self.__mqtt_publish, message)
 
 
     def is_network_connected(self):
         return True
 
 
-    def on_connect(self, client, userdata, flags, rc):
-        # rc is the error code returned when connecting to the broker
-        self.__mqtt_client.subscribe(self.__mqtt_subscribe)
-
-        if(rc != 0):
-            print(self.name + ": Error: " + str(rc))
-        else:
-            self.__mqtt_connected = True
-            print(self.name + ": Succesfully started MQTT client")
-
-
     def on_message(self, client, userdata, msg):
         message = str(msg.payload.decode("utf-8"))  #removes b'' in string
 
@@ -227,6 +341,27 @@ class Section:
         except:
             return
 
+        if (command or RFID_tag):
+            self.post_change(SectionChange(self.name, command, module_location, RFID_tag))
+
+
+    def post_change(self, change):
+        if (self.changes == None):
+            self.apply_change(change)
+            return
+
+        self.changes.put(change)
+
+        if (self.notify != None):
+            self.notify(EventQueue.MODULES, self.name)
+
+
+    # only called from the main routine
+    def apply_change(self, change):
+        command         = change.command
+        module_location = change.RFID_location
+        RFID_tag        = change.RFID_tag
+
         if (command):
             if(command == "Table Connected"):
                 print(self.name + ": Succesfully connected!")
@@ -234,6 +369,9 @@ class Section:
                 self.mqtt_publish()
 
         if (RFID_tag):
+            self.__modules_time = time.perf_counter()
+            self.__reported_locations.add(module_location)
+
             platform = None
 
             for platform_loop in self.platforms:
@@ -260,19 +398,7 @@ class Section:
 
                     if (module != None):
 
-                        wrong_platform = True
-
-                        for accepted_module in platform.accepted_modules:
-                            for component in module.components:
-
-                                if (accepted_module == module.RFID_tag):
-                                    wrong_platform = False
-
-                                if (accepted_module == component.type):
-                                    wrong_platform = False
-
-                        if(module.voltage != platform.voltage):
-                            wrong_platform = True
+                        wrong_platform = not platform.accepts_module(module)
 
                         if (wrong_platform):
 
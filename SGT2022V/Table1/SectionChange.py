@@ -0,0 +1,15 @@
+# File: SectionChange.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Immutable record of one MQTT message of a table section: a module placed or removed, or a section command
+# Records are created on the MQTT thread of the section (Section.on_message) and queued,
+# only the main routine applies them to the platforms, modules and ledstrips (Section.apply_change)
+#
+
+from collections import namedtuple
+
+class SectionChange(namedtuple("SectionChange", ["section", "command", "RFID_location", "RFID_tag"])):
+
+    __slots__ = ()
@@ -8,7 +8,6 @@
 #
 
 from Section import Section
-from Ledstrip import Ledstrip
 
 class Section_MV (Section):
 
@@ -30,7 +29,7 @@ class Section_MV (Section):
 
         # ledstrips
         for i in range(self.num_ledstrips):
-            self.ledstrips.append( Ledstrip(self.voltage) )
+            self.add_ledstrip()
 
         # buses
         for i in range(0, self.num_buses):
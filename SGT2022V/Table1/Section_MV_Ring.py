@@ -7,7 +7,6 @@
 #
 
 from Section import Section
-from Ledstrip import Ledstrip
 
 class Section_MV_Ring (Section):
 
@@ -29,7 +28,7 @@ class Section_MV_Ring (Section):
 
         # ledstrips
         for i in range(self.num_ledstrips):
-            self.ledstrips.append( Ledstrip(self.voltage) )
+            self.add_ledstrip()
 
         # buses
         for i in range(0, self.num_buses):
@@ -5,18 +5,40 @@
 # Description:
 # Class which drives the PyPSA calculations and network
 # Components are added to a list and this list will be compared with the current network configuration
+# Components are indexed by name together with a fingerprint of their parameters
 # If Components are missing, these will be removed from the PyPSA network
-# New Components will be added
+# New Components will be added, Components with changed parameters are updated in place
+# Additions and removals are applied with one bulk call per component type
 #
 # It is done this way because creating a whole new network each time takes extremly long
 #
 
 import pypsa
+import pandas as pd
+import numpy as np
 
 from Timer import Timer
+from SimulationResult import SimulationResult
+from MeritOrder import MeritOrder
+from PersistentModel import PersistentModel
+from InMemorySolver import InMemorySolver
+from SnapshotAggregation import SnapshotAggregation
+from RollingHorizon import RollingHorizon
+from ParallelPowerFlow import ParallelPowerFlow
+from LinearPowerFlow import LinearPowerFlow
 
 class Simulation:
 
+    # LOPF solver backends: glpk writes LP files and starts a solver process, highs solves in memory
+    solver_backends = ["glpk", "highs"]
+
+    # PyPSA class of each component type
+    __component_classes = {
+        "Generator" : "Generator",
+        "Load"      : "Load",
+        "Storage"   : "StorageUnit",
+        "Link"      : "Link" }
+
     def __init__(self):
 
         self.network  = pypsa.Network()
@@ -28,13 +50,12 @@ class Simulation:
         pypsa.pf.logger.disabled  = True
         pypsa.opf.logger.disabled = True
 
-        self.__export_results = True
-
         self.static_buses = []
         self.static_lines = []
 
-        # current component list
-        self.__components = []
+        # current components and parameter fingerprints, indexed by name
+        self.__components   = {}
+        self.__fingerprints = {}
 
         # new component list
         self.__new_components = []
@@ -44,6 +65,29 @@ class Simulation:
         self.__num_of_storages      = 0
         self.__num_of_links         = 0
 
+        # LOPF fast path, verify also runs the LP solver and compares both results
+        self.merit_order        = MeritOrder()
+        self.merit_order_enable = True
+        self.merit_order_verify = False
+
+        self.solver_backend     = "glpk"
+        self.__in_memory_solver = InMemorySolver()
+
+        # LOPF model kept in memory between calculations (mode plopf)
+        self.persistent_model   = PersistentModel()
+
+        # dynamic LOPF on aggregated snapshots, verify also solves all snapshots and prints the error
+        self.aggregation_verify = False
+
+        # dynamic PF on a pool of processes, 0 or 1 runs the power flow in this process
+        self.pf_workers = 0
+        self.__parallel_power_flow = None
+
+        # LPF of all snapshots with one factorisation, verify also runs the LPF of PyPSA and compares both results
+        self.linear_power_flow        = LinearPowerFlow()
+        self.linear_power_flow_enable = True
+        self.linear_power_flow_verify = False
+
     
     def reset_pypsa_network(self):
 
@@ -51,6 +95,7 @@ class Simulation:
         self.network = pypsa.Network()
         
         self.__components.clear()
+        self.__fingerprints.clear()
         self.__new_components.clear()
 
         self.__num_of_generators    = 0
@@ -70,6 +115,10 @@ class Simulation:
         for line in self.static_lines:
             self.network.add("Line", line.name, bus0=line.bus0, bus1=line.bus1, x=line.x, r=line.r, s_nom_extendable=True)
 
+        self.merit_order.set_topology(self.static_buses, self.static_lines)
+        self.linear_power_flow.set_topology(self.static_buses, self.static_lines)
+        self.persistent_model.set_topology(self.static_buses, self.static_lines)
+
 
     def clear_components(self):
         self.__new_components.clear()
@@ -79,98 +128,123 @@ class Simulation:
         self.__new_components.append(component)
 
 
-    # add Generator into PyPSA network
-    def __add_generator(self, generator):
+    # PyPSA attributes of a Generator
+    def __generator_attributes(self, generator):
 
         p_max_pu = generator.p_max_pu
 
         if (generator.p_nom > 0):
             p_max_pu = p_max_pu / generator.p_nom
 
-        self.__components.append(generator) 
-        self.__num_of_generators = self.__num_of_generators + 1  
-
-        self.network.add(
-            "Generator", 
-            name=generator.name, 
-            bus=generator.bus0, 
-            p_set=generator.p_set,
-            p_nom=generator.p_nom,
-            p_nom_min=generator.p_nom_min,
-            p_nom_max=generator.p_nom_max,
-            p_max_pu=p_max_pu,
-            p_min_pu=generator.p_min_pu,
-            marginal_cost=generator.marginal_cost,
-            p_nom_extendable=generator.p_nom_extendable)
-
-
-    # add Load into PyPSA network
-    def __add_load(self, load):
-
-        self.__components.append(load)
-        self.__num_of_loads = self.__num_of_loads + 1
-        self.network.add(
-        "Load",
-        name=load.name,
-        bus=load.bus0,
-        p_set=load.p_set,
-        q_set=load.q_set)
-
-
-    # add StorageUnit into PyPSA network
-    def __add_storage(self, storage): 
-        self.__components.append(storage)
-        self.__num_of_storages = self.__num_of_storages + 1
-        self.network.add(
-        "StorageUnit",
-        name=storage.name,
-        bus=storage.bus0,
-        p_nom_min=storage.p_nom_min,
-        p_nom_max=storage.p_nom_max,
-        p_nom_extendable=storage.p_nom_extendable,
-        marginal_cost=storage.marginal_cost,
-        state_of_charge_initial=storage.state_of_charge_initial)
-
-
-    # add dynamic line into PyPSA network
-    def __add_link(self, line):
-        self.__components.append(line)     
-        self.__num_of_links = self.__num_of_links + 1
-
-        self.network.add(
-        "Link",
-        name=line.name,
-        bus0=line.bus0,
-        bus1=line.bus1,
-        p_nom_extendable=True)
-
-
-    # remove Generator from PyPSA network
-    def __remove_generator(self, generator):
-        self.network.remove("Generator", name=generator.name)
-        self.__num_of_generators = self.__num_of_generators - 1
-        self.__components.remove(generator)
-
-
-    # remove Load from PyPSA network
-    def __remove_load(self, load):
-        self.network.remove("Load", name=load.name)
-        self.__num_of_loads = self.__num_of_loads - 1
-        self.__components.remove(load)
-
-
-    # remove StorageUnit from PyPSA network
-    def __remove_storage(self, storage):
-        self.network.remove("StorageUnit", name=storage.name)
-        self.__num_of_storages = self.__num_of_storages - 1
-        self.__components.remove(storage)
-
-
-    # remove StorageUnit from PyPSA network
-    def __remove_link(self, line):
-        self.network.remove("Link", name=line.name)
-        self.__num_of_links = self.__num_of_links - 1
-        self.__components.remove(line)
+        return {
+            "bus"               : generator.bus0,
+            "p_set"             : generator.p_set,
+            "p_nom"             : generator.p_nom,
+            "p_nom_min"         : generator.p_nom_min,
+            "p_nom_max"         : generator.p_nom_max,
+            "p_max_pu"          : p_max_pu,
+            "p_min_pu"          : generator.p_min_pu,
+            "marginal_cost"     : generator.marginal_cost,
+            "p_nom_extendable"  : generator.p_nom_extendable }
+
+
+    # PyPSA attributes of a Load
+    def __load_attributes(self, load):
+        return {
+            "bus"   : load.bus0,
+            "p_set" : load.p_set,
+            "q_set" : load.q_set }
+
+
+    # PyPSA attributes of a StorageUnit
+    def __storage_attributes(self, storage):
+        return {
+            "bus"                       : storage.bus0,
+            "p_nom_min"                 : storage.p_nom_min,
+            "p_nom_max"                 : storage.p_nom_max,
+            "p_nom_extendable"          : storage.p_nom_extendable,
+            "marginal_cost"             : storage.marginal_cost,
+            "state_of_charge_initial"   : storage.state_of_charge_initial }
+
+
+    # PyPSA attributes of a dynamic line
+    def __link_attributes(self, line):
+        return {
+            "bus0"              : line.bus0,
+            "bus1"              : line.bus1,
+            "p_nom_extendable"  : True }
+
+
+    def __component_attributes(self, component):
+
+        if (component.type == "Generator"):
+            return self.__generator_attributes(component)
+
+        if (component.type == "Load"):
+            return self.__load_attributes(component)
+
+        if (component.type == "Storage"):
+            return self.__storage_attributes(component)
+
+        if (component.type == "Link"):
+            return self.__link_attributes(component)
+
+        return None
+
+
+    # parameter fingerprint, time series are compared by their values
+    def __fingerprint(self, attributes):
+        fingerprint = []
+
+        for attribute, value in attributes.items():
+            if (isinstance(value, pd.Series)):
+                value = (len(value), hash(value.to_numpy().tobytes()))
+            fingerprint.append((attribute, value))
+
+        return tuple(fingerprint)
+
+
+    # add components of one type into the PyPSA network with a single call
+    def __add_components(self, class_name, names, attributes):
+
+        static = {}
+        series = {}
+
+        for attribute in attributes[0]:
+            values = [component_attributes[attribute] for component_attributes in attributes]
+            time_varying = {}
+
+            for i in range(0, len(names)):
+                if (isinstance(values[i], pd.Series)):
+                    time_varying[names[i]] = values[i]
+                    values[i] = self.network.components[class_name]["attrs"].at[attribute, "default"]
+
+            static[attribute] = values
+
+            if (len(time_varying) > 0):
+                series[attribute] = pd.DataFrame(time_varying, index=self.network.snapshots)
+
+        self.network.madd(class_name, names, **static)
+
+        for attribute, dataframe in series.items():
+            self.network.import_series_from_dataframe(dataframe, class_name, attribute)
+
+
+    # update the attributes of a component already in the PyPSA network
+    def __update_component(self, class_name, name, attributes):
+
+        static = self.network.df(class_name)
+        series = self.network.pnl(class_name)
+
+        for attribute, value in attributes.items():
+            if (isinstance(value, pd.Series)):
+                series[attribute][name] = value.reindex(self.network.snapshots).values
+            else:
+                static.at[name, attribute] = value
+
+                # a constant value replaces the time series
+                if (attribute in series and name in series[attribute].columns):
+                    series[attribute] = series[attribute].drop(columns=name)
 
 
     def get_num_of_generators(self):
@@ -201,6 +275,215 @@ class Simulation:
         self.__static = False
 
 
+    def set_options(self, options):
+        self.merit_order_enable = options.get("merit_order", self.merit_order_enable)
+        self.merit_order_verify = options.get("merit_order_verify", self.merit_order_verify)
+        self.solver_backend     = options.get("solver", self.solver_backend)
+        self.aggregation_verify = options.get("aggregation_verify", self.aggregation_verify)
+        self.pf_workers         = options.get("pf_workers", self.pf_workers)
+        self.linear_power_flow_enable = options.get("linear_power_flow", self.linear_power_flow_enable)
+        self.linear_power_flow_verify = options.get("linear_power_flow_verify", self.linear_power_flow_verify)
+
+
+    # load the components of a SimulationJob into the network and run its calculation
+    # returns None when is_superseded reports the job as outdated before the calculation starts
+    # progress(job, result) receives the results of the first snapshots of a rolling horizon LOPF after every window
+    def simulate(self, job, is_superseded=None, progress=None):
+
+        timer = Timer()
+        timer.start()
+
+        self.set_options(job.options)
+
+        rolling     = RollingHorizon(job.options.get("rolling_horizon"))
+        aggregation = SnapshotAggregation(job.options.get("aggregation"))
+
+        # the persistent model does not use the PyPSA network, it always solves all snapshots at once
+        if (job.mode == "plopf"):
+            if (self.persistent_model.is_available()):
+                if (is_superseded != None and is_superseded(job)):
+                    print("Simulation job " + str(job.job_id) + " superseded, calculation cancelled")
+                    return None
+
+                if (job.static == False and rolling.is_enabled(len(job.index))):
+                    print("Rolling horizon -> not used by plopf, all snapshots are solved at once")
+
+                if (job.static == False and aggregation.is_enabled()):
+                    print("Snapshot aggregation -> not used by plopf, all snapshots are solved at once")
+
+                return self.plopf(job)
+
+            print("Persistent model not available (requires pyomo and highspy), using LOPF")
+
+        # dynamic LOPF in windows, the aggregation is not used then
+        # plopf only gets here without the persistent model, it is then solved as LOPF
+        if ((job.mode == "lopf" or job.mode == "plopf") and job.static == False and rolling.is_enabled(len(job.index))):
+            return self.rolling_lopf(job, rolling, is_superseded, progress)
+
+        # dynamic LOPF on fewer snapshots, the results are mapped back onto every snapshot (plopf as above)
+        aggregated  = (job.mode == "lopf" or job.mode == "plopf") and job.static == False and aggregation.is_enabled()
+
+        if (aggregated):
+            components = aggregation.aggregate(job.index, job.components)
+            self.load_components(aggregation.aggregated_index, job.static, components, aggregation.weights)
+        else:
+            self.load_components(job.index, job.static, job.components)
+
+        timer.stop()
+        print(f"PyPSA network reload took -> {timer.elapsed_time:0.6f} seconds")
+
+        if (is_superseded != None and is_superseded(job)):
+            print("Simulation job " + str(job.job_id) + " superseded, calculation cancelled")
+            return None
+
+        if (job.mode == "lopf" or job.mode == "plopf"):
+            succes = self.lopf()
+
+        if (job.mode == "lpf"):
+            if (job.static == False and self.linear_power_flow_enable):
+                succes = self.vectorised_lpf() and self.get_num_of_generators() > 0
+            else:
+                succes = self.lpf() and self.get_num_of_generators() > 0
+
+        if (job.mode == "pf"):
+            if (job.static == False and self.pf_workers > 1 and len(job.index) > 1):
+                succes = self.parallel_pf(job) and self.get_num_of_generators() > 0
+            else:
+                succes = self.pf() and self.get_num_of_generators() > 0
+
+        if (aggregated):
+            return self.aggregation_result(job, aggregation, succes)
+
+        return self.get_result(succes)
+
+
+    # LOPF window by window, the state of charge of the storage units is carried over to the next window
+    def rolling_lopf(self, job, rolling, is_superseded=None, progress=None):
+        num_of_snapshots = len(job.index)
+        windows = rolling.get_windows(num_of_snapshots)
+
+        print("Rolling horizon -> " + rolling.get_description() + ", " + str(len(windows)) + " windows")
+
+        state_of_charge = {}
+        results = []
+        result = None
+
+        for number, (start, keep, end) in enumerate(windows):
+
+            if (is_superseded != None and is_superseded(job)):
+                print("Simulation job " + str(job.job_id) + " superseded, calculation cancelled")
+                return None
+
+            timer = Timer()
+            timer.start()
+
+            components = rolling.get_components(job.components, num_of_snapshots, start, end, state_of_charge)
+            self.load_components(job.index[start:end], job.static, components)
+
+            timer.stop()
+            print("Window " + str(number + 1) + "/" + str(len(windows)) + " -> snapshots " + str(start) + " to " + str(keep - 1))
+            print(f"PyPSA network reload took -> {timer.elapsed_time:0.6f} seconds")
+
+            if (not self.lopf()):
+                return self.get_result(False)
+
+            window_result = self.get_result(True)
+            window_result.lines_p0     = window_result.lines_p0.iloc[:keep - start]
+            window_result.generators_p = window_result.generators_p.iloc[:keep - start]
+            window_result.loads_p      = window_result.loads_p.iloc[:keep - start]
+            results.append(window_result)
+
+            storage_soc = self.network.storage_units_t.state_of_charge
+            for name in storage_soc.columns:
+                state_of_charge[name] = float(storage_soc[name].iloc[keep - start - 1])
+
+            result = SimulationResult()
+            result.succes       = True
+            result.complete     = keep >= num_of_snapshots
+            result.lines_p0     = pd.concat([window_result.lines_p0 for window_result in results])
+            result.generators_p = pd.concat([window_result.generators_p for window_result in results])
+            result.loads_p      = pd.concat([window_result.loads_p for window_result in results])
+
+            if (progress != None and keep < num_of_snapshots):
+                progress(job, result)
+
+        return result
+
+
+    # set the snapshots (with optional weights) and components of the network
+    def load_components(self, index, static, components, weights=None):
+        self.set_index(index)
+
+        if (static):
+            self.enable_static()
+        else:
+            self.enable_dynamic()
+
+        self.clear_components()
+
+        for component in components:
+            self.add_component(component)
+
+        self.update_network()
+
+        # the weightings of earlier aggregated calculations must not stay behind
+        # a DataFrame (objective, stores, generators) since PyPSA 0.18, a Series before
+        snapshot_weightings = self.network.snapshot_weightings
+        if (isinstance(snapshot_weightings, pd.DataFrame)):
+            for column in snapshot_weightings.columns:
+                snapshot_weightings[column] = 1.0 if (weights is None) else weights
+        else:
+            snapshot_weightings[:] = 1.0 if (weights is None) else weights
+
+
+    # results of an aggregated LOPF on the full index, verify also solves all snapshots and prints the error
+    def aggregation_result(self, job, aggregation, succes):
+        print("    Aggregation -> " + aggregation.get_description() + ", " + str(len(aggregation.index)) + " -> " + str(len(aggregation.aggregated_index)) + " snapshots")
+
+        result = self.get_result(succes)
+        result.lines_p0     = aggregation.expand(result.lines_p0)
+        result.generators_p = aggregation.expand(result.generators_p)
+        result.loads_p      = aggregation.expand(result.loads_p)
+        result.buses_v_mag_pu = aggregation.expand(result.buses_v_mag_pu)
+        result.buses_v_ang    = aggregation.expand(result.buses_v_ang)
+
+        if (self.aggregation_verify and succes):
+            self.aggregation_compare(job, result, self.network.objective)
+
+        return result
+
+
+    # solve all snapshots of the job and print the differences with the aggregated results
+    def aggregation_compare(self, job, result, objective):
+        self.load_components(job.index, job.static, job.components)
+
+        if (not self.lopf()):
+            print("    Verify      -> LOPF on all snapshots FAILED")
+            return
+
+        full_objective = self.network.objective
+        line_error = (self.network.lines_t.p0 - result.lines_p0).to_numpy()
+
+        relative_error = abs(objective - full_objective) / max(abs(full_objective), 1e-9)
+
+        print("    Verify      -> objective " + str(objective) + ", all snapshots " + str(full_objective) + f" ({relative_error * 100:0.3f} %)")
+        print(f"    Verify      -> line flow error RMS {np.sqrt(np.mean(line_error ** 2)):0.6f}, max {np.abs(line_error).max():0.6f}")
+
+
+    # copy the results out of the PyPSA network
+    def get_result(self, succes):
+        result = SimulationResult()
+
+        result.succes       = succes
+        result.lines_p0     = self.network.lines_t.p0.copy()
+        result.generators_p = self.network.generators_t.p.copy()
+        result.loads_p      = self.network.loads_t.p.copy()
+        result.buses_v_mag_pu = self.network.buses_t.v_mag_pu.copy()
+        result.buses_v_ang    = self.network.buses_t.v_ang.copy()
+
+        return result
+
+
     def pf(self):
         timer = Timer()
         timer.start()
@@ -217,16 +500,56 @@ class Simulation:
         timer.stop()
         print(f"    PyPSA took  -> {timer.elapsed_time:0.6f} seconds")
 
-        if (self.__export_results):
-            timer.start()
-            self.network.export_to_csv_folder("Export/PyPSA_pf")
-            timer.stop()
+        return succes
+
 
-            print(f"    Export took -> {timer.elapsed_time:0.6f} seconds")
+    # PF of all snapshots on a pool of processes, the results are written into the network
+    def parallel_pf(self, job):
+        if (self.__parallel_power_flow == None or self.__parallel_power_flow.num_of_workers != self.pf_workers):
+            self.close()
+            self.__parallel_power_flow = ParallelPowerFlow(self.static_buses, self.static_lines, self.pf_workers)
+
+        if (not self.__parallel_power_flow.is_enabled(len(job.index))):
+            return self.pf()
+
+        if (not ParallelPowerFlow.is_possible()):
+            print("PF workers -> not possible in the solver worker process, using one process")
+            return self.pf()
+
+        timer = Timer()
+        timer.start()
+
+        succes = True
+
+        try:
+            frames, not_converged = self.__parallel_power_flow.pf(job.index, job.static, job.components)
+
+            for (class_name, attribute), dataframe in frames.items():
+                self.network.pnl(class_name)[attribute] = dataframe
+
+            print("PF network update SUCCES! -> solution possible")
+            print("    Workers     -> " + str(self.pf_workers))
+
+            if (not_converged > 0):
+                print("    Converged   -> not in " + str(not_converged) + " snapshots")
+
+        except Exception as error:
+            print("PF network update FAILED! -> no solution possible (" + str(error) + ")")
+            succes = False
+
+        timer.stop()
+        print(f"    PyPSA took  -> {timer.elapsed_time:0.6f} seconds")
 
         return succes
 
 
+    # stop the processes of the parallel power flow
+    def close(self):
+        if (self.__parallel_power_flow != None):
+            self.__parallel_power_flow.stop()
+            self.__parallel_power_flow = None
+
+
     def lpf(self):
         timer = Timer()
         timer.start()
@@ -243,25 +566,62 @@ class Simulation:
         timer.stop()
         print(f"    PyPSA took  -> {timer.elapsed_time:0.6f} seconds")
 
-        if (self.__export_results):
-            timer.start()
-            self.network.export_to_csv_folder("Export/PyPSA_lpf")
-            timer.stop()
+        return succes
 
-            print(f"    Export took -> {timer.elapsed_time:0.6f} seconds")
 
-        return succes
+    # LPF of all snapshots with one sparse solve, falls back to the LPF of PyPSA when the network has unknown buses or lines
+    def vectorised_lpf(self):
+        if (not self.linear_power_flow.is_available(self.network)):
+            return self.lpf()
+
+        timer = Timer()
+        timer.start()
+
+        try:
+            self.linear_power_flow.solve(self.network)
+        except Exception as error:
+            print("    Vectorised  -> FAILED, " + str(error))
+            return self.lpf()
+
+        timer.stop()
+        print("LPF network update SUCCES! -> solution possible")
+        print("    Snapshots   -> " + str(len(self.network.snapshots)))
+        print(f"    Solve took  -> {timer.elapsed_time:0.6f} seconds")
+
+        if (self.linear_power_flow_verify):
+            self.vectorised_lpf_compare()
+
+        return True
+
+
+    # run the LPF of PyPSA on the same network and print the differences with the vectorised LPF
+    def vectorised_lpf_compare(self):
+        generators_p = self.network.generators_t.p.copy()
+        lines_p0     = self.network.lines_t.p0.copy()
+
+        if (not self.lpf()):
+            print("    Verify      -> LPF FAILED")
+            return
+
+        print("    Verify      -> max generator difference " + str((self.network.generators_t.p - generators_p).abs().max().max()))
+        print("    Verify      -> max line difference " + str((self.network.lines_t.p0 - lines_p0).abs().max().max()))
 
 
     def lopf(self):
 
+        if (self.merit_order_enable):
+            succes = self.merit_order_lopf()
+
+            if (succes != None):
+                return succes
+
         timer = Timer()
         timer.start()
       
         succes = True
 
         try:
-            status = self.network.lopf()
+            status = self.solve_lopf()
 
             if (status[0] == "ok" and status[1] == "optimal"):
                 print("LOPF network update SUCCES! -> solution possible")
@@ -280,98 +640,173 @@ class Simulation:
         timer.stop()
         print(f"    PyPSA took  -> {timer.elapsed_time:0.6f} seconds")
 
-        if (self.__export_results):
-            timer.start()
-            #self.network.export_to_csv_folder("Export/PyPSA_lopf") # this code create an error
-            timer.stop()
-
-            print(f"    Export took -> {timer.elapsed_time:0.6f} seconds")
+        stage_times = self.__in_memory_solver.stage_times
+        if (self.solver_backend == "highs" and len(stage_times) > 0):
+            print(f"    Build took  -> {stage_times.get('build', 0):0.6f} seconds")
+            print(f"    Solve took  -> {stage_times.get('solve', 0):0.6f} seconds")
+            print(f"    Output took -> {stage_times.get('output', 0):0.6f} seconds")
 
         return succes
 
 
-    def update_network(self):
+    # network.lopf() with the selected solver backend
+    def solve_lopf(self):
+        self.__in_memory_solver.stage_times.clear()
 
-        self.network.set_snapshots(self.__index)
+        if (self.solver_backend == "highs"):
+            if (self.__in_memory_solver.is_available()):
+                print("    Solver      -> highs (in memory)")
+                return self.__in_memory_solver.lopf(self.network)
 
-        # components to be removed from PyPSA network
-        remove_generators = []
-        remove_loads      = []
-        remove_storages   = []
-        remove_links      = []
+            print("    Solver      -> highs not available (requires pyomo and highspy), using glpk")
 
-        # components to be added into PyPSA network
-        add_generators = []
-        add_loads      = []
-        add_storages   = []
-        add_links      = []
+        return self.network.lopf()
 
-        # check which components are already in PyPSA. If not, add them
-        for new_component in self.__new_components:
 
-            add_component   = True
+    def plopf(self, job):
+        timer = Timer()
+        timer.start()
 
-            for component in self.__components:
-                if (new_component.name == component.name):
-                    add_component = False
+        result = self.persistent_model.solve(job, self.__component_attributes)
 
-            if (add_component):
-                if (new_component.type == "Generator"):
-                    add_generators.append (new_component)
+        timer.stop()
+        print("    Static      -> " + str(job.static))
+        print(f"    Model took  -> {timer.elapsed_time:0.6f} seconds")
 
-                if (new_component.type == "Load"):
-                    add_loads.append (new_component)
+        return result
 
-                if (new_component.type == "Storage"):
-                    add_storages.append (new_component)
 
-                if (new_component.type == "Link"):
-                    add_links.append (new_component)
+    # LOPF without LP solver, returns None when network constraints could bind
+    def merit_order_lopf(self):
 
-        # check which generators should be removed from PyPSA
-        for component in self.__components:  
+        timer = Timer()
+        timer.start()
 
-            remove_component = True
+        objective = None
 
-            for new_component in self.__new_components:
-                if (component.name == new_component.name):
-                    remove_component = False
+        try:
+            if (self.merit_order.analyse(self.network)):
+                objective = self.merit_order.solve(self.network)
 
-            if (remove_component == True):
-                if (component.type == "Generator"):
-                    remove_generators.append(component)
+                if (objective == None):
+                    print("    Merit order -> link direction binds, using LP solver")
+            else:
+                print("    Merit order -> not possible, " + self.merit_order.reason)
+        except Exception as error:
+            print("    Merit order -> FAILED, " + str(error))
 
-                if (component.type == "Load"):
-                    remove_loads.append(component)
+        if (objective == None):
+            return None
 
-                if (component.type == "Storage"):
-                    remove_storages.append(component)
+        print("LOPF network update SUCCES! -> merit order dispatch")
+        print("    Static      -> " + str(self.__static))
+        print("    Objective   -> " + str(objective))
 
-                if (component.type == "Link"):
-                    remove_links.append(component)
+        timer.stop()
+        print(f"    Merit took  -> {timer.elapsed_time:0.6f} seconds")
 
-        # remove old components from PyPSA network
-        for generator in remove_generators:
-            self.__remove_generator(generator)
+        if (self.merit_order_verify):
+            self.merit_order_compare(objective)
 
-        for load in remove_loads:
-            self.__remove_load(load)
+        return True
 
-        for storage in remove_storages:
-            self.__remove_storage(storage)
 
-        for link in remove_links:
-            self.__remove_link(link)
+    # run the LP solver on the same network and print the differences with the merit order dispatch
+    def merit_order_compare(self, objective):
+        generators_p = self.network.generators_t.p.copy()
+        lines_p0     = self.network.lines_t.p0.copy()
 
-        # add new components to PyPSA network
-        for generator in add_generators:
-            self.__add_generator(generator)
+        try:
+            status = self.solve_lopf()
+        except:
+            print("    Verify      -> LOPF FAILED")
+            return
+
+        if (status[1] != "optimal"):
+            print("    Verify      -> LOPF " + status[1])
+            return
+
+        print("    Verify      -> objective difference " + str(abs(self.network.objective - objective)))
+        print("    Verify      -> max generator difference " + str((self.network.generators_t.p - generators_p).abs().max().max()))
+        print("    Verify      -> max line difference " + str((self.network.lines_t.p0 - lines_p0).abs().max().max()))
+
+
+    def update_network(self):
+
+        if (not self.network.snapshots.equals(pd.Index(self.__index))):
+            self.network.set_snapshots(self.__index)
+
+            # time series of the current components are not defined on the new snapshots, update all of them
+            for name in self.__fingerprints:
+                self.__fingerprints[name] = None
+
+        new_components = {}
+        for component in self.__new_components:
+            new_components[component.name] = component
+
+        # per PyPSA class: names to remove, names and attributes to add and to update
+        remove_components = {}
+        add_components    = {}
+        update_components = {}
 
-        for load in add_loads:
-            self.__add_load(load)
+        for class_name in self.__component_classes.values():
+            remove_components[class_name] = []
+            add_components[class_name]    = ([], [])
+            update_components[class_name] = ([], [])
 
-        for storage in add_storages:
-            self.__add_storage(storage)
+        # check which components should be removed from PyPSA
+        for name, component in self.__components.items():
+            new_component = new_components.get(name)
 
-        for link in add_links:
-            self.__add_link(link)
+            if (new_component == None or new_component.type != component.type):
+                remove_components[self.__component_classes[component.type]].append(name)
+
+        # check which components are new or have changed parameters
+        for name, new_component in new_components.items():
+            class_name = self.__component_classes.get(new_component.type)
+
+            if (class_name == None):
+                continue
+
+            attributes  = self.__component_attributes(new_component)
+            fingerprint = self.__fingerprint(attributes)
+            component   = self.__components.get(name)
+
+            if (component == None or component.type != new_component.type):
+                add_components[class_name][0].append(name)
+                add_components[class_name][1].append(attributes)
+
+            elif (self.__fingerprints[name] != fingerprint):
+                update_components[class_name][0].append(name)
+                update_components[class_name][1].append(attributes)
+
+            self.__fingerprints[name] = fingerprint
+
+        # remove old components from PyPSA network
+        for class_name, names in remove_components.items():
+            if (len(names) > 0):
+                self.network.mremove(class_name, names)
+
+                for name in names:
+                    if (name not in new_components):
+                        del self.__fingerprints[name]
+                    del self.__components[name]
+
+        # add new components to PyPSA network
+        for class_name, (names, attributes) in add_components.items():
+            if (len(names) > 0):
+                self.__add_components(class_name, names, attributes)
+
+        # update changed components in place
+        for class_name, (names, attributes) in update_components.items():
+            for i in range(0, len(names)):
+                self.__update_component(class_name, names[i], attributes[i])
+
+        for name, new_component in new_components.items():
+            if (new_component.type in self.__component_classes):
+                self.__components[name] = new_component
+
+        self.__num_of_generators    = len(self.network.generators)
+        self.__num_of_loads         = len(self.network.loads)
+        self.__num_of_storages      = len(self.network.storage_units)
+        self.__num_of_links         = len(self.network.links)
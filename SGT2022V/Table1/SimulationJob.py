@@ -0,0 +1,29 @@
+# File: SimulationJob.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Description of one PyPSA calculation: calculation mode, snapshots, calculation options and a copy of all components
+# Jobs are created by the SmartGridTable and are not changed afterwards,
+# so they can be handed to a solver worker while the table keeps changing
+#
+
+import copy
+
+class SimulationJob:
+
+    def __init__(self, job_id, mode, static, index, components, key, scenario, options=None, candidates=(), revision=""):
+        self.job_id     = job_id
+        self.mode       = mode
+        self.static     = static
+        self.index      = index
+        self.key        = key
+        self.scenario   = scenario
+        self.revision   = revision
+        self.options    = dict(options) if options != None else {}
+
+        # copies, platforms keep changing the original components
+        self.components = tuple(copy.copy(component) for component in components)
+
+        # every component which could be placed in this scenario, only used by the persistent model
+        self.candidates = tuple(candidates)
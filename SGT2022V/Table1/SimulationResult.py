@@ -0,0 +1,31 @@
+# File: SimulationResult.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Data container for the results of one PyPSA calculation
+# Contains copies of the line flows, generator output, load consumption and bus voltages
+# These results are used to drive the ledstrips and the GUI, independent of the PyPSA network
+# complete is False for the partial results of a rolling horizon LOPF which only cover the first solved snapshots
+#
+
+class SimulationResult:
+
+    def __init__(self):
+        self.succes         = False
+        self.complete       = True
+        self.lines_p0       = None
+        self.generators_p   = None
+        self.loads_p        = None
+        self.buses_v_mag_pu = None
+        self.buses_v_ang    = None
+
+
+    def get_size(self):
+        size = 0
+
+        for dataframe in [self.lines_p0, self.generators_p, self.loads_p, self.buses_v_mag_pu, self.buses_v_ang]:
+            if (dataframe is not None):
+                size = size + int(dataframe.memory_usage(index=True, deep=True).sum())
+
+        return size
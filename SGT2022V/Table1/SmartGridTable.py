@@ -15,20 +15,77 @@ from Section_LV import Section_LV
 from Section_MV_Ring import Section_MV_Ring
 
 from Simulation import Simulation
+from SimulationResult import SimulationResult
+from PTDFEngine import PTDFEngine
+from SimulationJob import SimulationJob
+from SolverWorker import SolverWorker
+from ResultCache import ResultCache
+from ResultExporter import ResultExporter
 from SectionLink import SectionLink
 from ScenarioManager import ScenarioManager
+from ScenarioWatcher import ScenarioWatcher
+from MQTTTransport import MQTTTransport
+from SnapshotAggregation import SnapshotAggregation
 from Link import Link
 from Line import Line
 from TransformerLink import TransformerLink
 
+from FrameCompiler import FrameCompiler
 from Timer import Timer
 
+import pandas as pd
+import copy
+import queue
+import time
+
 class SmartGridTable:
 
     def __init__(self):
 
         self.__simulation  = Simulation()
 
+        # results of earlier calculations, reused when the same table configuration returns
+        self.__result_cache = ResultCache(64 * 1000 * 1000)
+        self.__result       = None
+
+        # precomputed ledstrip messages of every snapshot, for the playback of dynamic scenarios
+        self.__frames = FrameCompiler()
+
+        # results are written to disk in the background
+        self.__result_exporter = ResultExporter(r"Export/")
+
+        # background solver, calculations run on the table's own simulation when there is no worker
+        self.__solver_worker = None
+        self.__job_counter   = 0
+        self.__pending_jobs  = {}
+
+        # called with (event_type, data) by the sections, solver worker and scenario watcher, see EventQueue.py
+        self.__notify = None
+
+        # SectionChange records of the MQTT threads, platforms, modules and ledstrips are only changed by the main routine
+        self.__section_changes = queue.Queue()
+
+        # calculation options which are handed to the simulation with every job
+        self.__simulation_options = {
+            "merit_order"              : True,
+            "merit_order_verify"       : False,
+            "solver"                   : "glpk",
+            "aggregation"              : None,
+            "aggregation_verify"       : False,
+            "rolling_horizon"          : None,
+            "pf_workers"               : 0,
+            "linear_power_flow"        : True,
+            "linear_power_flow_verify" : False }
+
+        # candidate components of the current scenario for the persistent model
+        self.__candidates          = ()
+        self.__candidates_scenario = None
+
+        # module changes are collected until the table has been quiet for the debounce time
+        self.__debounce_time    = 0.2
+        self.__change_pending   = False
+        self.__last_change_time = 0
+
         self.buses         = []
         self.lines         = []
         self.components    = []
@@ -50,6 +107,9 @@ class SmartGridTable:
         self.__current_scenario_manager = self.__static_scenario_manager
         self.__static = True
 
+        # optional background check for changed scenario files
+        self.__scenario_watcher = ScenarioWatcher([self.__static_scenario_manager, self.__dynamic_scenario_manager])
+
         # scenario containing all module data (generators, loads, storages and transformers)
         self.__current_scenario = self.__static_scenario_manager.get_current_scenario()
 
@@ -61,6 +121,15 @@ class SmartGridTable:
         self.__table_sections.append( Section_LV("Table5") )
         self.__table_sections.append( Section_LV("Table6") )
 
+        for section in self.__table_sections:
+            section.changes = self.__section_changes
+
+        # one MQTT connection for all sections
+        self.__mqtt_transport = MQTTTransport.get_transport()
+
+        for section in self.__table_sections:
+            section.mqtt_set_transport(self.__mqtt_transport)
+
         # static connections between table sections
         self.__section_links.append( SectionLink("Table2", "bus0",  "Table3", "bus0") )
         self.__section_links.append( SectionLink("Table2", "bus4",  "Table3", "bus21") )
@@ -74,6 +143,9 @@ class SmartGridTable:
 
         self.network_reload_static()
 
+        # fast linear power flow on the static topology
+        self.__ptdf_engine = PTDFEngine(self.buses, self.lines, self.__transformer_links)
+
         self.__simulation.set_buses(self.buses)
         self.__simulation.set_lines(self.lines)
         self.__simulation.enable_static()
@@ -82,6 +154,17 @@ class SmartGridTable:
         self.modules_reset_changed()
         
 
+    # wake up the main routine on events of other threads
+    def set_notify(self, notify):
+        self.__notify = notify
+        self.__scenario_watcher.notify = notify
+
+        for section in self.__table_sections:
+            section.notify = notify
+
+        if (self.__solver_worker != None):
+            self.__solver_worker.notify = notify
+
     #-------------------------------
     # Table sections
     #-------------------------------
@@ -140,6 +223,8 @@ class SmartGridTable:
 
 
     def table_is_connected(self):
+        self.modules_apply_changes()
+
         connected_sections = 0
         for section in self.__table_sections:
             if (section.section_is_connected() == True):
@@ -149,6 +234,38 @@ class SmartGridTable:
             return True
         return False
 
+
+    # start the handshake of all sections, see table_connect_step()
+    def table_connect_reset(self):
+        for section in self.__table_sections:
+            section.connect_reset()
+
+
+    # one handshake step of every section at once, a slow section does not hold up the others
+    # returns True when every section is connected and has reported its modules
+    def table_connect_step(self):
+        self.modules_apply_changes()
+
+        done = True
+        for section in self.__table_sections:
+            if (section.connect_step() == False):
+                done = False
+
+        return done
+
+
+    # sections which are not connected or have not reported their modules yet
+    def table_get_pending(self):
+        pending = []
+
+        for section in self.__table_sections:
+            if (section.section_is_connected() == False):
+                pending.append(section.name + " (not connected)")
+            elif (section.connect_is_done() == False):
+                pending.append(section.name + " (modules)")
+
+        return pending
+
     #-------------------------------
     # Modules
     #-------------------------------
@@ -172,13 +289,54 @@ class SmartGridTable:
             section.reload_modules()
 
 
+    # apply the queued changes of the MQTT threads, returns the number of changes
+    def modules_apply_changes(self):
+        applied = 0
+
+        while (True):
+            try:
+                change = self.__section_changes.get_nowait()
+            except queue.Empty:
+                return applied
+
+            for section in self.__table_sections:
+                if (section.name == change.section):
+                    section.apply_change(change)
+
+            applied = applied + 1
+
+
     def modules_if_changed(self):
+        self.modules_apply_changes()
+
+        current_time = time.perf_counter()
+
         for section in self.__table_sections:
             if (section.has_changed()):
-                return True
+                self.modules_reset_changed()
+                self.__change_pending   = True
+                self.__last_change_time = current_time
+                break
+
+        if (self.__change_pending and current_time - self.__last_change_time >= self.__debounce_time):
+            self.__change_pending = False
+            return True
+
         return False
 
 
+    # seconds until the pending module changes have been quiet for the debounce time, None without changes
+    def modules_get_debounce_delay(self):
+        if (self.__change_pending == False):
+            return None
+
+        return self.__last_change_time + self.__debounce_time - time.perf_counter()
+
+
+    def modules_set_debounce(self, milliseconds):
+        self.__debounce_time = milliseconds / 1000.0
+
+
     def modules_reset_changed(self):
         for section in self.__table_sections:
             section.reset_changed()
@@ -187,12 +345,50 @@ class SmartGridTable:
     # Scenario
     #-------------------------------
 
+    # incremental reload, only scenarios with added, changed or removed files are loaded again
+    # the current scenario stays active, unless it changed (loaded again) or was removed (first static scenario)
     def scenario_refresh_list(self):
-        self.__static_scenario_manager.reload_scenarios()
-        self.__dynamic_scenario_manager.reload_scenarios()
+        changed_files = self.__static_scenario_manager.refresh_scenarios()
+        changed_files = changed_files + self.__dynamic_scenario_manager.refresh_scenarios()
 
-        self.__current_scenario_manager = self.__static_scenario_manager
-        self.__current_scenario = self.__static_scenario_manager.get_current_scenario()
+        # results and candidates of changed scenarios are no longer valid
+        for scenario_file in changed_files:
+            self.__result_cache.invalidate_scenario(scenario_file)
+
+        filepath = self.__current_scenario.filepath if (self.__current_scenario != None) else None
+
+        if (self.__current_scenario != None and filepath not in changed_files):
+            print("Current scenario unchanged -> " + str(self.__current_scenario.get_name()))
+            return
+
+        self.__candidates_scenario = None
+
+        scenario = self.__current_scenario_manager.get_current_scenario()
+
+        if (scenario == None or scenario.filepath != filepath):
+            print("Current scenario removed, switching to the first static scenario")
+            self.__current_scenario_manager = self.__static_scenario_manager
+            scenario = self.__static_scenario_manager.get_current_scenario()
+        else:
+            print("Current scenario changed, reloading modules")
+
+        self.scenario_activate(scenario)
+
+
+    # reload the scenarios when the scenario watcher found changed files, called from the main routine
+    def scenario_poll(self):
+        if (self.__scenario_watcher.changed):
+            self.__scenario_watcher.changed = False
+            print("Scenario files changed...")
+            self.scenario_refresh_list()
+            print("----------------------------------------------------------------")
+
+
+    def scenario_watch(self, enable):
+        if (enable):
+            self.__scenario_watcher.start()
+        else:
+            self.__scenario_watcher.stop()
 
 
     def scenario_set(self, scenario_name, static):
@@ -209,27 +405,34 @@ class SmartGridTable:
 
 
         if (status):
-            self.__current_scenario = self.__current_scenario_manager.get_current_scenario()
-            self.__current_scenario.print_scenario()
+            self.scenario_activate(self.__current_scenario_manager.get_current_scenario())
 
-            self.__snapshot_index   = 0
-            self.__elapsed_time     = 0
+        else:
+            print("No scenario found with name -> " + scenario_name)
 
-            if (self.__current_scenario.is_static() == False):
 
-                self.__simulation.set_index(self.__current_scenario.index)
-                self.__simulation.enable_dynamic()
+    # make the scenario the current scenario and reload the modules on all platforms
+    def scenario_activate(self, scenario):
+        self.__current_scenario = scenario
+        self.__current_scenario.print_scenario()
 
-                self.__static = False
+        self.__snapshot_index   = 0
+        self.__elapsed_time     = 0
+        self.__result           = None
+        self.__frames.clear()
 
-            else:
-                self.__static = True
-                self.__simulation.enable_static()
+        if (self.__current_scenario.is_static() == False):
+
+            self.__simulation.set_index(self.__current_scenario.index)
+            self.__simulation.enable_dynamic()
 
-            self.modules_reload()
+            self.__static = False
 
         else:
-            print("No scenario found with name -> " + scenario_name)
+            self.__static = True
+            self.__simulation.enable_static()
+
+        self.modules_reload()
 
 
     def scenario_print_current(self):
@@ -240,13 +443,34 @@ class SmartGridTable:
         self.__static_scenario_manager.print_scenario_list()
         self.__dynamic_scenario_manager.print_scenario_list()
 
+
+    # write the bundles of all scenarios, so the next start does not read JSON and CSV files
+    def scenario_compile(self):
+        timer = Timer()
+        timer.start()
+
+        compiled = self.__static_scenario_manager.compile_scenarios()
+        compiled = compiled + self.__dynamic_scenario_manager.compile_scenarios()
+
+        timer.stop()
+        print(f"Compiled {compiled} scenarios -> {timer.elapsed_time:0.6f} seconds")
+
+
+    # load all scenarios in the background, so switching scenarios does not have to wait
+    def scenario_warm(self):
+        self.__static_scenario_manager.warm_scenarios()
+        self.__dynamic_scenario_manager.warm_scenarios()
+
     #-------------------------------
     # MQTT
     #-------------------------------
 
+    # subscribe all sections, then start the shared connection once
     def mqtt_connect(self):
         for section in self.__table_sections:
-            section.mqtt_connect()
+            section.mqtt_subscribe()
+
+        self.__mqtt_transport.connect()
 
 
     def mqtt_disconnect(self):
@@ -254,6 +478,10 @@ class SmartGridTable:
             section.reboot_section()
             section.mqtt_disconnect()
 
+        # the GUI can share the connection
+        if (self.__mqtt_transport.get_num_of_subscriptions() == 0):
+            self.__mqtt_transport.disconnect()
+
 
     def mqtt_publish(self):
         for section in self.__table_sections:
@@ -266,84 +494,217 @@ class SmartGridTable:
 
 
     def mqtt_set_broker(self, broker):
+        self.__mqtt_transport = MQTTTransport.get_transport(broker)
+
         for section in self.__table_sections:
-            section.mqtt_set_broker(broker)
+            section.mqtt_set_transport(self.__mqtt_transport)
 
 
     def mqtt_is_connected(self):
-        connected_sections = 0
-        for section in self.__table_sections:
-            if (section.mqtt_is_connected() == True):
-                connected_sections = connected_sections + 1
-
-        if (connected_sections == len(self.__table_sections)):
-            return True
-        return False
+        return self.__mqtt_transport.is_connected()
 
     #-------------------------------
     # PyPSA network
     #-------------------------------
 
     def network_lopf(self):
+        self.network_simulate("lopf")
 
-        self.__simulation.set_index(self.__current_scenario.index)
-        self.simulation_changed = True
-        
-        self.network_refresh()
+
+    def network_lpf(self):
+        self.network_simulate("lpf")
+
+
+    def network_pf(self):
+        self.network_simulate("pf")
+
+
+    # LOPF on a model which is kept in memory, placements only change variable bounds
+    def network_plopf(self):
+        self.network_simulate("plopf")
+
+
+    # linear power flow with the precomputed PTDF matrices, fast enough to run in the main routine
+    def network_fastlpf(self):
+
+        timer = Timer()
+        timer.start()
+
+        self.modules_apply_changes()
+
+        # a calculation which is still queued or running must not overwrite this result when it finishes
+        self.network_supersede_jobs()
+
+        self.network_reload_components()
+        self.modules_reset_changed()
+        self.__change_pending = False
+
+        active_links = []
+        generators   = []
+        loads        = []
+
+        for component in self.components:
+            if (component.type == "Link"):
+                active_links.append(component.name)
+            if (component.type == "Generator"):
+                generators.append(component)
+            if (component.type == "Load"):
+                loads.append(component)
+
+        injections = self.__ptdf_engine.get_injections(self.components)
+        flows = self.__ptdf_engine.calculate(injections, active_links, generators)
+
+        index = self.__current_scenario.index[:1]
+
+        result = SimulationResult()
+        result.succes       = len(generators) > 0
+        result.lines_p0     = pd.DataFrame([flows], index=index, columns=self.__ptdf_engine.line_names)
+        result.generators_p = pd.DataFrame([[self.__ptdf_engine.get_value(generator.p_set) for generator in generators]], index=index, columns=[generator.name for generator in generators])
+        result.loads_p      = pd.DataFrame([[self.__ptdf_engine.get_value(load.p_set) for load in loads]], index=index, columns=[load.name for load in loads])
+
+        timer.stop()
+        print("Fast LPF network update " + ("SUCCES! -> solution possible" if result.succes else "FAILED! -> no generators"))
+        print(f"    PTDF took   -> {timer.elapsed_time:0.6f} seconds")
+
+        self.network_apply_result(result, "fastlpf")
+
+
+    # every request supersedes the calculations which are still queued or running
+    def network_supersede_jobs(self):
+        self.__job_counter = self.__job_counter + 1
+
+        if (self.__solver_worker != None):
+            self.__solver_worker.supersede(self.__job_counter)
+
+
+    def network_simulate(self, mode):
+
+        # the calculation uses every change which arrived before it started
+        self.modules_apply_changes()
+
+        self.network_supersede_jobs()
+
+        key = self.network_cache_key(mode)
+        result = self.__result_cache.get(key)
+
+        if (result != None):
+            print("Simulation result loaded from cache (" + self.__result_cache.get_counters_string() + ")")
+            self.modules_reset_changed()
+            self.__change_pending = False
+            self.network_apply_result(result, mode)
+            return
+
+        job = self.network_create_job(self.__job_counter, mode, key)
+
+        if (self.__solver_worker != None):
+            self.__pending_jobs[job.job_id] = job
+            self.__solver_worker.submit(job)
+            print("Simulation job " + str(job.job_id) + " send to solver worker")
+            return
+
+        result = self.__simulation.simulate(job, None, self.network_apply_progress)
+        self.network_store_result(job, result)
+        self.network_apply_result(result, mode)
+
+
+    # results of the first snapshots of a rolling horizon LOPF, not cached
+    def network_apply_progress(self, job, result):
+        print("    Solved      -> " + str(len(result.lines_p0)) + " / " + str(len(job.index)) + " snapshots")
+        self.network_apply_result(result, job.mode)
+
+
+    # empty result without succes, for a calculation which did not return a result
+    def network_get_failed_result(self):
+        result = SimulationResult()
+        result.lines_p0     = pd.DataFrame(columns=self.__ptdf_engine.line_names)
+        result.generators_p = pd.DataFrame()
+        result.loads_p      = pd.DataFrame()
+        return result
+
+
+    def network_store_result(self, job, result):
+        self.__result_cache.put(job.key, result, job.scenario)
+        self.__result_exporter.export(result, job.mode)
+        print("    Cache       -> " + self.__result_cache.get_counters_string())
+
+
+    def network_apply_result(self, result, mode):
+
+        self.__result = result
+
+        if (mode == "lopf" or mode == "plopf"):
+            self.__simulation_succes = result.succes
+            self.simulation_changed = True
 
         for section in self.__table_sections:
             section.active = section.is_network_connected()
 
-        self.__simulation_succes = self.__simulation.lopf()
-
-        if (self.__simulation_succes == False):
+        if (result.succes == False):
             for section in self.__table_sections:
                 section.active = False
             self.ledstrips_update_active()
+            self.__frames.clear()
 
         else:
-            if (self.__static):
-                self.ledstrips_update_from_simulation(0)
+            if (self.__static == False and len(result.lines_p0) > 1):
+                self.__frames.compile(result.lines_p0, self.__table_sections)
             else:
+                self.__frames.clear()
+
+            if ((mode == "lopf" or mode == "plopf") and self.__static == False):
                 self.ledstrips_update_from_simulation(self.__snapshot_index)
+            else:
+                self.ledstrips_update_from_simulation(0)
 
         self.mqtt_publish()
 
 
-    def network_lpf(self):
-
-        self.network_refresh()
+    # hash of everything that determines the outcome of a calculation
+    def network_cache_key(self, mode):
+        platforms = []
+        transformer_links = []
 
         for section in self.__table_sections:
-            section.active = section.is_network_connected()
+            for platform in section.platforms:
+                if (platform.module != None):
+                    platforms.append([section.name, platform.RFID_location, platform.RFID_tag])
 
-        if (self.__simulation.lpf() == False or self.__simulation.get_num_of_generators() == 0):
-            for section in self.__table_sections:
-                section.active = False
-            self.ledstrips_update_active()
+            if (section.is_network_connected()):
+                for link in self.__transformer_links:
+                    if (link.RFID_table == section.name):
+                        for platform in section.platforms:
+                            if (platform.RFID_location == link.RFID and platform.module != None):
+                                transformer_links.append(link.name)
 
-        else:
-            self.ledstrips_update_from_simulation(0)
+        return self.__result_cache.make_key(self.__current_scenario.filepath, mode, platforms, transformer_links)
 
-        self.mqtt_publish()
 
+    def cache_print_status(self):
+        self.__result_cache.print_status()
 
-    def network_pf(self):
 
-        self.network_refresh()
+    def cache_clear(self):
+        self.__result_cache.clear()
 
-        for section in self.__table_sections:
-            section.active = section.is_network_connected()
 
-        if (self.__simulation.pf() == False or self.__simulation.get_num_of_generators() == 0):
-            for section in self.__table_sections:
-                section.active = False
-            self.ledstrips_update_active()
+    def cache_set_size(self, megabytes):
+        self.__result_cache.set_max_bytes(int(megabytes * 1000 * 1000))
 
-        else:
-            self.ledstrips_update_from_simulation(0)
 
-        self.mqtt_publish()
+    def export_set_format(self, export_format):
+        return self.__result_exporter.set_format(export_format)
+
+
+    def export_set_every(self, every):
+        self.__result_exporter.set_every(every)
+
+
+    def export_set_sample(self, sample):
+        self.__result_exporter.set_sample(sample)
+
+
+    def export_print_status(self):
+        self.__result_exporter.print_status()
 
 
     def network_reload_static(self):
@@ -383,24 +744,161 @@ class SmartGridTable:
                                     self.components.append(new_link)
 
 
-    def network_refresh(self):
-
-        timer = Timer()
-        timer.start()
+    # snapshot of the current table configuration for one calculation
+    def network_create_job(self, job_id, mode, key):
 
         self.network_reload_components()
+        self.modules_reset_changed()
+        self.__change_pending = False
+
+        # snapshot aggregation and rolling horizon of the scenario, unless these are set from the console
+        options = dict(self.__simulation_options)
+        if (options["aggregation"] == None):
+            options["aggregation"] = self.__current_scenario.get_aggregation()
+
+        if (options["rolling_horizon"] == None):
+            options["rolling_horizon"] = self.__current_scenario.get_rolling_horizon()
+
+        return SimulationJob(
+            job_id,
+            mode,
+            self.__static,
+            self.__current_scenario.index,
+            self.components,
+            key,
+            self.__current_scenario.filepath,
+            options,
+            self.network_get_candidates() if (mode == "plopf") else (),
+            self.__current_scenario.revision)
+
+
+    # every component which can be placed on a platform in the current scenario, and every transformer link
+    def network_get_candidates(self):
+        if (self.__candidates_scenario == self.__current_scenario.revision):
+            return self.__candidates
+
+        modules = []
+        for RFID_tag in self.__current_scenario.get_module_tags():
+            module = self.__current_scenario.get_module(RFID_tag)
+            if (module != None):
+                modules.append(module)
+
+        candidates = []
 
-        self.__simulation.clear_components()
+        for section in self.__table_sections:
+            for platform in section.platforms:
+                for module in modules:
+                    if (platform.accepts_module(module)):
+                        for component in module.components:
+                            if (component.type == "Generator" or component.type == "Load" or component.type == "Storage"):
+                                candidate = copy.copy(component)
+                                candidate.bus0 = platform.bus
+                                candidates.append(candidate)
 
-        for component in self.components:
-            self.__simulation.add_component(component)
+        for link in self.__transformer_links:
+            candidates.append(Link(link.name, link.bus0, link.bus1, True))
 
-        self.__simulation.update_network()
+        self.__candidates = tuple(candidates)
+        self.__candidates_scenario = self.__current_scenario.revision
 
-        self.modules_reset_changed()
+        return self.__candidates
 
-        timer.stop()
-        print(f"PyPSA network reload took -> {timer.elapsed_time:0.6f} seconds")
+
+    # changed options can change the results, so earlier results are removed from the cache
+    def network_set_option(self, name, value):
+        self.__simulation_options[name] = value
+        self.__result_cache.clear()
+
+
+    def network_set_solver(self, solver):
+        if (solver in Simulation.solver_backends):
+            self.network_set_option("solver", solver)
+            return True
+        return False
+
+
+    def network_get_solver(self):
+        return self.__simulation_options["solver"]
+
+
+    # number of processes for the PF of dynamic scenarios, 0 runs the PF in the table (or solver worker) itself
+    def network_set_pf_workers(self, num_of_workers):
+        self.__simulation_options["pf_workers"] = num_of_workers
+
+
+    # stop the processes of the table's own simulation
+    def network_close(self):
+        self.__simulation.close()
+
+
+    # snapshot aggregation for dynamic LOPF (see SnapshotAggregation.py), None uses the setting of the scenario
+    def network_set_aggregation(self, options):
+        if (options != None):
+            error = SnapshotAggregation.get_error(options)
+
+            if (error != None):
+                print("Snapshot aggregation not set -> " + error)
+                return False
+
+        self.network_set_option("aggregation", options)
+        return True
+
+    #-------------------------------
+    # Solver worker
+    #-------------------------------
+
+    # worker_type thread, process or executor, executor jobs are started with run_in_executor() when an event loop is given
+    def solver_start(self, worker_type, event_loop=None):
+        self.solver_stop()
+
+        self.__solver_worker = SolverWorker(worker_type, self.buses, self.lines, event_loop)
+        self.__solver_worker.notify = self.__notify
+        self.__solver_worker.start()
+
+
+    def solver_stop(self):
+        if (self.__solver_worker != None):
+            self.__solver_worker.stop()
+            self.__solver_worker = None
+            self.__pending_jobs.clear()
+
+
+    # apply results which were returned by the solver worker
+    def solver_poll(self):
+        if (self.__solver_worker == None):
+            return
+
+        message = self.__solver_worker.get_result()
+
+        while (message != None):
+            job_id, result, complete = message
+
+            # first windows of a rolling horizon LOPF, playback starts while the remaining windows are solved
+            if (complete == False):
+                job = self.__pending_jobs.get(job_id)
+
+                if (job != None and job_id == self.__job_counter):
+                    self.network_apply_progress(job, result)
+
+                message = self.__solver_worker.get_result()
+                continue
+
+            job = self.__pending_jobs.pop(job_id, None)
+
+            if (job != None and result != None):
+                self.network_store_result(job, result)
+
+                # results of an outdated table configuration are only cached
+                if (job_id == self.__job_counter):
+                    self.network_apply_result(result, job.mode)
+                else:
+                    print("Simulation job " + str(job_id) + " superseded, result not shown")
+
+            # the worker failed on the latest job, shown like a failed calculation (not cached)
+            elif (job != None and job_id == self.__job_counter):
+                self.network_apply_result(self.network_get_failed_result(), job.mode)
+
+            message = self.__solver_worker.get_result()
 
 
     #-------------------------------
@@ -408,26 +906,31 @@ class SmartGridTable:
     #-------------------------------
 
     def ledstrips_update_from_simulation(self, index):
+
+        # no results yet, or results which do not cover this snapshot
+        if (self.__result == None or index >= len(self.__result.lines_p0)):
+            return
+
+        for section in self.__table_sections:
+            section.ledstrip_bank.update_from_flows(self.__result.lines_p0, index, section.active)
+
+
+    # publish the precomputed messages of a snapshot
+    def ledstrips_play_frame(self, index):
         for section in self.__table_sections:
-            for ledstrip in section.ledstrips:
-                ledstrip.active_power = self.__simulation.network.lines_t.p0[ledstrip.line][index]
-                ledstrip.active = section.active
-                ledstrip.refresh()
+            self.__frames.apply(section, index)
+            section.mqtt_publish_payload(self.__frames.get_payload(section, index))
 
 
     def ledstrips_update_active(self):
         for section in self.__table_sections:
-            for ledstrip in section.ledstrips:
-                ledstrip.active = section.active
-                ledstrip.refresh()
+            section.ledstrip_bank.update_active(section.active)
 
 
     def ledstrips_update_active_section(self, name):
         for section in self.__table_sections:
             if (section.name == name):
-                for ledstrip in section.ledstrips:
-                    ledstrip.active =  section.active
-                    ledstrip.refresh()
+                section.ledstrip_bank.update_active(section.active)
 
 
     def append_delta_time(self, delta_time):
@@ -437,13 +940,21 @@ class SmartGridTable:
     
     def update(self):
         if (self.__current_scenario.is_static() == False):
+
+            # rolling horizon LOPF, playback waits at the last solved snapshot
+            if (self.update_is_waiting()):
+                return
+
             if(self.__elapsed_time > self.__current_scenario.time_per_snapshot):
 
                 self.__elapsed_time = 0
                 self.snapshot_changed = True
 
-                self.ledstrips_update_from_simulation(self.__snapshot_index)
-                self.mqtt_publish()
+                if (self.__frames.is_valid(self.__table_sections, self.__snapshot_index)):
+                    self.ledstrips_play_frame(self.__snapshot_index)
+                else:
+                    self.ledstrips_update_from_simulation(self.__snapshot_index)
+                    self.mqtt_publish()
 
                 self.__snapshot_index = self.__snapshot_index + 1
 
@@ -453,6 +964,26 @@ class SmartGridTable:
                     self.__snapshot_index = 0
 
 
+    # seconds until update() plays the next snapshot, None for static scenarios and while waiting for results
+    def get_update_delay(self):
+        if (self.__current_scenario.is_static() == True):
+            return None
+
+        if (self.update_is_waiting()):
+            return None
+
+        return self.__current_scenario.time_per_snapshot - self.__elapsed_time
+
+
+    # the current result is partial (rolling horizon LOPF) and does not cover the next snapshot yet
+    # short results which are complete (fast LPF, failed calculations) do not stop the playback
+    def update_is_waiting(self):
+        if (self.__result == None or self.__result.complete == True):
+            return False
+
+        return self.__snapshot_index >= len(self.__result.lines_p0)
+
+
     def get_simulation_succes(self):
         return self.__simulation_succes
 
@@ -468,11 +999,11 @@ class SmartGridTable:
 
     def get_generators_generation(self):
         if (self.__simulation_succes == True):
-            return self.__simulation.network.generators_t.p
+            return self.__result.generators_p
         return None
             
 
     def get_load_consumption(self):
         if (self.__simulation_succes == True):
-            return self.__simulation.network.loads_t.p
+            return self.__result.loads_p
         return None
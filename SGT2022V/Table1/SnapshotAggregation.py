@@ -0,0 +1,264 @@
+# File: SnapshotAggregation.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Reduces the snapshots of a dynamic scenario before the LOPF and maps the results back onto every snapshot
+# The options are a dictionary, from "aggregation" in the scenario JSON file or from the console:
+#   {"method" : "off"}
+#   {"method" : "resample", "frequency" : "4h"}                          -> mean of every 4 hours
+#   {"method" : "representative", "period" : "1D", "num_of_periods" : 3} -> 3 typical days (k-means on the profiles)
+#   {"method" : "duration", "num_of_segments" : 12}                     -> 12 segments of the net load duration curve
+#
+# Every aggregated snapshot has a weight, the number of snapshots it represents, which is used for the
+# snapshot weightings of the PyPSA network. groups links every snapshot to its aggregated snapshot,
+# expand() copies the aggregated results back onto the full index
+# Representative periods and duration curve segments do not keep the order of time, storage units only approximate
+# Only used by LOPF, the persistent model of plopf always solves all snapshots at once
+# Frequencies and periods are pandas offset aliases (lowercase "h" for hours, "H" is rejected by recent pandas),
+# get_error() checks the options before they are used
+#
+
+from pandas.tseries.frequencies import to_offset
+
+import pandas as pd
+import numpy as np
+import copy
+
+class SnapshotAggregation:
+
+    methods = ["off", "resample", "representative", "duration"]
+
+    def __init__(self, options=None):
+        if (options == None):
+            options = {}
+
+        self.method          = options.get("method", "off")
+        self.frequency       = options.get("frequency", "1h")
+        self.period          = options.get("period", "1D")
+        self.num_of_periods  = int(options.get("num_of_periods", 4))
+        self.num_of_segments = int(options.get("num_of_segments", 12))
+
+        self.index            = None    # full index
+        self.aggregated_index = None
+        self.weights          = None    # snapshots represented by every aggregated snapshot
+        self.groups           = None    # snapshot -> aggregated snapshot
+
+        # snapshot -> aggregated snapshot whose values it determines, -1 when it is not used
+        self.__sources = None
+
+
+    # description of what is wrong with the options, None when they can be used
+    @classmethod
+    def get_error(cls, options):
+        if (options.get("method", "off") not in cls.methods):
+            return "unknown method " + str(options.get("method"))
+
+        for name in ["frequency", "period"]:
+            if (name in options):
+                try:
+                    to_offset(options[name])
+                except (ValueError, TypeError):
+                    return "invalid " + name + " " + str(options[name]) + " (for example 4h or 1D)"
+
+        return None
+
+
+    def is_enabled(self):
+        return self.method in ["resample", "representative", "duration"]
+
+
+    def get_description(self):
+        if (self.method == "resample"):
+            return "resample " + str(self.frequency)
+        if (self.method == "representative"):
+            return "representative " + str(self.num_of_periods) + " x " + str(self.period)
+        if (self.method == "duration"):
+            return "duration curve " + str(self.num_of_segments) + " segments"
+        return "off"
+
+
+    # copies of the components with their time series on the aggregated index
+    def aggregate(self, index, components):
+        self.index = pd.DatetimeIndex(index)
+        series = self.__get_series(components)
+
+        if (self.method == "resample"):
+            groups, sources = self.__resample()
+        elif (self.method == "representative"):
+            groups, sources = self.__representative(series)
+        else:
+            groups, sources = self.__duration(components)
+
+        # number the aggregated snapshots in the order of their timestamps
+        num_of_groups = groups.max() + 1
+        first = np.full(num_of_groups, len(self.index))
+        np.minimum.at(first, sources[sources >= 0], np.nonzero(sources >= 0)[0])
+
+        order = np.argsort(first, kind="stable")
+        renumber = np.empty(num_of_groups, dtype=int)
+        renumber[order] = np.arange(num_of_groups)
+
+        self.groups = renumber[groups]
+        self.__sources = np.where(sources >= 0, renumber[np.maximum(sources, 0)], -1)
+
+        self.aggregated_index = self.index[first[order]]
+        self.weights = np.bincount(self.groups, minlength=num_of_groups).astype(float)
+
+        aggregated_components = []
+
+        for component in components:
+            aggregated = copy.copy(component)
+
+            for attribute, value in vars(component).items():
+                if (isinstance(value, pd.Series) and len(value) == len(self.index)):
+                    setattr(aggregated, attribute, pd.Series(self.__aggregate_values(value.to_numpy(dtype=float)), index=self.aggregated_index))
+
+            aggregated_components.append(aggregated)
+
+        return aggregated_components
+
+
+    # dataframe on the aggregated index -> dataframe on the full index
+    def expand(self, dataframe):
+        if (dataframe is None or len(dataframe) != len(self.aggregated_index)):
+            return dataframe
+        return pd.DataFrame(dataframe.to_numpy()[self.groups], index=self.index, columns=dataframe.columns)
+
+
+    def __aggregate_values(self, values):
+        used = self.__sources >= 0
+        sums   = np.bincount(self.__sources[used], weights=values[used], minlength=len(self.aggregated_index))
+        counts = np.bincount(self.__sources[used], minlength=len(self.aggregated_index))
+        return sums / np.maximum(counts, 1)
+
+
+    # every time series of the components, as (snapshots x series) matrix
+    def __get_series(self, components):
+        columns = []
+
+        for component in components:
+            for value in vars(component).values():
+                if (isinstance(value, pd.Series) and len(value) == len(self.index)):
+                    columns.append(value.to_numpy(dtype=float))
+
+        if (len(columns) == 0):
+            return np.zeros((len(self.index), 0))
+
+        return np.column_stack(columns)
+
+
+    # mean of every fixed time interval
+    def __resample(self):
+        groups = self.index.to_series().groupby(pd.Grouper(freq=self.frequency)).ngroup().to_numpy()
+
+        # empty intervals have no snapshots and are left out
+        groups = np.unique(groups, return_inverse=True)[1]
+        return groups, groups
+
+
+    # periods with the most typical profiles, every other complete period is represented by the most similar one
+    def __representative(self, series):
+        periods   = self.index.to_series().groupby(pd.Grouper(freq=self.period)).ngroup().to_numpy()
+        positions = self.index.to_series().groupby(pd.Grouper(freq=self.period)).cumcount().to_numpy()
+
+        periods = np.unique(periods, return_inverse=True)[1]
+        lengths = np.bincount(periods)
+        period_length = lengths.max()
+
+        # incomplete periods (start or end of the scenario) represent themselves
+        complete = np.nonzero(lengths == period_length)[0]
+
+        scale = np.abs(series).max(axis=0)
+        scale[scale == 0] = 1.0
+        normalised = series / scale
+
+        features = np.zeros((len(complete), period_length * normalised.shape[1]))
+        for i in range(0, len(complete)):
+            features[i] = normalised[periods == complete[i]].flatten()
+
+        medoids = self.__cluster(features, self.num_of_periods)
+
+        groups  = np.arange(len(self.index))
+        sources = np.arange(len(self.index))
+
+        start = np.zeros(len(lengths), dtype=int)
+        start[1:] = np.cumsum(lengths)[:-1]
+
+        for i in range(0, len(complete)):
+            members = periods == complete[i]
+            medoid_start = start[complete[medoids[i]]]
+            groups[members] = medoid_start + positions[members]
+
+            if (medoids[i] != i):
+                sources[members] = -1
+
+        # number the groups 0..n
+        used = np.unique(groups, return_inverse=True)
+        groups = used[1]
+        sources = np.where(sources >= 0, groups, -1)
+
+        return groups, sources
+
+
+    # k-means on the period features, returns the medoid (index of a period) of the cluster of every period
+    def __cluster(self, features, num_of_clusters):
+        num_of_features = len(features)
+
+        if (num_of_clusters >= num_of_features):
+            return np.arange(num_of_features)
+
+        # deterministic start, each next centre is the period furthest from the chosen centres
+        centres = [0]
+        distance = ((features - features[0]) ** 2).sum(axis=1)
+
+        while (len(centres) < num_of_clusters):
+            centre = int(np.argmax(distance))
+            centres.append(centre)
+            distance = np.minimum(distance, ((features - features[centre]) ** 2).sum(axis=1))
+
+        centroids = features[centres]
+
+        for iteration in range(0, 50):
+            distances = ((features[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+            labels = np.argmin(distances, axis=1)
+
+            new_centroids = np.array([features[labels == k].mean(axis=0) if np.any(labels == k) else centroids[k]
+                                      for k in range(0, num_of_clusters)])
+
+            if (np.allclose(new_centroids, centroids)):
+                break
+            centroids = new_centroids
+
+        # the period closest to the centroid represents the cluster
+        medoids = np.zeros(num_of_features, dtype=int)
+
+        for k in range(0, num_of_clusters):
+            members = np.nonzero(labels == k)[0]
+
+            if (len(members) > 0):
+                closest = members[np.argmin(((features[members] - centroids[k]) ** 2).sum(axis=1))]
+                medoids[members] = closest
+
+        return medoids
+
+
+    # snapshots sorted on net load (loads minus variable generation), split into segments of equal size
+    def __duration(self, components):
+        net_load = np.zeros(len(self.index))
+
+        for component in components:
+            if (component.type == "Load" and isinstance(component.p_set, pd.Series)):
+                net_load = net_load + component.p_set.to_numpy(dtype=float)
+
+            if (component.type == "Generator" and isinstance(component.p_max_pu, pd.Series)):
+                net_load = net_load - component.p_max_pu.to_numpy(dtype=float) * component.p_nom
+
+        order = np.argsort(net_load, kind="stable")
+        num_of_segments = max(1, min(self.num_of_segments, len(self.index)))
+
+        groups = np.zeros(len(self.index), dtype=int)
+        for segment, snapshots in enumerate(np.array_split(order, num_of_segments)):
+            groups[snapshots] = segment
+
+        return groups, groups
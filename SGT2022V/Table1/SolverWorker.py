@@ -0,0 +1,177 @@
+# File: SolverWorker.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Runs PyPSA calculations in the background so the main table routine never waits for a solve
+# The worker is either a thread, a separate process or an executor, all own their own Simulation object
+# The executor type runs every job as a task of a single thread executor, with run_in_executor() when an asyncio loop is given
+# SimulationJob objects are send to the worker through a queue, results are returned through another queue
+# Only the newest job matters: older jobs still in the queue are skipped,
+# and a job which became outdated during the network reload is cancelled before the solve
+# Results are returned as (job_id, result, complete), a rolling horizon LOPF also returns the incomplete
+# results after every window, so the table can start playback before the whole horizon is solved
+# A forwarding thread waits for the results and calls notify with (event_type, data), so the main routine wakes up
+#
+
+from Simulation import Simulation
+from EventQueue import EventQueue
+
+from concurrent.futures import ThreadPoolExecutor
+
+import multiprocessing
+import queue
+import threading
+
+
+# one job on the simulation of the worker, the result is put in the results queue
+def solver_worker_run(simulation, job, results, latest_job_id):
+
+    def is_superseded(job):
+        return job.job_id < latest_job_id.value
+
+    def progress(job, result):
+        results.put((job.job_id, result, False))
+
+    result = None
+
+    if (is_superseded(job)):
+        print("Simulation job " + str(job.job_id) + " superseded, skipped")
+
+    else:
+        try:
+            result = simulation.simulate(job, is_superseded, progress)
+        except Exception as error:
+            print("Solver worker failed on job " + str(job.job_id) + " -> " + str(error))
+
+    results.put((job.job_id, result, True))
+
+
+# main routine of the worker, runs inside the worker thread or process
+def solver_worker_loop(buses, lines, jobs, results, latest_job_id):
+
+    simulation = Simulation()
+    simulation.set_buses(buses)
+    simulation.set_lines(lines)
+
+    while (True):
+        job = jobs.get()
+
+        # None is the stop signal
+        if (job == None):
+            simulation.close()
+            break
+
+        solver_worker_run(simulation, job, results, latest_job_id)
+
+
+class SolverWorker:
+
+    def __init__(self, worker_type, buses, lines, event_loop=None):
+        self.worker_type = worker_type
+        self.event_loop  = event_loop
+
+        self.__buses = buses
+        self.__lines = lines
+
+        self.__worker  = None
+        self.__jobs    = None
+        self.__results = None
+        self.__latest_job_id = None
+
+        # executor type, jobs run one at a time on this simulation
+        self.__executor   = None
+        self.__simulation = None
+
+        # results moved out of the worker queue by the forwarding thread
+        self.__forwarder = None
+        self.__ready     = queue.Queue()
+
+        self.notify = None
+
+
+    def start(self):
+        if (self.worker_type == "process"):
+            # spawn, so the worker does not inherit the MQTT threads of the table
+            context = multiprocessing.get_context("spawn")
+            self.__jobs    = context.Queue()
+            self.__results = context.Queue()
+            self.__latest_job_id = context.Value("i", 0)
+            self.__worker  = context.Process(target=solver_worker_loop, args=(self.__buses, self.__lines, self.__jobs, self.__results, self.__latest_job_id), daemon=True)
+        elif (self.worker_type == "executor"):
+            self.__results = queue.Queue()
+            self.__latest_job_id = multiprocessing.Value("i", 0)
+            self.__executor = ThreadPoolExecutor(max_workers=1)
+            self.__simulation = Simulation()
+            self.__simulation.set_buses(self.__buses)
+            self.__simulation.set_lines(self.__lines)
+        else:
+            self.__jobs    = queue.Queue()
+            self.__results = queue.Queue()
+            self.__latest_job_id = multiprocessing.Value("i", 0)
+            self.__worker  = threading.Thread(target=solver_worker_loop, args=(self.__buses, self.__lines, self.__jobs, self.__results, self.__latest_job_id), daemon=True)
+
+        if (self.__worker != None):
+            self.__worker.start()
+
+        self.__forwarder = threading.Thread(target=self.__forward, daemon=True)
+        self.__forwarder.start()
+
+        print("Solver worker started -> " + self.worker_type)
+
+
+    def stop(self):
+        if (self.__executor != None):
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+            self.__simulation.close()
+
+        if (self.__worker != None):
+            self.__jobs.put(None)
+            self.__worker.join(timeout=5.0)
+            self.__worker = None
+
+        # None stops the forwarding thread
+        if (self.__forwarder != None):
+            self.__results.put(None)
+            self.__forwarder.join(timeout=5.0)
+            self.__forwarder = None
+            print("Solver worker stopped -> " + self.worker_type)
+
+
+    def submit(self, job):
+        self.supersede(job.job_id)
+
+        if (self.__executor == None):
+            self.__jobs.put(job)
+        elif (self.event_loop != None):
+            self.event_loop.run_in_executor(self.__executor, solver_worker_run, self.__simulation, job, self.__results, self.__latest_job_id)
+        else:
+            self.__executor.submit(solver_worker_run, self.__simulation, job, self.__results, self.__latest_job_id)
+
+
+    # jobs older than job_id will not be solved anymore
+    def supersede(self, job_id):
+        if (self.__latest_job_id != None):
+            self.__latest_job_id.value = job_id
+
+
+    # returns (job_id, result, complete) when a result is available, otherwise None
+    def get_result(self):
+        try:
+            return self.__ready.get_nowait()
+        except queue.Empty:
+            return None
+
+
+    def __forward(self):
+        while (True):
+            message = self.__results.get()
+
+            if (message == None):
+                break
+
+            self.__ready.put(message)
+
+            if (self.notify != None):
+                self.notify(EventQueue.SOLVER)
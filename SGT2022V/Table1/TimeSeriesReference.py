@@ -0,0 +1,15 @@
+# File: TimeSeriesReference.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Immutable reference to a time series of the TimeSeriesStore: the SHA1 of the CSV contents and the divisor (or None)
+# Scenario bundles store these references instead of the time series, so a scenario loaded from a bundle
+# maps the shared arrays of the store again (TimeSeriesStore.get_series_by_digest) instead of holding private copies
+#
+
+from collections import namedtuple
+
+class TimeSeriesReference(namedtuple("TimeSeriesReference", ["digest", "divisor"])):
+
+    __slots__ = ()
@@ -0,0 +1,163 @@
+# File: TimeSeriesStore.py
+# Version 1.0
+# Authors: Jop Merz
+#
+# Description:
+# Store of the time series (CSV profiles) used by scenarios
+# Every CSV file is converted once to a binary .npy file, named after the SHA1 of the CSV contents,
+# in the .timeseries folder next to the scenarios. The .npy files are memory mapped and read only,
+# so every component which uses the same profile (or a CSV file with the same contents) shares one array
+#
+# index.json in the cache folder remembers the SHA1 of every CSV file together with its size and modification time,
+# a CSV file is only read and hashed again when it has changed
+# Scaled profiles (for example p_max_pu divided by p_nom) are cached as well, so equal modules share them
+#
+# There is one store per cache folder, use TimeSeriesStore.get_store(folder)
+# Series can also be found by their digest (get_series_by_digest), scenario bundles only store the digest
+#
+
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+
+class TimeSeriesStore:
+
+    folder_name = ".timeseries"
+
+    __stores = {}
+
+    @classmethod
+    def get_store(cls, folder):
+        folder = os.path.abspath(os.path.join(folder, cls.folder_name))
+
+        if (folder not in cls.__stores):
+            cls.__stores[folder] = TimeSeriesStore(folder)
+
+        return cls.__stores[folder]
+
+
+    def __init__(self, folder):
+        self.folder = folder
+
+        self.__arrays = {}      # digest -> array
+        self.__scaled = {}      # (digest, divisor) -> array
+        self.__files  = {}      # CSV file -> [size, modification time, digest]
+
+        self.__index_path = os.path.join(self.folder, "index.json")
+
+        try:
+            with open(self.__index_path) as index_file:
+                self.__files = json.load(index_file)
+        except (OSError, ValueError):
+            self.__files = {}
+
+
+    # time series of a CSV file, optionally divided by divisor, as read only pandas Series on the given index
+    def get_series(self, filepath, index, divisor=None):
+        self.get_array(filepath)
+        return self.get_series_by_digest(self.__get_digest(filepath), index, divisor)
+
+
+    # time series of a CSV file which is already converted, None when the .npy file of the digest does not exist
+    def get_series_by_digest(self, digest, index, divisor=None):
+        if (digest not in self.__arrays):
+            npy_path = os.path.join(self.folder, digest + ".npy")
+
+            if (not os.path.exists(npy_path)):
+                return None
+
+            self.__arrays[digest] = np.load(npy_path, mmap_mode="r")
+
+        array = self.__arrays[digest]
+
+        if (divisor != None):
+            key = (digest, divisor)
+
+            if (key not in self.__scaled):
+                scaled = array / divisor
+                scaled.flags.writeable = False
+                self.__scaled[key] = scaled
+
+            array = self.__scaled[key]
+
+        return pd.Series(array, index=index, copy=False)
+
+
+    def get_array(self, filepath):
+        digest = self.__get_digest(filepath)
+
+        if (digest not in self.__arrays):
+            self.__arrays[digest] = self.__load_array(filepath, digest)
+
+        return self.__arrays[digest]
+
+
+    # the time series of this digest is stored in a .npy file, so it can be found again after a restart
+    def is_stored(self, digest):
+        return os.path.exists(os.path.join(self.folder, digest + ".npy"))
+
+
+    def get_digest(self, filepath):
+        return self.__get_digest(filepath)
+
+
+    def get_num_of_arrays(self):
+        return len(self.__arrays)
+
+
+    # SHA1 of the CSV contents, only calculated again when the file has changed
+    def __get_digest(self, filepath):
+        key = os.path.abspath(filepath)
+        status = os.stat(filepath)
+
+        entry = self.__files.get(key)
+
+        if (entry != None and entry[0] == status.st_size and entry[1] == status.st_mtime_ns):
+            return entry[2]
+
+        with open(filepath, "rb") as csv_file:
+            digest = hashlib.sha1(csv_file.read()).hexdigest()
+
+        self.__files[key] = [status.st_size, status.st_mtime_ns, digest]
+        self.__save_index()
+
+        return digest
+
+
+    def __load_array(self, filepath, digest):
+        npy_path = os.path.join(self.folder, digest + ".npy")
+
+        if (not os.path.exists(npy_path)):
+            array = np.array(pd.read_csv(filepath), dtype=float).flatten()
+
+            try:
+                os.makedirs(self.folder, exist_ok=True)
+
+                # write to a temporary file first, so an interrupted conversion never leaves a broken file
+                temporary_path = npy_path + ".tmp"
+                with open(temporary_path, "wb") as npy_file:
+                    np.save(npy_file, array)
+                os.replace(temporary_path, npy_path)
+
+            except OSError as error:
+                print("Time series cache not writable, keeping " + filepath + " in memory -> " + str(error))
+                array.flags.writeable = False
+                return array
+
+        return np.load(npy_path, mmap_mode="r")
+
+
+    def __save_index(self):
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            temporary_path = self.__index_path + ".tmp"
+
+            with open(temporary_path, "w") as index_file:
+                json.dump(self.__files, index_file)
+
+            os.replace(temporary_path, self.__index_path)
+
+        except OSError:
+            pass